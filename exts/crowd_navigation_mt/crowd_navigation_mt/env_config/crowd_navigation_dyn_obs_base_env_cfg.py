@@ -398,6 +398,10 @@ class EventCfg:
     #     },
     # )
 
+    # the cached lidar quantities of the step are outdated for reset environments, cleared before the other reset
+    # events read them
+    clear_lidar_step_cache = EventTerm(func=mdp.clear_lidar_step_cache, mode="reset")
+
     # TODO curriculum spawning
     reset_base = EventTerm(
         func=mdp.reset_robot_position,
@@ -353,6 +353,10 @@ class EventCfg:
     #     },
     # )
 
+    # the cached lidar quantities of the step are outdated for reset environments, cleared before the terrain
+    # analysis reads the obstacle index in reset_base
+    clear_lidar_step_cache = EventTerm(func=mdp.clear_lidar_step_cache, mode="reset")
+
     reset_base = EventTerm(
         func=mdp.reset_robot_position,
         mode="reset",
@@ -21,7 +21,6 @@ from omni.isaac.lab.managers import SceneEntityCfg
 from omni.isaac.lab.managers import TerminationTermCfg as DoneTerm
 from omni.isaac.lab.scene import InteractiveSceneCfg
 from omni.isaac.lab.sensors import ContactSensorCfg, RayCasterCfg, patterns, RayCasterCameraCfg
-from omni.isaac.lab.terrains import TerrainImporterCfg
 from omni.isaac.lab.utils import configclass
 from omni.isaac.lab.utils.noise import AdditiveUniformNoiseCfg as Unoise
 
@@ -38,6 +37,7 @@ from omni.isaac.lab.utils.assets import ISAAC_NUCLEUS_DIR
 # from crowd_navigation_mt.terrains.test_terrains_cfg import OBS_TERRAINS_CFG
 from nav_tasks.sensors import adjust_ray_caster_camera_image_size, ZED_X_MINI_WIDE_RAYCASTER_CFG, FootScanPatternCfg
 from crowd_navigation_mt.mdp import ObservationHistoryTermCfg
+from crowd_navigation_mt.terrains import TerrainGeneratorImporterCfg
 
 """To improve: we have 3 separate goal_reached functions, one for logging, one for reward and one for termination"""
 
@@ -71,7 +71,8 @@ from crowd_navigation_mt.terrains.config import ROUGH_TERRAINS_CFG, OBS_TERRAINS
 class StatObsScene(InteractiveSceneCfg):
     """Configuration for the terrain scene with a legged robot."""
 
-    terrain = TerrainImporterCfg(
+    # creates the generator of the terrain generator config, e.g. a ParallelTerrainGeneratorCfg with num_workers
+    terrain = TerrainGeneratorImporterCfg(
         prim_path="/World/ground",
         terrain_type="generator",
         terrain_generator=OBS_TERRAINS_CFG,
@@ -316,6 +317,11 @@ class EventCfg:
     #         "command_name": "robot_direction",
     #     },
     # )
+
+    # the cached lidar quantities of the step are outdated for reset environments, cleared before the other reset
+    # events read them
+    clear_lidar_step_cache = EventTerm(func=mdp.clear_lidar_step_cache, mode="reset")
+
     reset_base = EventTerm(
         func=mdp.reset_root_state_uniform,
         mode="reset",
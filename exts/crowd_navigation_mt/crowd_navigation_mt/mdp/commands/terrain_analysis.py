@@ -12,17 +12,20 @@ import scipy.spatial.transform as tf
 import torch
 from dataclasses import MISSING
 from scipy.spatial import KDTree
-from scipy.stats import qmc, mode
+from scipy.stats import qmc
 
 import networkx as nx
 import warp as wp
 #from skimage.draw import line
 
 from omni.isaac.lab.envs import ManagerBasedRLEnv
+from omni.isaac.lab.managers import SceneEntityCfg
 from omni.isaac.lab.sensors import RayCaster, patterns, RayCasterCfg
 from omni.isaac.lab.utils import configclass
 from omni.isaac.lab.utils.warp import raycast_dynamic_meshes, raycast_mesh
 
+import crowd_navigation_mt.mdp as mdp  # noqa: F401, F403
+
 
 @configclass
 class TerrainAnalysisCfg:
@@ -36,6 +39,20 @@ class TerrainAnalysisCfg:
     """dist to sample around"""
     raycaster_sensor: str = MISSING
     """Name of the raycaster sensor to use for terrain analysis"""
+    obstacle_index_cell_size: float | None = None
+    """Cell size of the obstacle index used to find the meshes close to a spawn point.
+
+    None searches all meshes. With a cell size, only the meshes within this distance of the spawn point are guaranteed
+    to be found."""
+    spawn_height_map_resolution: float | None = None
+    """Resolution of the precomputed spawn height map in meters.
+
+    If given, the mode height of the static terrain (the first raycaster mesh) is rasterized once around the env
+    origins and spawn heights are looked up in this map instead of raycasting at every reset. Dynamic obstacles are
+    not part of the map. Defaults to None (raycast at every reset)."""
+    spawn_height_map_margin: float = 5.0
+    """Margin around the env origins covered by the spawn height map in meters. Queries outside are clamped to the
+    border of the map."""
 
 
 class TerrainAnalysis:
@@ -62,6 +79,12 @@ class TerrainAnalysis:
         height_scan_pattern = patterns.GridPatternCfg(resolution=0.333, size=[1.5, 1.5])
         self.height_scan_starts, self.height_scan_directions = patterns.grid_pattern(height_scan_pattern, env.device)
 
+        # warp mesh ids of the raycaster meshes, read once at the first spawn check
+        self._mesh_ids_np: np.ndarray | None = None
+
+        # spawn height map, rasterized at the first spawn height query
+        self._height_map: torch.Tensor | None = None
+
     def sample_spawn(self, init_spawn_point2d: torch.Tensor) -> torch.Tensor:
         height = self.sample_spawn_height(init_spawn_point2d)
         point_3d = torch.cat((init_spawn_point2d, height.unsqueeze(1)), dim=1)
@@ -70,35 +93,80 @@ class TerrainAnalysis:
 
     def sample_spawn_height(self, spawn_2d: torch.Tensor, use_mode: bool = True, use_max: bool = False) -> torch.Tensor:
 
-        z_values = torch.ones(len(spawn_2d), device=self._env.device).unsqueeze(1) * 50
-        init_points = torch.cat((spawn_2d, z_values), dim=1).unsqueeze(1)
+        if use_mode and self.cfg.spawn_height_map_resolution is not None:
+            if self._height_map is None:
+                self._build_height_map()
+            return self._lookup_height_map(spawn_2d) + self.cfg.robot_height
+
+        z_positions = self._scan_heights(spawn_2d, self._raycaster._mesh_ids_wp)
+
+        if use_mode:
+            return _mode(z_positions) + self.cfg.robot_height
+        elif use_max:
+            return torch.max(z_positions, dim=1).values + self.cfg.robot_height
+
+        return torch.mean(z_positions, dim=1) + self.cfg.robot_height
+
+    def _scan_heights(self, points_2d: torch.Tensor, mesh_ids_wp: wp.array) -> torch.Tensor:
+        """Heights of the height scan grid below each point of shape (num_points, 2).
+
+        Returns the heights of shape (num_points, num_rays), inf where no mesh is hit."""
+        z_values = torch.ones(len(points_2d), device=self._env.device).unsqueeze(1) * 50
+        init_points = torch.cat((points_2d, z_values), dim=1).unsqueeze(1)
 
-        ray_starts = self.height_scan_starts.unsqueeze(0).repeat(len(spawn_2d), 1, 1) + init_points.repeat(
+        ray_starts = self.height_scan_starts.unsqueeze(0).repeat(len(points_2d), 1, 1) + init_points.repeat(
             1, len(self.height_scan_starts), 1
         )
 
-        # TODO add mesh_ids_wp
-        z_positions = raycast_dynamic_meshes(
+        return raycast_dynamic_meshes(
             ray_starts=ray_starts.to(torch.float32),
-            ray_directions=self.height_scan_directions.unsqueeze(0).repeat(len(spawn_2d), 1, 1).to(torch.float32),
-            mesh_ids_wp=self._raycaster._mesh_ids_wp,
+            ray_directions=self.height_scan_directions.unsqueeze(0).repeat(len(points_2d), 1, 1).to(torch.float32),
+            mesh_ids_wp=mesh_ids_wp,
             #meshes=np.tile(np.array(self._raycaster._meshes[0], dtype=wp.Mesh)[0], (len(spawn_2d), 1)),
             max_dist=1000,
             return_distance=False,
         )[0][..., 2]
 
-        if use_mode:
-            return (
-                torch.tensor(mode(z_positions.cpu(), keepdims=False, axis=1).mode, device=self._env.device)
-                + self.cfg.robot_height
-            )
-        elif use_max:
-            return torch.max(z_positions, dim=1).values + self.cfg.robot_height
+    def _build_height_map(self, chunk_size: int = 16384):
+        """Rasterize the mode height of the static terrain around the env origins.
+
+        The cells are raycast in chunks against the first raycaster mesh (the terrain) only, such that the map does not
+        depend on the positions of the dynamic obstacles at startup."""
+        resolution = self.cfg.spawn_height_map_resolution
+        env_origins = self._env.scene.env_origins[:, :2]
+        self._height_map_origin = env_origins.min(dim=0).values - self.cfg.spawn_height_map_margin
+        extent = env_origins.max(dim=0).values + self.cfg.spawn_height_map_margin - self._height_map_origin
+        size_x, size_y = (torch.ceil(extent / resolution).long() + 1).tolist()
+
+        # cell centers, row-major in x
+        x = self._height_map_origin[0] + resolution * torch.arange(size_x, device=self._env.device)
+        y = self._height_map_origin[1] + resolution * torch.arange(size_y, device=self._env.device)
+        cells = torch.stack(torch.meshgrid(x, y, indexing="ij"), dim=-1).reshape(-1, 2)
+
+        terrain_mesh_id = self._raycaster._mesh_ids_wp.numpy()[0, :1]
+        mesh_ids_wp = wp.array(
+            np.tile(terrain_mesh_id, (chunk_size, 1)), dtype=wp.uint64, device=self._raycaster._mesh_ids_wp.device
+        )
+        heights = torch.empty(len(cells), device=self._env.device)
+        for start in range(0, len(cells), chunk_size):
+            chunk = cells[start : start + chunk_size]
+            heights[start : start + len(chunk)] = _mode(self._scan_heights(chunk, mesh_ids_wp[: len(chunk)]))
 
-        return torch.mean(z_positions, dim=1) + self.cfg.robot_height
+        self._height_map = heights.view(size_x, size_y)
+
+    def _lookup_height_map(self, points_2d: torch.Tensor) -> torch.Tensor:
+        """Height of the map cell closest to each point of shape (num_points, 2)."""
+        idx = torch.round((points_2d - self._height_map_origin) / self.cfg.spawn_height_map_resolution).long()
+        idx_x = idx[:, 0].clamp(0, self._height_map.shape[0] - 1)
+        idx_y = idx[:, 1].clamp(0, self._height_map.shape[1] - 1)
+        return self._height_map[idx_x, idx_y]
 
     def sample_spawn_2d(self, init_spawn_point: torch.Tensor, num_resamples: int = 100) -> torch.Tensor:
-        """given a spawn point, sample a valid spawn point around it."""
+        """given spawn points, sample a valid spawn point around each of them.
+
+        The candidates of all spawn points are checked with a single raycast launch, and a valid candidate is selected
+        per spawn point uniformly at random. If a spawn point has no valid candidate, the candidate with the largest
+        wall clearance is returned instead."""
 
         halton_sampler = qmc.Halton(d=2, scramble=True)
         sample_points = halton_sampler.random(num_resamples)
@@ -111,90 +179,96 @@ class TerrainAnalysis:
 
         z_dim = init_spawn_point[:, 2].unsqueeze(1).expand(len(init_spawn_point), num_resamples).unsqueeze(2)
 
-        sample_points_3d = torch.cat((sample_points_w, z_dim), dim=2)
+        sample_points_3d = torch.cat((sample_points_w, z_dim), dim=2).to(torch.float32)
 
-        samples = torch.zeros(len(init_spawn_point), 3, device=self._env.device)
+        # per environment, find all valid points and select one randomly
+        clearance = self._wall_clearance(sample_points_3d)
+        valid = clearance > self.cfg.min_wall_dist
+        has_valid = valid.any(dim=1)
+        weights = torch.where(has_valid.unsqueeze(1), valid.float(), 1.0)
+        sample_ids = torch.where(has_valid, torch.multinomial(weights, 1).squeeze(1), clearance.argmax(dim=1))
 
-        for env_id, env_samples in enumerate(sample_points_3d):
-            # per environment, find all valid points and select one randomly
-            en_valids = self._point_valid(env_samples)
-            valid_poin_idx = torch.where(en_valids)[0]
-            if len(valid_poin_idx) == 0:
-                raise ValueError("No valid spawn points found")
+        return sample_points_3d[torch.arange(len(init_spawn_point), device=self._env.device), sample_ids]
 
-            sample_id = valid_poin_idx[torch.randint(0, len(valid_poin_idx), (1,))]
-            samples[env_id] = env_samples[sample_id]
+    def _wall_clearance(self, sample_points: torch.Tensor) -> torch.Tensor:
+        """Smallest distance to the meshes along the 2d lidar scan of every sample point.
 
-        return samples
+        The sample points of all environments are raycast at once, against the meshes closest to the mean sample point
+        of each environment.
 
-    def _point_valid(self, sample_point: torch.Tensor) -> bool:
-        # raycast with the 2d lidar scan. we scan all n_samples at once (like multiple envs)
-        # shapes of inputs are (n_samples, n_rays, 3)
-        # TODO check if this even makes sense
-        N = 16
-        if self._env.num_envs <= N:
-            N = self._env.num_envs
+        Args:
+            sample_points: The sample points of shape (num_envs, num_samples, 3).
+
+        Returns:
+            The clearance of every sample point of shape (num_envs, num_samples). Inf if no mesh is hit.
+        """
+        num_envs, num_samples = sample_points.shape[:2]
 
         # TODO fix this that extract_n_closest_meshes works
         if (
             self._env.scene.cfg.terrain.terrain_type == "plane" or 
             self._env.scene.cfg.terrain.terrain_type == "generator"
             ):
-            valid_points_bools = torch.ones(len(sample_point), dtype=torch.bool)
-
-        else:   
-            closest_meshes_list, keep_indices = self._extract_n_closest_meshes(sample_point.mean(dim=0), N=N)
-            mesh_positions = (
-                self._raycaster._data.mesh_positions_w[0][keep_indices].unsqueeze(0).repeat(len(sample_point), 1, 1).to(torch.float32)
-            )
-            mesh_orientations = (
-                self._raycaster._data.mesh_orientations_w[0][keep_indices].unsqueeze(0).repeat(len(sample_point), 1, 1).to(torch.float32)
-            )
-
-            scan_2d_dists = raycast_dynamic_meshes(
-                ray_starts=sample_point.unsqueeze(1).repeat(1, len(self.scan_2d_directions), 1).to(torch.float32),
-                ray_directions=self.scan_2d_directions.unsqueeze(0).repeat(len(sample_point), 1, 1).to(torch.float32),
-                # meshes=np.tile(np.array(self._raycaster._meshes[0], dtype=wp.Mesh)[0], (len(sample_point), 1)),
-                mesh_ids_wp=self._raycaster._mesh_ids_wp,
-                # meshes=np.tile(np.array(closest_meshes_list, dtype=wp.Mesh), (len(sample_point), 1)),
-                mesh_positions_w=mesh_positions,
-                mesh_orientations_w=mesh_orientations,
-                max_dist=5,
-                return_distance=True,
-            )[1]
-
-            # scan_2d_dists = raycast_mesh(
-            #     ray_starts=sample_point.unsqueeze(1).repeat(1, len(self.scan_2d_directions), 1).to(torch.float32),
-            #     ray_directions=self.scan_2d_directions.unsqueeze(0).repeat(len(sample_point), 1, 1).to(torch.float32),
-            #     mesh_id=,
-            #     max_dist=1e6,
-            # )
-            # point is valid if all distances are greater than min_wall_dist
-            valid_points_bools = (scan_2d_dists > self.cfg.min_wall_dist).all(dim=1)
-
-        return valid_points_bools
-
-    def _extract_n_closest_meshes(self, center_point: torch.tensor, N: int, mesh_ids_to_keep: list[int] = [0]):
+            return torch.full((num_envs, num_samples), float("inf"), device=sample_points.device)
+
+        # TODO check if this even makes sense
+        keep_indices = self._extract_n_closest_meshes(sample_points.mean(dim=1), N=16)
+        mesh_positions = self._raycaster._data.mesh_positions_w[0][keep_indices].to(torch.float32)
+        mesh_orientations = self._raycaster._data.mesh_orientations_w[0][keep_indices].to(torch.float32)
+        # the warp mesh ids of the kept meshes per environment, the meshes are the same in all envs
+        if self._mesh_ids_np is None:
+            self._mesh_ids_np = self._raycaster._mesh_ids_wp.numpy()[0]
+        mesh_ids_wp = wp.array(
+            self._mesh_ids_np[keep_indices.cpu().numpy()], dtype=wp.uint64, device=self._raycaster._mesh_ids_wp.device
+        )
+
+        # raycast with the 2d lidar scan, all directions of all samples of an environment form one batch
+        num_directions = len(self.scan_2d_directions)
+        ray_starts = sample_points.unsqueeze(2).expand(-1, -1, num_directions, -1)
+        ray_directions = self.scan_2d_directions.to(torch.float32).expand(num_envs, num_samples, -1, -1)
+        scan_2d_dists = raycast_dynamic_meshes(
+            ray_starts=ray_starts.reshape(num_envs, -1, 3),
+            ray_directions=ray_directions.reshape(num_envs, -1, 3),
+            mesh_ids_wp=mesh_ids_wp,
+            mesh_positions_w=mesh_positions,
+            mesh_orientations_w=mesh_orientations,
+            max_dist=5,
+            return_distance=True,
+        )[1]
+
+        # point is valid if all distances are greater than min_wall_dist
+        return scan_2d_dists.view(num_envs, num_samples, num_directions).min(dim=2).values
+
+    def _extract_n_closest_meshes(
+        self, center_points: torch.Tensor, N: int, mesh_ids_to_keep: list[int] = [0]
+    ) -> torch.Tensor:
+        """Indices of the meshes to keep per center point of shape (num_points, 3).
+
+        Returns the mesh_ids_to_keep followed by the closest other meshes, shape (num_points, N). Missing meshes are
+        filled with the first mesh to keep."""
         # Adjust N based on the length of mesh_ids_to_keep
         N -= len(mesh_ids_to_keep)
 
         # Convert mesh_ids_to_keep to a tensor and repeat it for each robot
-        mesh_ids_to_keep_: torch.Tensor = torch.tensor(mesh_ids_to_keep, device=center_point.device)
-
-        # Extract mesh positions and robot positions based on env_ids
-        mesh_pos = self._raycaster._data.mesh_positions_w[0]  # w positions are the same in all envs
-        meshes = self._raycaster._meshes[0]  # meshes are the same in all envs
+        mesh_ids_to_keep_: torch.Tensor = torch.tensor(mesh_ids_to_keep, device=center_points.device)
+        mesh_ids_to_keep_ = mesh_ids_to_keep_.unsqueeze(0).expand(len(center_points), -1)
 
-        # Compute squared distances
-        distances = torch.sum((mesh_pos - center_point) ** 2, dim=1)
-
-        # Get the indices of the N closest meshes for each robot
-        _, closest_indices = torch.topk(distances, N, largest=False, sorted=True)
+        # Get the indices of the N closest obstacles (all meshes but the ground) from the shared obstacle index
+        index = mdp.obstacle_index(
+            self._env, SceneEntityCfg(self.cfg.raycaster_sensor), self.cfg.obstacle_index_cell_size
+        )
+        closest_indices = index.knn(center_points, N)[0]
+        closest_indices = torch.where(closest_indices >= 0, closest_indices, mesh_ids_to_keep_[:, :1])
 
         # Combine mesh_ids_to_keep with closest_indices
-        keep_indices = torch.unique(torch.cat((mesh_ids_to_keep_, closest_indices), dim=0))
+        return torch.cat((mesh_ids_to_keep_, closest_indices), dim=1)
+
 
-        # Construct the list of lists of closest meshes
-        closest_meshes_list = [meshes[i] for i in keep_indices]
+def _mode(values: torch.Tensor) -> torch.Tensor:
+    """The most frequent value of each row of shape (num_rows, num_values), the smallest one on ties.
 
-        return closest_meshes_list, keep_indices
\ No newline at end of file
+    Same result as ``scipy.stats.mode(values, axis=1)``, but computed on the device of the values.
+    """
+    counts = (values.unsqueeze(2) == values.unsqueeze(1)).sum(dim=2)
+    is_mode = counts == counts.max(dim=1, keepdim=True).values
+    return torch.where(is_mode, values, float("inf")).min(dim=1).values
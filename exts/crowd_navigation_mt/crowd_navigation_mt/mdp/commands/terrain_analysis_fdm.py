@@ -5,19 +5,21 @@
 
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
 import numpy as np
 import os
 import pickle
-import random
 import scipy.spatial.transform as tf
 import torch
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import MISSING
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
 from scipy.spatial import KDTree
 from scipy.stats import qmc
 
-import networkx as nx
 import warp as wp
-from skimage.draw import line
 
 from omni.isaac.lab.envs import ManagerBasedRLEnv
 from omni.isaac.lab.sensors import RayCaster
@@ -49,6 +51,155 @@ class TerrainAnalysisCfg:
     """Threshold for height difference between two points"""
     viz_graph: bool = True
     """Visualize the graph after the construction for a short amount of time."""
+    cache_graph: bool = True
+    """Cache the sampled points and the graph on disk.
+
+    The cache is keyed by a hash of the terrain meshes, the raycaster (name, config, mesh geometry and the mesh poses
+    of the first environment) and the graph parameters of this config. It is stored next to the sampled paths as
+    ``.npy`` files, which are memory-mapped when loaded. The cache is only valid for static scenes: if the raycaster
+    tracks the mesh transforms (moving or randomized obstacles) or does not expose the geometry of its meshes, the
+    graph is not cached."""
+    path_length_workers: int = 1
+    """Number of processes searching the paths when sampling. Defaults to 1 (searched in the calling process).
+
+    The sources are split into chunks of :attr:`path_length_chunk_size` nodes, each searched with a bounded Dijkstra.
+    With more than one worker, the workers are forked from the running process. Forking a process with a running
+    simulation app and CUDA context can deadlock or corrupt the state of the children, so only use workers where that
+    is known to work."""
+    path_length_chunk_size: int = 256
+    """Number of source nodes of a bounded Dijkstra search."""
+
+
+GRAPH_CACHE_FIELDS = (
+    "robot_height",
+    "wall_height",
+    "robot_buffer_spawn",
+    "tree_nodes",
+    "max_path_length",
+    "num_connections",
+    "grid_resolution",
+    "height_diff_threshold",
+)
+"""Fields of :class:`TerrainAnalysisCfg` that change the sampled points or the graph."""
+
+
+def _bounded_path_lengths(graph: csr_matrix, sources: np.ndarray, limit: float) -> tuple[np.ndarray, np.ndarray]:
+    """Shortest path lengths from the sources to all nodes reachable within the limit.
+
+    Returns:
+        The (source, goal) index pairs of the reachable nodes (num_pairs, 2) and their path lengths (num_pairs,). The
+        pairs are sorted by source and goal.
+    """
+    distances = dijkstra(graph, directed=False, indices=sources, limit=limit)
+    source_idx, goal_idx = np.nonzero(np.isfinite(distances))
+    return np.stack((sources[source_idx], goal_idx), axis=1), distances[source_idx, goal_idx]
+
+
+def _pair_keys(pairs: np.ndarray, num_nodes: int, seed: int) -> np.ndarray:
+    """Pseudo-random sampling keys of the (source, goal) pairs (num_pairs, 2).
+
+    The key of a pair only depends on the pair and the seed (splitmix64 hash), such that the pairs with the smallest
+    keys are a uniform sample without replacement, independent of the order in which the pairs are visited.
+    """
+    with np.errstate(over="ignore"):
+        x = pairs[:, 0].astype(np.uint64) * np.uint64(num_nodes) + pairs[:, 1].astype(np.uint64)
+        x ^= np.uint64(seed % 2**64) * np.uint64(0x9E3779B97F4A7C15)
+        x += np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _keep_smallest_keys(
+    keys: np.ndarray, pairs: np.ndarray, lengths: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Keep the k entries with the smallest keys."""
+    if keys.shape[0] > k:
+        keep = np.argpartition(keys, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+        return keys[keep], pairs[keep], lengths[keep]
+    return keys, pairs, lengths
+
+
+def _sample_pair_buckets(
+    graph: csr_matrix, sources: np.ndarray, buckets: list[tuple[int, float, float]], limit: float, seed: int
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Sample (source, goal) pairs of the sources into length buckets.
+
+    Args:
+        graph: The graph.
+        sources: The source nodes.
+        buckets: The number of pairs, the minimum (exclusive) and the maximum (inclusive) path length of every bucket.
+        limit: The maximum path length of the search.
+        seed: The seed of the sampling keys.
+
+    Returns:
+        The keys (k,), the pairs (k, 2) and the path lengths (k,) of the sampled pairs of every bucket, with k at most
+        the number of pairs of the bucket.
+    """
+    pairs, lengths = _bounded_path_lengths(graph, sources, limit)
+    keys = _pair_keys(pairs, graph.shape[0], seed)
+    reservoirs = []
+    for num_path, min_len, max_len in buckets:
+        within_length = (lengths > min_len) & (lengths <= max_len)
+        reservoirs.append(
+            _keep_smallest_keys(keys[within_length], pairs[within_length], lengths[within_length], num_path)
+        )
+    return reservoirs
+
+
+_worker_graph: csr_matrix | None = None
+"""The graph of the path sampling worker processes, set once per process by the pool initializer."""
+
+
+def _init_path_sampling_worker(graph: csr_matrix):
+    """Share the graph with a worker process once instead of sending it with every chunk."""
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _worker_sample_pair_buckets(
+    sources: np.ndarray, buckets: list[tuple[int, float, float]], limit: float, seed: int
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """:func:`_sample_pair_buckets` on the graph of the worker process."""
+    return _sample_pair_buckets(_worker_graph, sources, buckets, limit, seed)
+
+
+def lines_cross_grid(
+    grid: torch.Tensor, idx_start: torch.Tensor, idx_end: torch.Tensor, chunk_size: int = 16384
+) -> torch.Tensor:
+    """Check if the grid lines between pairs of cells pass through a marked cell.
+
+    The cells of a line are sampled with one step per cell along its major axis and the minor axis rounded to the
+    nearest cell, which are the cells of the Bresenham line of ``skimage.draw.line``. All lines of a chunk are evaluated
+    at once on the device of the grid.
+
+    Args:
+        grid: The boolean grid of marked cells. Shape is (size_x, size_y).
+        idx_start: The start cells of the lines. Shape is (num_lines, 2).
+        idx_end: The end cells of the lines. Shape is (num_lines, 2).
+        chunk_size: The number of lines evaluated at once. Defaults to 16384.
+
+    Returns:
+        The mask of the lines that pass through a marked cell. Shape is (num_lines,).
+    """
+    idx_start = idx_start.to(grid.device, torch.long)
+    idx_end = idx_end.to(grid.device, torch.long)
+    crossed = torch.zeros(idx_start.shape[0], dtype=torch.bool, device=grid.device)
+    max_idx = torch.tensor(grid.shape, device=grid.device) - 1
+    for start in range(0, idx_start.shape[0], chunk_size):
+        cell_start = idx_start[start : start + chunk_size]
+        delta = idx_end[start : start + chunk_size] - cell_start
+        # number of steps along the major axis
+        num_steps = delta.abs().max(dim=1).values.clamp(min=1).view(-1, 1, 1)
+        # steps beyond the end of a line repeat its end cell
+        steps = torch.arange(int(num_steps.max().item()) + 1, device=grid.device).view(1, -1, 1)
+        steps = torch.minimum(steps, num_steps)
+        # cells of the lines in integer arithmetic with ties rounded away from the start, shape (chunk, steps, 2)
+        offsets = torch.div(2 * steps * delta.abs().unsqueeze(1) + num_steps, 2 * num_steps, rounding_mode="floor")
+        cells = cell_start.unsqueeze(1) + delta.sign().unsqueeze(1) * offsets
+        cells = torch.minimum(cells.clamp(min=0), max_idx)
+        crossed[start : start + chunk_size] = grid[cells[..., 0], cells[..., 1]].any(dim=1)
+    return crossed
 
 
 class TerrainAnalysis:
@@ -56,6 +207,10 @@ class TerrainAnalysis:
         # save cfg and env
         self.cfg = cfg
         self._env = env
+        # raycaster sensor used to raycast against all the ground meshes, resolved at its first use
+        self._raycaster: RayCaster | None = None
+        # warp mesh ids and poses of the raycaster meshes, created at the first raycast
+        self._mesh_handles: tuple[wp.array, torch.Tensor, torch.Tensor] | None = None
 
     def sample_paths(self, num_paths, min_path_length, max_path_length, seed: int = 1) -> torch.Tensor:
         # check dimensions
@@ -89,29 +244,22 @@ class TerrainAnalysis:
 
         # construct graph if samples not loaded
         if not hasattr(self, "graph"):
-            self._sample_points()
-            self._construct_graph()
-
-        # map distance to idx pairs
-        random.seed(seed)
-
-        for num_path, min_len, max_len in zip(
-            num_paths_to_explore, min_path_length_to_explore, max_path_length_to_explore
-        ):
-            # get index of samples within length
-            within_length = (self.samples[:, 2] > min_len) & (self.samples[:, 2] <= max_len)
-
-            # randomly select certain pairs
-            rand_idx = torch.randperm(self.samples.shape[0])
-
-            # select the samples
-            selected_samples = self.samples[rand_idx[within_length]][:num_path]
+            self._load_or_construct_graph()
+
+        # sample the start and goal pairs of all missing length ranges in a single pass over the graph
+        buckets = list(zip(num_paths_to_explore, min_path_length_to_explore, max_path_length_to_explore))
+        for (num_path, min_len, max_len), (pairs, lengths) in zip(buckets, self._sample_pairs(buckets, seed)):
+            if lengths.shape[0] < num_path:
+                print(
+                    f"[WARNING] Only {lengths.shape[0]} of {num_path} paths with [{min_len},{max_len}] length"
+                    " available."
+                )
 
             # get start, goal and path length
-            curr_data = torch.zeros((num_path, 7))
-            curr_data[:, :3] = self.points[selected_samples[:, 0].type(torch.int64)]
-            curr_data[:, 3:6] = self.points[selected_samples[:, 1].type(torch.int64)]
-            curr_data[:, 6] = selected_samples[:, 2]
+            curr_data = torch.zeros((lengths.shape[0], 7))
+            curr_data[:, :3] = self.points[pairs[:, 0]]
+            curr_data[:, 3:6] = self.points[pairs[:, 1]]
+            curr_data[:, 6] = torch.from_numpy(lengths)
 
             # save curr_data as pickle
             filename = self._get_save_path(seed, num_path, min_len, max_len)
@@ -137,12 +285,6 @@ class TerrainAnalysis:
         sampled_nb_points = 0
         sampled_points = []
 
-        # get the raycaster sensor that should be used to raycast against all the ground meshes
-        if isinstance(self._env.scene.sensors[self.cfg.raycaster_sensor], RayCaster):
-            self._raycaster: RayCaster = self._env.scene.sensors[self.cfg.raycaster_sensor]
-        else:
-            raise ValueError(f"Sensor {self.cfg.raycaster_sensor} is not a RayCaster sensor")
-
         while sampled_nb_points < self.cfg.tree_nodes:
             # get raw samples origins
             points = sampler.random(self.cfg.tree_nodes)
@@ -164,6 +306,17 @@ class TerrainAnalysis:
         self.points = self.points[: self.cfg.tree_nodes]
         return
 
+    def _load_or_construct_graph(self):
+        """Load the points and the graph from the cache or construct them."""
+        cache_graph = self.cfg.cache_graph and self._graph_hash() is not None
+        if cache_graph and self._load_graph():
+            print(f"[INFO] Loaded cached terrain graph from {self._get_graph_cache_dir()}.")
+        else:
+            self._sample_points()
+            self._construct_graph()
+            if cache_graph:
+                self._save_graph()
+
     def _construct_graph(self):
         # construct kdtree to find nearest neighbors of points
         kdtree = KDTree(self.points.cpu().numpy())
@@ -178,34 +331,19 @@ class TerrainAnalysis:
             self._edge_filter_height_diff(idx_edge_start, idx_edge_end, distance)
         )
 
-        # init graph
-        self.graph = nx.Graph()
-        # add nodes with position attributes
-        self.graph.add_nodes_from(list(range(self.cfg.tree_nodes)))
-        pos_attr = {i: {"pos": self.points[i].cpu().numpy()} for i in range(self.cfg.tree_nodes)}
-        nx.set_node_attributes(self.graph, pos_attr)
-        # add edges with distance attributes
-        # NOTE: as the shortest path searching algorithm only stores integers
-        self.graph.add_edges_from(list(map(tuple, np.stack((idx_edge_start, idx_edge_end), axis=1))))
-        distance_attr = {
-            (i, j): {"distance": distance[idx]} for idx, (i, j) in enumerate(zip(idx_edge_start, idx_edge_end))
-        }
-        nx.set_edge_attributes(self.graph, distance_attr)
-
-        # get all shortest paths
-        odom_goal_distances = dict(
-            nx.all_pairs_dijkstra_path_length(self.graph, cutoff=self.cfg.max_path_length, weight="distance")
+        # init graph as symmetric sparse adjacency matrix (CSR) with the edge distances as weights
+        # NOTE: an edge is found twice if both points are among the nearest neighbors of each other
+        edges, unique_idx = np.unique(
+            np.sort(np.stack((idx_edge_start, idx_edge_end), axis=1), axis=1), axis=0, return_index=True
+        )
+        weights = distance[unique_idx].astype(np.float64)
+        self.graph = csr_matrix(
+            (
+                np.concatenate((weights, weights)),
+                (np.concatenate((edges[:, 0], edges[:, 1])), np.concatenate((edges[:, 1], edges[:, 0]))),
+            ),
+            shape=(self.points.shape[0], self.points.shape[0]),
         )
-
-        # summarize to samples
-        samples = []
-        for key, value in odom_goal_distances.items():
-            curr_samples = torch.zeros((len(value), 3))
-            curr_samples[:, 0] = key
-            curr_samples[:, 1] = torch.tensor(list(value.keys()))
-            curr_samples[:, 2] = torch.tensor(list(value.values()))
-            samples.append(curr_samples)
-        self.samples = torch.vstack(samples)
 
         # debug visualization
         if self.cfg.viz_graph:
@@ -243,6 +381,65 @@ class TerrainAnalysis:
             except ImportError:
                 print("[WARNING] Graph Visualization is not available in headless mode.")
 
+    def _sample_pairs(
+        self, buckets: list[tuple[int, float, float]], seed: int
+    ) -> list[tuple[torch.Tensor, np.ndarray]]:
+        """Uniformly sample (start, goal) pairs with a shortest path length within the ranges of the buckets.
+
+        The sources are searched in chunks with a bounded Dijkstra on the CSR graph, in forked worker processes if
+        :attr:`TerrainAnalysisCfg.path_length_workers` is larger than one. Every pair gets a pseudo-random key from the
+        seed, and each bucket keeps the pairs with the smallest keys as a reservoir. The memory therefore scales with
+        the number of sampled paths and not with the number of reachable pairs, and the sample only depends on the
+        seed, not on the chunks or workers.
+
+        Args:
+            buckets: The number of paths, the minimum (exclusive) and the maximum (inclusive) path length of every
+                bucket.
+            seed: The seed of the sampling.
+
+        Returns:
+            The (start, goal) indices (k, 2) and the path lengths (k,) of every bucket, in random order. k is the number
+            of paths of the bucket, or less if there are not enough pairs within its length range.
+        """
+        num_nodes = self.graph.shape[0]
+        chunks = np.array_split(np.arange(num_nodes), max(num_nodes // self.cfg.path_length_chunk_size, 1))
+        num_workers = min(self.cfg.path_length_workers, len(chunks))
+        # paths are limited to the maximum path length of the graph
+        limit = min(max(max_len for _, _, max_len in buckets), self.cfg.max_path_length)
+        args = (buckets, limit, seed)
+
+        # merge the reservoirs of the chunks as they arrive
+        reservoirs = [
+            (np.empty(0, dtype=np.uint64), np.empty((0, 2), dtype=np.int64), np.empty(0)) for _ in range(len(buckets))
+        ]
+
+        def merge(chunk_reservoirs):
+            for chunk_reservoir in chunk_reservoirs:
+                for bucket_idx, (keys, pairs, lengths) in enumerate(chunk_reservoir):
+                    reservoirs[bucket_idx] = _keep_smallest_keys(
+                        *(np.concatenate(arrays) for arrays in zip(reservoirs[bucket_idx], (keys, pairs, lengths))),
+                        buckets[bucket_idx][0],
+                    )
+
+        if num_workers > 1:
+            # fork, as spawning workers would re-execute the launching script including the simulation app
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_path_sampling_worker,
+                initargs=(self.graph,),
+            ) as executor:
+                merge(executor.map(_worker_sample_pair_buckets, chunks, *([arg] * len(chunks) for arg in args)))
+        else:
+            merge(_sample_pair_buckets(self.graph, chunk, *args) for chunk in chunks)
+
+        # order by key, which is a random order
+        samples = []
+        for keys, pairs, lengths in reservoirs:
+            order = np.argsort(keys, kind="stable")
+            samples.append((torch.from_numpy(pairs[order]), lengths[order]))
+        return samples
+
     def _get_mesh_dimensions(self) -> tuple[float, float, float, float]:
         # get min, max of the mesh in the xy plane
         # Get bounds of the terrain
@@ -256,13 +453,146 @@ class TerrainAnalysis:
 
     def _get_save_path(self, seed, num_path: int, min_len: float, max_len: float) -> str:
         filename = f"paths_seed{seed}_paths{num_path}_min{min_len}_max{max_len}.pkl"
+        return os.path.join(self._get_save_dir(), filename)
+
+    def _get_save_dir(self) -> str:
         # get env name
         assert isinstance(self._env.scene.terrain.cfg.usd_path, str), "Only works with environments loaded from usd!"
         env_name = os.path.splitext(self._env.scene.terrain.cfg.usd_path)[0]
         # create directory if necessary
         filedir = os.path.join(self._env.scene.terrain.cfg.usd_path, env_name)
         os.makedirs(filedir, exist_ok=True)
-        return os.path.join(filedir, filename)
+        return filedir
+
+    def _get_raycaster(self) -> RayCaster:
+        """The raycaster sensor that is used to raycast against all the ground meshes."""
+        if self._raycaster is None:
+            raycaster = self._env.scene.sensors[self.cfg.raycaster_sensor]
+            if not isinstance(raycaster, RayCaster):
+                raise ValueError(f"Sensor {self.cfg.raycaster_sensor} is not a RayCaster sensor")
+            self._raycaster = raycaster
+        return self._raycaster
+
+    ###
+    # Graph cache
+    ###
+
+    def _get_graph_cache_dir(self) -> str:
+        return os.path.join(self._get_save_dir(), f"graph_{self._graph_hash()}")
+
+    def _graph_hash(self) -> str | None:
+        """Hash of the meshes and the config fields that define the graph.
+
+        The points and the graph are sampled with raycasts against all meshes of the raycaster, so the hash covers the
+        raycaster name and config, the geometry of its meshes and their poses in the first environment, besides the
+        terrain meshes. The poses are only fixed if the raycaster does not track the mesh transforms, i.e. in static
+        scenes. Returns None for raycasters that track the mesh transforms or do not expose the geometry of their
+        meshes.
+        """
+        if not hasattr(self, "_graph_hash_value"):
+            raycaster = self._get_raycaster()
+            self._graph_hash_value = None
+            if getattr(raycaster.cfg, "track_mesh_transforms", False):
+                print("[WARNING] The raycaster tracks the mesh transforms, the terrain graph is not cached.")
+                return None
+            raycaster_meshes = getattr(raycaster, "meshes", None)
+            if not isinstance(raycaster_meshes, dict):
+                print("[WARNING] The raycaster does not expose its meshes, the terrain graph is not cached.")
+                return None
+            sha = hashlib.sha1()
+            for name, mesh in sorted(self._env.scene.terrain.meshes.items()):
+                sha.update(name.encode())
+                sha.update(np.ascontiguousarray(mesh.vertices, dtype=np.float64).tobytes())
+                sha.update(np.ascontiguousarray(mesh.faces, dtype=np.int64).tobytes())
+            sha.update(self.cfg.raycaster_sensor.encode())
+            sha.update(repr(raycaster.cfg).encode())
+            for name, meshes in sorted(raycaster_meshes.items()):
+                sha.update(name.encode())
+                for mesh in meshes if isinstance(meshes, (list, tuple)) else [meshes]:
+                    sha.update(mesh.points.numpy().tobytes())
+                    sha.update(mesh.indices.numpy().tobytes())
+            # the poses of untracked meshes are the spawn poses
+            _, mesh_positions_w, mesh_orientations_w = self._get_mesh_handles()
+            sha.update(mesh_positions_w.cpu().numpy().tobytes())
+            sha.update(mesh_orientations_w.cpu().numpy().tobytes())
+            sha.update(repr([(field, getattr(self.cfg, field)) for field in GRAPH_CACHE_FIELDS]).encode())
+            self._graph_hash_value = sha.hexdigest()[:16]
+        return self._graph_hash_value
+
+    def _save_graph(self):
+        """Save the points and the CSR adjacency of the graph as ``.npy`` files."""
+        cache_dir = self._get_graph_cache_dir()
+        # write into a temporary directory first, such that a concurrent load never sees a partial cache
+        tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        np.save(os.path.join(tmp_dir, "points.npy"), self.points.cpu().numpy())
+        np.save(os.path.join(tmp_dir, "indptr.npy"), self.graph.indptr)
+        np.save(os.path.join(tmp_dir, "indices.npy"), self.graph.indices)
+        np.save(os.path.join(tmp_dir, "weights.npy"), self.graph.data)
+        try:
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            # another process saved the same graph in the meantime
+            for filename in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, filename))
+            os.rmdir(tmp_dir)
+        print(f"[INFO] Saved terrain graph to {cache_dir}.")
+
+    def _load_graph(self) -> bool:
+        """Load the points and the graph from the cache. Returns False if there is no cached graph."""
+        cache_dir = self._get_graph_cache_dir()
+        if not os.path.isdir(cache_dir):
+            return False
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+
+        points = load("points")
+        self.points = torch.from_numpy(np.array(points))
+        self.graph = csr_matrix((load("weights"), load("indices"), load("indptr")), shape=(len(points), len(points)))
+        return True
+
+    ###
+    # Raycasting
+    ###
+
+    def _raycast(
+        self, ray_starts: torch.Tensor, ray_directions: torch.Tensor, max_dist: float, return_distance: bool = False
+    ) -> tuple[torch.Tensor, torch.Tensor | None]:
+        """Cast the rays (num_rays, 3) against all meshes of the raycaster in a single launch.
+
+        Returns:
+            The hit positions (num_rays, 3) and, if requested, the hit distances (num_rays,) on the device of the ray
+            starts. Inf for missed hits.
+        """
+        mesh_ids_wp, mesh_positions_w, mesh_orientations_w = self._get_mesh_handles()
+        ray_hits, ray_distance = raycast_dynamic_meshes(
+            ray_starts=ray_starts.unsqueeze(0),
+            ray_directions=ray_directions.unsqueeze(0),
+            mesh_ids_wp=mesh_ids_wp,
+            mesh_positions_w=mesh_positions_w,
+            mesh_orientations_w=mesh_orientations_w,
+            max_dist=max_dist,
+            return_distance=return_distance,
+        )[:2]
+        ray_hits = ray_hits.squeeze(0).to(ray_starts.device)
+        if ray_distance is not None:
+            ray_distance = ray_distance.squeeze(0).to(ray_starts.device)
+        return ray_hits, ray_distance
+
+    def _get_mesh_handles(self) -> tuple[wp.array, torch.Tensor, torch.Tensor]:
+        """The warp mesh ids (1, num_meshes) and the poses of the raycaster meshes as a single batch.
+
+        The meshes are the same in all environments, so the ids and poses of the first environment are used. They are
+        created once and shared by all raycasts of the analysis."""
+        if self._mesh_handles is None:
+            raycaster = self._get_raycaster()
+            self._mesh_handles = (
+                wp.array(raycaster._mesh_ids_wp.numpy()[:1], dtype=wp.uint64, device=raycaster._mesh_ids_wp.device),
+                raycaster.data.mesh_positions_w[:1].to(torch.float32),
+                raycaster.data.mesh_orientations_w[:1].to(torch.float32),
+            )
+        return self._mesh_handles
 
     ###
     # Point filter functions
@@ -275,14 +605,7 @@ class TerrainAnalysis:
         ray_directions = torch.zeros((self.cfg.tree_nodes, 3), dtype=torch.float32)
         ray_directions[:, 2] = -1.0
 
-        # TODO add mesh_ids_wp
-        z_depth = raycast_dynamic_meshes(
-            ray_starts=ray_origins.unsqueeze(0),
-            ray_directions=ray_directions.unsqueeze(0),
-            meshes=np.array(self._raycaster._meshes, dtype=wp.Mesh),
-            max_dist=5,
-            return_distance=True,
-        )[1].squeeze(0)
+        z_depth = self._raycast(ray_origins, ray_directions, max_dist=5, return_distance=True)[1]
 
         # filter points outside the mesh and within walls
         filter_inside_mesh = torch.isfinite(z_depth)  # outside mesh
@@ -305,22 +628,19 @@ class TerrainAnalysis:
         # enforce a minimum distance to the walls
         angles = np.linspace(-np.pi, np.pi, 20)
         ray_directions = tf.Rotation.from_euler("z", angles, degrees=False).as_matrix() @ np.array([1, 0, 0])
-        ray_hit = []
-
-        for ray_direction in ray_directions:
-            ray_direction_torch = torch.from_numpy(ray_direction).repeat(ray_origins.shape[0], 1).type(torch.float32)
-            # TODO add mesh_ids_wp
-            distance = raycast_dynamic_meshes(
-                ray_starts=ray_origins.unsqueeze(0),
-                ray_directions=ray_direction_torch.unsqueeze(0),
-                meshes=np.array(self._raycaster._meshes, dtype=wp.Mesh),
-                max_dist=self.cfg.robot_buffer_spawn,
-                return_distance=True,
-            )[1].squeeze(0)
-            ray_hit.append(torch.isinf(distance))
+        ray_directions = torch.from_numpy(ray_directions).type(torch.float32)
+
+        # cast the rays of all points in all directions at once, shape (num_points * num_directions, 3)
+        num_points, num_directions = ray_origins.shape[0], ray_directions.shape[0]
+        distance = self._raycast(
+            ray_origins.unsqueeze(1).expand(-1, num_directions, -1).reshape(-1, 3),
+            ray_directions.unsqueeze(0).expand(num_points, -1, -1).reshape(-1, 3),
+            max_dist=self.cfg.robot_buffer_spawn,
+            return_distance=True,
+        )[1]
 
         # check if every point has the minimum distance in every direction
-        without_wall = torch.all(torch.vstack(ray_hit), dim=0)
+        without_wall = torch.isinf(distance).view(num_points, num_directions).all(dim=1)
 
         print(f"[INFO] filtered {ray_origins.shape[0] - without_wall.sum().item()} points too close to walls")
         ray_origins = ray_origins[without_wall].type(torch.float32)
@@ -347,13 +667,7 @@ class TerrainAnalysis:
         direction[:, 2] = -1.0
 
         # check for collision with raycasting
-        # TODO add mesh_ids_wp
-        hit_point = raycast_dynamic_meshes(
-            ray_starts=grid_points.unsqueeze(0),
-            ray_directions=direction.unsqueeze(0),
-            meshes=np.array(self._raycaster._meshes, dtype=wp.Mesh),
-            max_dist=15,
-        )[0].squeeze(0)
+        hit_point = self._raycast(grid_points, direction, max_dist=15)[0]
 
         height_grid = hit_point[:, 2].reshape(
             int((x_max - x_min) / self.cfg.grid_resolution), int((y_max - y_min) / self.cfg.grid_resolution)
@@ -363,7 +677,7 @@ class TerrainAnalysis:
         height_diff = torch.diff(height_grid, dim=0, append=torch.zeros(1, height_grid.shape[1])) + torch.diff(
             height_grid, dim=1, append=torch.zeros(height_grid.shape[0], 1)
         )
-        height_diff = np.abs(height_diff.cpu().numpy()) > self.cfg.height_diff_threshold
+        height_diff = (torch.abs(height_diff) > self.cfg.height_diff_threshold).to(self._env.device)
 
         # identify which edges are on different heights
         edge_idx = torch.abs(self.points[idx_edge_start, 2] - self.points[idx_edge_end, 2]) > 0.1
@@ -373,27 +687,17 @@ class TerrainAnalysis:
         check_idx_edge_end = idx_edge_end[edge_idx]
 
         check_grid_idx_start = (
-            ((self.points[check_idx_edge_start, :2] - torch.tensor([x_min, y_min])) / self.cfg.grid_resolution)
-            .int()
-            .cpu()
-            .numpy()
-        )
+            (self.points[check_idx_edge_start, :2] - torch.tensor([x_min, y_min])) / self.cfg.grid_resolution
+        ).int()
         check_grid_idx_end = (
-            ((self.points[check_idx_edge_end, :2] - torch.tensor([x_min, y_min])) / self.cfg.grid_resolution)
-            .int()
-            .cpu()
-            .numpy()
-        )
-
-        filter_idx = np.zeros(check_idx_edge_start.shape[0], dtype=bool)
+            (self.points[check_idx_edge_end, :2] - torch.tensor([x_min, y_min])) / self.cfg.grid_resolution
+        ).int()
 
-        for idx, (edge_start_idx, edge_end_idx) in enumerate(zip(check_grid_idx_start, check_grid_idx_end)):
-            grid_idx_x, grid_idx_y = line(edge_start_idx[0], edge_start_idx[1], edge_end_idx[0], edge_end_idx[1])
-
-            filter_idx[idx] = np.any(height_diff[grid_idx_x, grid_idx_y])
+        # check if the lines between the edge points cross a height difference
+        filter_idx = lines_cross_grid(height_diff, check_grid_idx_start, check_grid_idx_end)
 
         # set the indexes that should be removed in edge_idx to true
-        edge_idx[edge_idx.clone()] = torch.tensor(filter_idx)
+        edge_idx[edge_idx.clone()] = filter_idx.cpu()
         edge_idx = edge_idx.cpu().numpy()
         # filter edges
         idx_edge_start_filtered = idx_edge_start[edge_idx]
@@ -416,13 +720,8 @@ class TerrainAnalysis:
         min_distance = torch.norm(origin_point - neighbor_points, dim=1)
 
         # check for collision with raycasting
-        # TODO add mesh_ids_wp
-        distance = raycast_dynamic_meshes(
-            ray_starts=origin_point.unsqueeze(0),
-            ray_directions=(origin_point - neighbor_points).unsqueeze(0),
-            meshes=np.array(self._raycaster._meshes, dtype=wp.Mesh),
-            max_dist=self.cfg.max_path_length,
-            return_distance=True,
+        distance = self._raycast(
+            origin_point, origin_point - neighbor_points, max_dist=self.cfg.max_path_length, return_distance=True
         )[1]
 
         distance[torch.isinf(distance)] = self.cfg.max_path_length
@@ -0,0 +1,102 @@
+"""Helpers shared by the history observation terms.
+
+The resets of the history buffers are expressed as masked in-place operations on preallocated device tensors, such
+that they neither synchronize the host with the device (no ``nonzero``, boolean indexing or ``.any()`` branches) nor
+allocate new buffers every step.
+"""
+
+from __future__ import annotations
+
+import torch
+import warnings
+from collections.abc import Sequence
+
+
+def env_mask_from_ids(mask: torch.Tensor, env_ids: Sequence[int] | torch.Tensor | None) -> torch.Tensor:
+    """Write the environments to reset into a preallocated boolean mask.
+
+    Args:
+        mask: The preallocated boolean mask of shape (num_envs,). It is overwritten in-place.
+        env_ids: The environment ids or a boolean mask of shape (num_envs,). None selects all environments.
+
+    Returns:
+        The boolean mask of the environments to reset.
+    """
+    if env_ids is None:
+        mask.fill_(True)
+    elif isinstance(env_ids, torch.Tensor) and env_ids.dtype == torch.bool:
+        mask.copy_(env_ids)
+    else:
+        mask.fill_(False)
+        mask[env_ids] = True
+    return mask
+
+
+def _expand_mask(mask: torch.Tensor, buffer: torch.Tensor) -> torch.Tensor:
+    """View the environment mask of shape (num_envs,) such that it broadcasts over the buffer."""
+    return mask.view(-1, *([1] * (buffer.dim() - 1)))
+
+
+def masked_reset_(buffer: torch.Tensor, mask: torch.Tensor, value: float = 0.0) -> torch.Tensor:
+    """Set all entries of the masked environments of the buffer to a value in-place.
+
+    Args:
+        buffer: The buffer of shape (num_envs, ...). It may be a view of a larger buffer.
+        mask: The boolean mask of the environments to reset of shape (num_envs,).
+        value: The value to fill. Defaults to 0.0.
+
+    Returns:
+        The buffer.
+    """
+    return buffer.masked_fill_(_expand_mask(mask, buffer), value)
+
+
+def masked_fill_history_(buffer: torch.Tensor, mask: torch.Tensor, values: torch.Tensor) -> torch.Tensor:
+    """Fill all history slots of the masked environments with a single value per environment in-place.
+
+    This replaces ``buffer[env_ids] = values[env_ids].unsqueeze(1).repeat(1, history_length, ...)``.
+
+    Args:
+        buffer: The history buffer of shape (num_envs, history_length, ...).
+        mask: The boolean mask of the environments to fill of shape (num_envs,).
+        values: The values of shape (num_envs, ...). They must not share memory with the buffer.
+
+    Returns:
+        The buffer.
+    """
+    return torch.where(_expand_mask(mask, buffer), values.unsqueeze(1), buffer, out=buffer)
+
+
+class CudaSyncCounter:
+    """Context manager that counts the host-device synchronizations of the enclosed CUDA operations.
+
+    It relies on the CUDA sync debug mode of torch, which warns for every synchronizing operation. On machines without
+    CUDA, the count stays zero.
+
+    Example:
+
+    .. code-block:: python
+
+        with CudaSyncCounter() as counter:
+            obs = term.get_history(env)
+        print(counter.count)
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self) -> CudaSyncCounter:
+        self._enabled = torch.cuda.is_available()
+        if self._enabled:
+            self._catch = warnings.catch_warnings(record=True)
+            self._records = self._catch.__enter__()
+            warnings.simplefilter("always")
+            self._prev_mode = torch.cuda.get_sync_debug_mode()
+            torch.cuda.set_sync_debug_mode("warn")
+        return self
+
+    def __exit__(self, *args):
+        if self._enabled:
+            torch.cuda.set_sync_debug_mode(self._prev_mode)
+            self._catch.__exit__(*args)
+            self.count += sum("synchronizing" in str(record.message) for record in self._records)
@@ -10,6 +10,7 @@ from omni.isaac.lab.managers import ManagerTermBase
 from omni.isaac.lab.sensors import RayCaster
 
 import crowd_navigation_mt.mdp as mdp  # noqa: F401, F403
+from .history_utils import env_mask_from_ids, masked_fill_history_, masked_reset_
 from .lidar_history_cfg import LidarHistoryTermCfg
 
 from omni.isaac.lab.utils import math as math_utils
@@ -63,6 +64,15 @@ class LidarHistory(ManagerTermBase):
         self.return_pose_history = self._cfg.return_pose_history
         self.decimation = self._cfg.decimation
         self.sensor_cfg = self._cfg.sensor_cfg
+        self.buffer_mode = self._cfg.buffer_mode
+        if self.buffer_mode not in ("roll", "ring"):
+            raise ValueError(f"Unknown lidar history buffer mode '{self.buffer_mode}'.")
+
+        # the pose buffers are rolled by this shift every step (equals -1 for the configured single-step histories)
+        self._pose_shift = 11
+        # ring buffer write heads, physical index of the oldest entry of the lidar and pose buffers
+        self._lidar_head = 0
+        self._pose_head = 0
 
     def __call__(self, *args, **kwargs) -> torch.Any:
 
@@ -79,8 +89,11 @@ class LidarHistory(ManagerTermBase):
         """Resets the manager term and the buffers created for lidar history.
 
         Args:
-            env_ids: The environment ids. Defaults to None, in which case
-                all environments are considered.
+            env_ids: The environment ids or a boolean mask of the environments. Defaults to None, in which case
+                the terminated environments are considered.
+
+        Returns:
+            The boolean mask of the reset environments of shape (num_envs,).
         """
         # Initialize buffer if empty
         if self.lidar_buffer is None or self.position_buffer is None or self.yaw_buffer is None:
@@ -93,18 +106,23 @@ class LidarHistory(ManagerTermBase):
             )
             self.position_buffer = torch.zeros((self.num_envs, self.history_length + 1, 3)).to(self.device)
             self.yaw_buffer = torch.zeros((self.num_envs, self.history_length + 1)).to(self.device)
-        
+            self._reset_mask = torch.zeros(self.num_envs, dtype=torch.bool, device=self.device)
+            self._oldest_yaw = torch.zeros(self.num_envs, device=self.device)
+            if self.buffer_mode == "ring":
+                self._init_ring_buffers(lidar.data.distances.shape[-1])
+
         if env_ids is None:
             try:
-                env_ids = torch.nonzero(self._env.termination_manager.dones).flatten()
+                env_ids = self._env.termination_manager.dones
             except AttributeError:
-                # env_ids = torch.ones((self.num_envs), dtype=torch.bool).to(self.device)
-                env_ids = torch.arange(0, self.num_envs, dtype=int).to(self.device)
+                # all environments are reset before the termination manager exists
+                env_ids = None
+        reset_mask = env_mask_from_ids(self._reset_mask, env_ids)
 
         # Reset buffer for terminated episodes
-        self.lidar_buffer[env_ids, :, :] = 0.0
-        self.position_buffer[env_ids, :, :] = 0.0
-        self.yaw_buffer[env_ids, :] = 0.0
+        masked_reset_(self.lidar_buffer, reset_mask)
+        masked_reset_(self.position_buffer, reset_mask)
+        masked_reset_(self.yaw_buffer, reset_mask)
 
         # return torch.nonzero(terminated_mask).flatten()
 
@@ -131,7 +149,32 @@ class LidarHistory(ManagerTermBase):
 
         # # return torch.nonzero(terminated_mask).flatten()
         # return torch.nonzero(env_ids).flatten()
-        return env_ids
+        return reset_mask
+
+    def _init_ring_buffers(self, num_rays: int):
+        """Initialize the gather tables and the output buffer of the ring buffer mode.
+
+        Row ``h`` of a gather table holds the physical indices of the decimated history slots when the oldest entry
+        is stored at physical index ``h``.
+
+        Args:
+            num_rays: The number of lidar rays.
+        """
+        num_out = len(range(0, self.history_length, self.decimation))
+        heads = torch.arange(self.history_length + 1, device=self.device).unsqueeze(1)
+        slots = torch.arange(0, self.history_length, self.decimation, device=self.device).unsqueeze(0)
+        self._lidar_gather_idx = (heads[:-1] + slots) % self.history_length
+        self._pose_gather_idx = (heads + slots + 1) % (self.history_length + 1)
+
+        # the lidar history is gathered directly into the first part of the output, the poses into the second part
+        if self.return_pose_history:
+            self._history_out = torch.zeros((self.num_envs, num_out * (num_rays + 3)), device=self.device)
+            self._lidar_out = self._history_out[:, : num_out * num_rays].view(self.num_envs, num_out, num_rays)
+            self._pose_out = self._history_out[:, num_out * num_rays :].view(self.num_envs, num_out, 3)
+        else:
+            self._lidar_out = torch.zeros((self.num_envs, num_out, num_rays), device=self.device)
+        self._lidar_head = 0
+        self._pose_head = 0
 
     def get_history(self, env: ManagerBasedRLEnv):
         """Get the history of actions.
@@ -139,9 +182,12 @@ class LidarHistory(ManagerTermBase):
         Args:
             env: The environment object.
         """
+        if self.buffer_mode == "ring":
+            return self._get_history_ring(env)
+
         sensor: RayCaster = env.scene.sensors[self.sensor_cfg.name]
         # Reset buffer for terminated episodes
-        reset_idx = self.reset()
+        reset_mask = self.reset()
 
         # update buffers
         # Return updates buffer
@@ -157,7 +203,7 @@ class LidarHistory(ManagerTermBase):
         distances = sensor.data.distances
         # distances = shift_point_indices_by_heading(distances, self.yaw_buffer[:, 0])
         # before all the infinite sensor measurements were set to 0.0, why?
-        distances[torch.isinf(distances)] = 0.0
+        distances.masked_fill_(torch.isinf(distances), 0.0)
         # distances[torch.isinf(distances)] = sensor.cfg.max_distance
 
         self.lidar_buffer[:, -1, :] = distances  # lidar distances
@@ -177,12 +223,9 @@ class LidarHistory(ManagerTermBase):
 
         self.position_buffer[:, -1, :] = sensor.data.pos_w  # sensor positions world frame
 
-        # reset relative positions and yaw for terminated episodes
-        if reset_idx.any():
-            self.position_buffer[reset_idx] = (
-                sensor.data.pos_w[reset_idx].unsqueeze(1).repeat(1, self.history_length + 1, 1)
-            )
-            self.yaw_buffer[reset_idx] = self.yaw_buffer[reset_idx, 0].unsqueeze(1).repeat(1, self.history_length + 1)
+        # reset relative positions and yaw for terminated episodes, the yaw history of these was zeroed in reset
+        masked_fill_history_(self.position_buffer, reset_mask, sensor.data.pos_w)
+        masked_reset_(self.yaw_buffer, reset_mask)
 
         # update relative positions and yaw
         relative_history_positions = self.position_buffer[..., :2] - self.position_buffer[:, :1, :2]
@@ -193,13 +236,11 @@ class LidarHistory(ManagerTermBase):
         # reset if jump in position
         if self.history_length > 1:
             jumped = torch.norm(relative_history_positions[:, 1], dim=1) > 1.5
-            if jumped.any():
-                self.position_buffer[jumped] = (
-                    sensor.data.pos_w[jumped].unsqueeze(1).repeat(1, self.history_length + 1, 1)
-                )
-                self.yaw_buffer[jumped] = self.yaw_buffer[jumped, 0].unsqueeze(1).repeat(1, self.history_length + 1)
-                self.lidar_buffer[jumped, 1:, :] = 0.0
-                history_pose[jumped] = 0.0
+            masked_fill_history_(self.position_buffer, jumped, sensor.data.pos_w)
+            self._oldest_yaw.copy_(self.yaw_buffer[:, 0])
+            masked_fill_history_(self.yaw_buffer, jumped, self._oldest_yaw)
+            masked_reset_(self.lidar_buffer[:, 1:], jumped)
+            masked_reset_(history_pose, jumped)
 
         # adds additional 3 observations, which is the difference in position of the robot from the previous to the 
         # current step
@@ -233,6 +274,84 @@ class LidarHistory(ManagerTermBase):
 
         return full_history
 
+    def _get_history_ring(self, env: ManagerBasedRLEnv):
+        """Get the history of lidar distances and poses using the ring buffers.
+
+        Instead of rolling the buffers, the write heads are advanced and only the newest slice is written. The
+        decimated history is gathered in chronological order into a preallocated output tensor. The result is
+        identical to the roll based :meth:`get_history`.
+
+        Args:
+            env: The environment object.
+        """
+        sensor: RayCaster = env.scene.sensors[self.sensor_cfg.name]
+        # Reset buffer for terminated episodes
+        reset_mask = self.reset()
+
+        # advance the heads, equivalent to rolling the buffers
+        self._lidar_head = (self._lidar_head + 1) % self.history_length
+        self._pose_head = (self._pose_head + self._pose_shift) % (self.history_length + 1)
+        lidar_newest = (self._lidar_head - 1) % self.history_length
+        pose_newest = (self._pose_head - 1) % (self.history_length + 1)
+        pose_oldest = self._pose_head
+
+        self.yaw_buffer[:, pose_newest] = math_utils.axis_angle_from_quat(math_utils.yaw_quat(sensor.data.quat_w))[
+            :, 2
+        ]  # sensor yaw
+
+        distances = sensor.data.distances
+        distances.masked_fill_(torch.isinf(distances), 0.0)
+        self.lidar_buffer[:, lidar_newest, :] = distances  # lidar distances
+        self.position_buffer[:, pose_newest, :] = sensor.data.pos_w  # sensor positions world frame
+
+        # reset relative positions and yaw for terminated episodes, the yaw history of these was zeroed in reset
+        masked_fill_history_(self.position_buffer, reset_mask, sensor.data.pos_w)
+        masked_reset_(self.yaw_buffer, reset_mask)
+
+        # reset if jump in position
+        if self.history_length > 1:
+            pose_second = (pose_oldest + 1) % (self.history_length + 1)
+            jumped = (
+                torch.norm(
+                    self.position_buffer[:, pose_second, :2] - self.position_buffer[:, pose_oldest, :2], dim=1
+                )
+                > 1.5
+            )
+        else:
+            jumped = None
+
+        # gather the decimated, chronologically ordered history
+        lidar_idx = self._lidar_gather_idx[self._lidar_head]
+        pose_idx = self._pose_gather_idx[pose_oldest]
+        oldest_position = self.position_buffer[:, pose_oldest : pose_oldest + 1, :2]
+        oldest_yaw = self.yaw_buffer[:, pose_oldest : pose_oldest + 1]
+        if self.return_pose_history:
+            # the relative pose is computed before the jump reset, as in the roll based history
+            torch.sub(
+                torch.index_select(self.position_buffer[..., :2], 1, pose_idx),
+                oldest_position,
+                out=self._pose_out[..., :2],
+            )
+            self._pose_out[..., 2] = math_utils.wrap_to_pi(
+                torch.index_select(self.yaw_buffer, 1, pose_idx) - oldest_yaw
+            )
+
+        if jumped is not None:
+            masked_fill_history_(self.position_buffer, jumped, sensor.data.pos_w)
+            self._oldest_yaw.copy_(self.yaw_buffer[:, pose_oldest])
+            masked_fill_history_(self.yaw_buffer, jumped, self._oldest_yaw)
+            # all but the oldest lidar entry
+            masked_reset_(self.lidar_buffer[:, : self._lidar_head], jumped)
+            masked_reset_(self.lidar_buffer[:, self._lidar_head + 1 :], jumped)
+            if self.return_pose_history:
+                masked_reset_(self._pose_out, jumped)
+
+        torch.index_select(self.lidar_buffer, 1, lidar_idx, out=self._lidar_out)
+
+        if self.return_pose_history:
+            return self._history_out
+        return self._lidar_out
+
 
 
 # def get_history(self, env: ManagerBasedRLEnv):
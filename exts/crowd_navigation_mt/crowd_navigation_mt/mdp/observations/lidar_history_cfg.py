@@ -10,7 +10,7 @@ from __future__ import annotations
 import torch
 from collections.abc import Callable
 from dataclasses import MISSING
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Literal
 
 from omni.isaac.lab.utils import configclass
 from omni.isaac.lab.utils.modifiers import ModifierCfg
@@ -43,4 +43,21 @@ class LidarHistoryTermCfg(ObservationTermCfg):
     
     return_pose_history: bool = True
     
-    decimation: int = 1
\ No newline at end of file
+    decimation: int = 1
+    """Decimation of the observed history. Defaults to 1.
+
+    The buffers store ``history_length * decimation`` steps and every ``decimation``-th of them is observed, i.e. the
+    scans that are ``decimation - 1``, ``2 * decimation - 1``, ..., ``history_length * decimation - 1`` steps old.
+    Since the history is observed every step, each stored scan is observed at some later step and the buffers can not
+    be reduced to the observed slots without changing the observation.
+    """
+
+    buffer_mode: Literal["roll", "ring"] = "roll"
+    """Storage layout of the history buffers. Defaults to "roll".
+
+    - ``"roll"``: the buffers are rolled along the time axis every step (copies the full history).
+    - ``"ring"``: the buffers are circular with a write head, one slice is written per step and the decimated
+      history is gathered in chronological order into a preallocated output tensor.
+
+    Both modes return identical observations.
+    """
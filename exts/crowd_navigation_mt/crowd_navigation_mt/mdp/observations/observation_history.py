@@ -13,6 +13,7 @@ from omni.isaac.lab.managers import ObservationTermCfg, ObservationManager
 from omni.isaac.lab.sensors import CameraCfg, ContactSensorCfg, RayCasterCfg, patterns, RayCaster
 
 import crowd_navigation_mt.mdp as mdp  # noqa: F401, F403
+from .history_utils import env_mask_from_ids, masked_reset_
 from .observation_history_cfg import ObservationHistoryTermCfg
 
 
@@ -53,6 +54,7 @@ class ObservationHistory(ManagerTermBase):
             "actions": torch.empty(size=(0, self.cfg.history_length_actions, 3)),
             "positions": torch.empty(size=(0, self.cfg.history_length_positions, 2)),
         }
+        self._reset_mask = torch.zeros(self.num_envs, dtype=torch.bool, device=self.device)
 
     def __call__(self, *args, **kwargs) -> torch.Any:
 
@@ -66,23 +68,29 @@ class ObservationHistory(ManagerTermBase):
             
         return method(*args)
 
-    def reset(self, env_ids: Sequence[int] | None = None, buffer_names: list = ["actions", "positions"], *args):
+    def reset(
+        self,
+        env_ids: Sequence[int] | torch.Tensor | None = None,
+        buffer_names: list = ["actions", "positions"],
+        *args,
+    ):
         """Reset the buffers for terminated episodes.
 
         Args:
-            env: The environment object.
+            env_ids: The environment ids or a boolean mask of the environments. Defaults to None, in which case
+                no buffer is reset.
+            buffer_names: The names of the buffers to reset.
         """
         if env_ids is None:
             return {}
-        
-        terminated_mask = torch.zeros((self.num_envs), dtype=torch.bool)
-        terminated_mask[env_ids] = True
+
+        terminated_mask = env_mask_from_ids(self._reset_mask, env_ids)
 
         for key in buffer_names:
             if self.buffers[key].shape[0] == 0:
                 self.buffers[key] = torch.zeros((self.num_envs, *list(self.buffers[key].shape[1:]))).to(device=self.device)
 
-            self.buffers[key][terminated_mask,:,:] = 0.0
+            masked_reset_(self.buffers[key], terminated_mask)
 
         # try:
         #     terminated_mask = env_ids.termination_manager.dones
@@ -144,7 +152,7 @@ class ObservationHistory(ManagerTermBase):
         try:
             env_ids = env.termination_manager.dones
         except AttributeError:
-            env_ids = torch.arange(self.num_envs)
+            env_ids = torch.arange(self.num_envs, device=self.device)
 
 
         self.reset(env_ids, ["positions"])
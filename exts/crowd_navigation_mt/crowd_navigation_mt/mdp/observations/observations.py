@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import torch
-from typing import TYPE_CHECKING
+import weakref
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, NamedTuple
 
 from omni.isaac.lab.envs import ManagerBasedEnv, ManagerBasedRLEnv
 from omni.isaac.lab.managers import SceneEntityCfg
@@ -13,6 +15,7 @@ import crowd_navigation_mt.mdp as mdp  # noqa: F401, F403
 
 from omni.isaac.lab.utils import math as math_utils
 from ..actions import NavigationSE2Action
+from .obstacle_grid import ObstacleGrid
 
 if TYPE_CHECKING:
     from omni.isaac.lab.envs import ManagerBasedRLEnvCfg
@@ -45,7 +48,7 @@ def transform_w_points_to_b_points(
     # shift points to the sensor's frame origin
     points_w_shifted = math_utils.transform_points(points=points_w, pos=-w_r_wb)
     # convert inf to nan values
-    pc_w_shifted = torch.where(torch.isinf(points_w_shifted), torch.tensor(float("NaN")), points_w_shifted)
+    pc_w_shifted = points_w_shifted.masked_fill(torch.isinf(points_w_shifted), float("nan"))
 
     # rotate the points to the sensor's frame
     quat_inv = math_utils.quat_inv(quat) if not yaw else math_utils.yaw_quat(math_utils.quat_inv(quat))
@@ -54,6 +57,112 @@ def transform_w_points_to_b_points(
     return points_b
 
 
+def process_ray_hits(
+    ray_hits_w: torch.Tensor,
+    ray_hit_mesh_idx: torch.Tensor,
+    pos_w: torch.Tensor,
+    quat_w: torch.Tensor,
+    yaw_only: bool = False,
+) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Post-process the ray hits of a lidar in a single pass.
+
+    Rays without a hit (non-finite hit position) are masked at the end instead of propagating NaN values through the
+    transformation. The function only uses device-side operations and no host constants, such that it can be traced
+    by ``torch.compile``.
+
+    Args:
+        ray_hits_w: The ray hit positions in the world frame. Shape is (num_envs, num_rays, 3).
+        ray_hit_mesh_idx: The index of the mesh hit by each ray. Shape is (num_envs, num_rays, 1).
+        pos_w: The sensor positions in the world frame. Shape is (num_envs, 3).
+        quat_w: The sensor orientations (w, x, y, z) in the world frame. Shape is (num_envs, 4).
+        yaw_only: Whether to only rotate by the yaw of the sensor. Defaults to False.
+
+    Returns:
+        A tuple containing the ray hits in the sensor frame with zeros for rays without a hit (num_envs, num_rays, 3),
+        the mask of the rays with a hit (num_envs, num_rays) and the mesh index of each ray with -1 for rays without
+        a hit (num_envs, num_rays, 1).
+    """
+    valid = torch.isfinite(ray_hits_w).all(dim=-1)
+    quat_inv = math_utils.quat_inv(quat_w)
+    if yaw_only:
+        quat_inv = math_utils.yaw_quat(quat_inv)
+    points_b = math_utils.transform_points(ray_hits_w - pos_w.unsqueeze(1), quat=quat_inv)
+    points_b = torch.where(valid.unsqueeze(-1), points_b, 0.0)
+    seg_ids = torch.where(valid.unsqueeze(-1), ray_hit_mesh_idx, -1)
+    return points_b, valid, seg_ids
+
+
+def _gather_per_ray(values_per_mesh: torch.Tensor, seg_ids: torch.Tensor) -> torch.Tensor:
+    """Gather the per-mesh values of shape (num_envs, num_meshes, dim) for each ray, zero for rays without a hit."""
+    seg_ids = seg_ids.squeeze(-1)
+    values_per_ray = torch.gather(
+        values_per_mesh, 1, seg_ids.clamp(min=0).unsqueeze(-1).expand(-1, -1, values_per_mesh.shape[-1])
+    )
+    return torch.where((seg_ids == -1).unsqueeze(-1), 0.0, values_per_ray)
+
+
+"""Per-step cache of shared lidar quantities"""
+
+_LIDAR_STEP_CACHES: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+_LIDAR_RESET_COUNTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+"""Number of :func:`clear_lidar_step_cache` calls of every environment."""
+
+
+def lidar_step_cache(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> dict:
+    """Cache of the lidar quantities of a sensor that are shared by several observation terms.
+
+    The cache is keyed by the sensor name, ``env.common_step_counter`` and the number of resets counted by
+    :func:`clear_lidar_step_cache`, such that every quantity is computed at most once per environment step. Environments
+    without a step counter (e.g. during the manager initialization) get an empty cache on every call.
+
+    As the sensor data of reset environments changes without a step, configs using the cached terms must add
+    :func:`clear_lidar_step_cache` as the first reset event. Otherwise, quantities of the last step are returned after a
+    reset.
+    """
+    step = getattr(env, "common_step_counter", None)
+    if step is None:
+        return {}
+    step = (step, _LIDAR_RESET_COUNTS.get(env, 0))
+    env_caches = _LIDAR_STEP_CACHES.setdefault(env, {})
+    cache = env_caches.get(sensor_cfg.name)
+    if cache is None or cache["step"] != step:
+        cache = {"step": step}
+        env_caches[sensor_cfg.name] = cache
+    return cache
+
+
+def _lidar_step_cached(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, key, compute: Callable):
+    """Return the cached quantity of the current step or compute and cache it.
+
+    The returned tensors are shared between the observation terms and must not be modified in-place.
+    """
+    cache = lidar_step_cache(env, sensor_cfg)
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def clear_lidar_step_cache(env: ManagerBasedEnv, env_ids: Sequence[int] | None = None):
+    """Clear the lidar step cache of the environment. Meant to be used as the first reset event."""
+    _LIDAR_RESET_COUNTS[env] = _LIDAR_RESET_COUNTS.get(env, 0) + 1
+    _LIDAR_STEP_CACHES.pop(env, None)
+
+
+def _lidar_ray_hits(
+    env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, yaw_only: bool = False
+) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """The cached output of :func:`process_ray_hits` for the given sensor."""
+
+    def compute():
+        sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
+        return process_ray_hits(
+            sensor.data.ray_hits_w, sensor.data.ray_hit_mesh_idx, sensor.data.pos_w, sensor.data.quat_w, yaw_only
+        )
+
+    return _lidar_step_cached(env, sensor_cfg, ("ray_hits", yaw_only), compute)
+
+
 # def shift_point_indices_by_heading(points: torch.Tensor, yaw: torch.Tensor) -> torch.Tensor:
 #     """Shift indices of points by the heading angle."""
 #     num_points = points.shape[1]
@@ -113,16 +222,7 @@ def heigh_scan_binary(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> torch
 
 def lidar_obs(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, yaw_only: bool = False) -> torch.Tensor:
     """lidar scan from the given sensor. returns a pointcloud in the sensor's frame."""
-    # TODO: check if this works
-    # extract the used quantities (to enable type-hinting)
-    sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
-    pc_w = sensor.data.ray_hits_w
-    sensor_pos_w = sensor.data.pos_w
-    sensor_quat_w = sensor.data.quat_w
-
-    ray_hits_b = transform_w_points_to_b_points(pc_w, sensor_pos_w, sensor_quat_w, yaw=yaw_only)
-    ray_hits_b = torch.where(torch.isnan(ray_hits_b), torch.tensor(0), ray_hits_b)
-    return ray_hits_b
+    return _lidar_ray_hits(env, sensor_cfg, yaw_only)[0]
 
 
 def lidar_obs_dist(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, flatten: bool = False) -> torch.Tensor:
@@ -135,19 +235,13 @@ def lidar_obs_dist(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, flatten: bo
 
 def lidar_obs_vel_rel(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> torch.Tensor:
     """returns the velocity of the meshes of each ray hit position in the sensor's frame."""
-    mesh_velocities_per_env, omega = obs_vel(env, sensor_cfg)
-    pointcloud_mesh_ids = lidar_panoptic_segmentation(env, sensor_cfg, binary=False).squeeze()
-
-    invalid_mask = pointcloud_mesh_ids == -1
-
-    pointcloud_mesh_ids = pointcloud_mesh_ids.clone()
-    pointcloud_mesh_ids[invalid_mask] = 0
 
-    velocity_per_points = torch.gather(mesh_velocities_per_env, 1, pointcloud_mesh_ids.unsqueeze(-1).expand(-1, -1, 3))
+    def compute():
+        mesh_velocities_per_env, omega = obs_vel(env, sensor_cfg)
+        pointcloud_mesh_ids = lidar_panoptic_segmentation(env, sensor_cfg, binary=False)
+        return _gather_per_ray(mesh_velocities_per_env, pointcloud_mesh_ids)
 
-    velocity_per_points[invalid_mask] = torch.tensor([0.0, 0.0, 0.0], device=velocity_per_points.device)
-
-    return velocity_per_points
+    return _lidar_step_cached(env, sensor_cfg, "ray_velocities_rel", compute)
 
 
 def lidar_obs_vel_norm(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> torch.Tensor:
@@ -167,11 +261,11 @@ def lidar_obs_vel_rel_heading(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg)
     norm_velocities = velocities_2d.norm(dim=2)
     cos_theta = dot_products / (norm_points * norm_velocities)
 
-    # Mask where the norms product is close to zero
-    mask_zero = torch.isclose(norm_points * norm_velocities, torch.tensor(0.0))
+    # Mask where the norms product is close to zero (same tolerance as torch.isclose)
+    mask_zero = (norm_points * norm_velocities).abs() <= 1e-8
 
     # Set the cos_theta to 0 where the product of the norms is close to zero
-    cos_theta[mask_zero] = 0
+    cos_theta = cos_theta.masked_fill(mask_zero, 0.0)
 
     # Calculate angles (in radians)
     angles = torch.acos(cos_theta.clamp(-1, 1))  # Clamping to ensure within the valid range for acos
@@ -205,16 +299,8 @@ def lidar_obs_vel_b_static_2d(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg,
         mesh_velocities_w, quat=math_utils.quat_inv(sensor.data.quat_w)
     )[..., :2]
 
-    pointcloud_mesh_ids = lidar_panoptic_segmentation(env, sensor_cfg, binary=False).squeeze()
-
-    invalid_mask = pointcloud_mesh_ids == -1
-
-    pointcloud_mesh_ids = pointcloud_mesh_ids.clone()
-    pointcloud_mesh_ids[invalid_mask] = 0
-
-    velocity_per_points = torch.gather(mesh_velocities_rotated, 1, pointcloud_mesh_ids.unsqueeze(-1).expand(-1, -1, 2))
-
-    velocity_per_points[invalid_mask] = torch.tensor([0.0, 0.0], device=velocity_per_points.device)
+    pointcloud_mesh_ids = lidar_panoptic_segmentation(env, sensor_cfg, binary=False)
+    velocity_per_points = _gather_per_ray(mesh_velocities_rotated, pointcloud_mesh_ids)
 
     return velocity_per_points[..., :2].reshape(env.num_envs, -1) if flatten else velocity_per_points[..., :2]
 
@@ -226,25 +312,29 @@ def lidar_obs_vel_b_static_2d(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg,
 
 def obs_vel(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> tuple[torch.Tensor, torch.Tensor]:
     """velocity of the all meshes in all sensor frames (rot vel ignored)."""
-    sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
 
-    mesh_velocities_w = sensor.data.mesh_velocities_w
-    mesh_angular_velocities_w = sensor.data.mesh_angular_velocities_w
+    def compute():
+        sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
 
-    robot_velocities_w = sensor.data.vel_w
-    robot_angular_velocities_w = sensor.data.rot_vel_w
+        mesh_velocities_w = sensor.data.mesh_velocities_w
+        mesh_angular_velocities_w = sensor.data.mesh_angular_velocities_w
 
-    mesh_velocities_shifted = mesh_velocities_w - robot_velocities_w.unsqueeze(1)
-    mesh_angular_velocities_shifted = mesh_angular_velocities_w - robot_angular_velocities_w.unsqueeze(1)
+        robot_velocities_w = sensor.data.vel_w
+        robot_angular_velocities_w = sensor.data.rot_vel_w
 
-    mesh_velocities_rotated = math_utils.transform_points(
-        mesh_velocities_shifted, quat=math_utils.quat_inv(sensor.data.quat_w)
-    )
-    mesh_angular_velocities_rotated = math_utils.transform_points(
-        mesh_angular_velocities_shifted, quat=math_utils.quat_inv(sensor.data.quat_w)
-    )
+        mesh_velocities_shifted = mesh_velocities_w - robot_velocities_w.unsqueeze(1)
+        mesh_angular_velocities_shifted = mesh_angular_velocities_w - robot_angular_velocities_w.unsqueeze(1)
 
-    return mesh_velocities_rotated, mesh_angular_velocities_rotated
+        mesh_velocities_rotated = math_utils.transform_points(
+            mesh_velocities_shifted, quat=math_utils.quat_inv(sensor.data.quat_w)
+        )
+        mesh_angular_velocities_rotated = math_utils.transform_points(
+            mesh_angular_velocities_shifted, quat=math_utils.quat_inv(sensor.data.quat_w)
+        )
+
+        return mesh_velocities_rotated, mesh_angular_velocities_rotated
+
+    return _lidar_step_cached(env, sensor_cfg, "mesh_velocities_rel", compute)
 
 
 def lidar_privileged_mesh_pos_obs(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> torch.Tensor:
@@ -260,24 +350,116 @@ def lidar_privileged_mesh_pos_obs(env: ManagerBasedEnv, sensor_cfg: SceneEntityC
     return transform_w_points_to_b_points(mesh_pos, sensor_pos_w, sensor_quat_w)
 
 
-def obstacle_positions_sorted_flat(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, closest_N: int) -> torch.Tensor:
-    """returns the closest N obstacle positions sorted by distance from the sensor.
-    stacks the x and y together. Output shape is (num_envs, 2 * closest_N)."""
+class NearestObstacles(NamedTuple):
+    """The K nearest obstacles of every environment, sorted by their planar distance in the sensor frame."""
+
+    positions_b: torch.Tensor
+    """Positions in the sensor frame. Shape is (num_envs, K, 3)."""
+    velocities_b: torch.Tensor
+    """Velocities relative to the sensor in the sensor frame. Shape is (num_envs, K, 3)."""
+    ids: torch.Tensor
+    """Mesh indices of the sensor data, -1 for empty slots. Shape is (num_envs, K)."""
+    valid: torch.Tensor
+    """Mask of the slots holding an obstacle. Shape is (num_envs, K)."""
+
+
+def _planar_distances_sq_b(points_w: torch.Tensor, pos_w: torch.Tensor, quat_w: torch.Tensor) -> torch.Tensor:
+    """Squared xy-distances of world points (num_envs, P, 3) in the sensor frame, without transforming the points.
+
+    The planar distance in the sensor frame is the distance orthogonal to the sensor's z-axis.
+    """
+    w, x, y, z = quat_w.unbind(dim=-1)
+    # z-axis of the sensor frame in the world frame (third column of the rotation matrix)
+    z_axis_w = torch.stack((2 * (x * z + w * y), 2 * (y * z - w * x), 1 - 2 * (x * x + y * y)), dim=-1)
+    diff = points_w - pos_w.unsqueeze(1)
+    return (diff * diff).sum(dim=-1) - (diff * z_axis_w.unsqueeze(1)).sum(dim=-1) ** 2
+
+
+def obstacle_index(
+    env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg, cell_size: float | None = None, search_radius: int = 1
+) -> ObstacleGrid:
+    """Spatial index over the world positions of the obstacles (all meshes except the ground) tracked by a sensor.
+
+    The index is shared by the observation, reward and command terms and built at most once per step. Its ids are the
+    mesh indices of the sensor data. Without a cell size, every query scans all obstacles (see :class:`ObstacleGrid`).
+    The obstacle world positions are assumed to be the same in all environments.
+    """
 
-    closest_N = min(closest_N, env.num_envs)
+    def compute():
+        sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
+        mesh_positions_w = sensor.data.mesh_positions_w[0]
+        grid = ObstacleGrid(cell_size, search_radius)
+        grid.build(mesh_positions_w[1:], ids=torch.arange(1, mesh_positions_w.shape[0], device=mesh_positions_w.device))
+        return grid
 
-    points = lidar_privileged_mesh_pos_obs(env, sensor_cfg)
-    x_points, y_points, z_points = points[:, :, 0], points[:, :, 1], points[:, :, 2]
+    return _lidar_step_cached(env, sensor_cfg, ("obstacle_index", cell_size, search_radius), compute)
 
-    distances = torch.sqrt(x_points**2 + y_points**2)
 
-    closest_N_indices = torch.argsort(distances, dim=1)[:, :closest_N]
+def nearest_obstacles(
+    env: ManagerBasedEnv,
+    sensor_cfg: SceneEntityCfg,
+    k: int,
+    cell_size: float | None = None,
+    search_radius: int = 1,
+) -> NearestObstacles:
+    """The K nearest obstacles (all meshes except the ground) of the sensor.
 
-    x_points_sorted = torch.gather(x_points, 1, closest_N_indices)
-    y_points_sorted = torch.gather(y_points, 1, closest_N_indices)
-    # distances_sorted = torch.gather(distances, 1, closest_N_indices)
+    Obstacles are ranked by their planar distance in the sensor frame with ``torch.topk``, and only the selected
+    obstacles are transformed to the sensor frame. ``k`` is clamped to the number of obstacles.
 
-    return torch.concat((x_points_sorted, y_points_sorted), dim=1)
+    The candidates are taken from the shared :func:`obstacle_index`. With a cell size, only the obstacles of the grid
+    cells around each sensor are ranked. Obstacles with a planar world distance larger than
+    ``search_radius * cell_size`` may then be missed, and slots without a candidate are marked invalid.
+
+    The result is cached per step, the tensors must not be modified in-place.
+    """
+
+    def compute():
+        sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
+        pos_w = sensor.data.pos_w
+        quat_w = sensor.data.quat_w
+        index = obstacle_index(env, sensor_cfg, cell_size, search_radius)
+        num_k = min(k, index.num_obstacles)
+
+        candidates, candidate_valid = index.query(pos_w)
+        if candidates.shape[1] < num_k:
+            pad = num_k - candidates.shape[1]
+            candidates = torch.nn.functional.pad(candidates, (0, pad), value=-1)
+            candidate_valid = torch.nn.functional.pad(candidate_valid, (0, pad), value=False)
+        candidate_pos_w = index.positions_w[candidates.clamp(min=0)]
+        dist_sq = _planar_distances_sq_b(candidate_pos_w, pos_w, quat_w)
+        dist_sq = dist_sq.masked_fill(~candidate_valid, float("inf"))
+        _, topk_idx = torch.topk(dist_sq, num_k, dim=1, largest=False, sorted=True)
+        valid = torch.gather(candidate_valid, 1, topk_idx)
+        ids = torch.where(valid, index.ids[torch.gather(candidates, 1, topk_idx).clamp(min=0)], -1)
+
+        gather_idx = ids.clamp(min=0).unsqueeze(-1).expand(-1, -1, 3)
+        positions_b = transform_w_points_to_b_points(
+            torch.gather(sensor.data.mesh_positions_w, 1, gather_idx), pos_w, quat_w
+        )
+        velocities_w = torch.gather(sensor.data.mesh_velocities_w, 1, gather_idx) - sensor.data.vel_w.unsqueeze(1)
+        velocities_b = math_utils.transform_points(velocities_w, quat=math_utils.quat_inv(quat_w))
+        positions_b = torch.where(valid.unsqueeze(-1), positions_b, 0.0)
+        velocities_b = torch.where(valid.unsqueeze(-1), velocities_b, 0.0)
+        return NearestObstacles(positions_b, velocities_b, ids, valid)
+
+    return _lidar_step_cached(env, sensor_cfg, ("nearest_obstacles", k, cell_size, search_radius), compute)
+
+
+def obstacle_positions_sorted_flat(
+    env: ManagerBasedEnv,
+    sensor_cfg: SceneEntityCfg,
+    closest_N: int,
+    cell_size: float | None = None,
+    search_radius: int = 1,
+) -> torch.Tensor:
+    """returns the closest N obstacle positions sorted by distance from the sensor.
+    stacks the x and y together. Output shape is (num_envs, 2 * closest_N), with closest_N clamped to the number of
+    obstacles. With a cell size, the obstacles are prefiltered by a grid and missing obstacles are zero
+    (see :func:`nearest_obstacles`)."""
+
+    points = nearest_obstacles(env, sensor_cfg, closest_N, cell_size, search_radius).positions_b
+    return torch.concat((points[:, :, 0], points[:, :, 1]), dim=1)
 
 
 def lidar_panoptic_segmentation(
@@ -286,29 +468,21 @@ def lidar_panoptic_segmentation(
     """privileged information related to the lidar sensor.
     returns the mesh index for each ray hit. -1 indicates no hit."""
 
-    sensor: RayCaster = env.scene.sensors[sensor_cfg.name]
-    pan_seg_mask = sensor.data.ray_hit_mesh_idx
-
-    undefined = torch.any(
-        torch.stack(
-            (
-                torch.isinf(sensor.data.ray_hits_w[..., 0]),
-                torch.isinf(sensor.data.ray_hits_w[..., 1]),
-                torch.isinf(sensor.data.ray_hits_w[..., 2]),
-            ),
-            dim=0,
-        ),
-        dim=0,
-    )
-
-    seg_mask = torch.where(undefined.unsqueeze(2), torch.tensor(-1), pan_seg_mask)
+    seg_mask = _lidar_ray_hits(env, sensor_cfg)[2]
     if flatten:
         seg_mask = seg_mask.squeeze()
     if binary:
-        seg_mask[seg_mask > 0] = 1
+        # the cached ids are shared, so the binary mask is not written in-place
+        seg_mask = torch.where(seg_mask > 0, 1, seg_mask)
     return seg_mask
 
 
+def lidar_inf_mask(env: ManagerBasedEnv, sensor_cfg: SceneEntityCfg) -> torch.Tensor:
+    """returns a mask of the rays without a hit, i.e. with a non-finite hit position. Shape is (num_envs, num_rays)."""
+
+    return _lidar_step_cached(env, sensor_cfg, "inf_mask", lambda: ~_lidar_ray_hits(env, sensor_cfg)[1])
+
+
 # class LidarHistory:
 #     def __init__(
 #         self,
@@ -495,8 +669,17 @@ if TYPE_CHECKING:
     from omni.isaac.lab.envs import ManagerBasedEnv
 
 
-def wild_anymal(env: ManagerBasedEnv, action_term: str, asset_cfg: SceneEntityCfg = SceneEntityCfg("robot")) -> torch.Tensor:
-    """Wild anymal observation term."""
+def wild_anymal(
+    env: ManagerBasedEnv,
+    action_term: str,
+    asset_cfg: SceneEntityCfg = SceneEntityCfg("robot"),
+    compile_joint_target: bool = True,
+) -> torch.Tensor:
+    """Wild anymal observation term.
+
+    The observation is created on the first call. ``compile_joint_target`` is passed to it and selects whether the
+    joint target of the low-level policy is computed with ``torch.compile``.
+    """
 
     # extract the used quantities (to enable type-hinting)
     term: NavigationSE2Action = env.action_manager._terms[action_term]
@@ -508,6 +691,7 @@ def wild_anymal(env: ManagerBasedEnv, action_term: str, asset_cfg: SceneEntityCf
             device=env.device,
             simulation_dt=env.physics_dt,
             control_dt=env.physics_dt * term.cfg.low_level_decimation,
+            compile_joint_target=compile_joint_target,
         )
 
     env.wild_anymal_obs.update(
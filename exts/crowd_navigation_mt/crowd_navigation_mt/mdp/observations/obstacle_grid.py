@@ -0,0 +1,166 @@
+"""Uniform grid over the planar obstacle positions to prefilter proximity queries.
+
+The grid is a flat, cell-sorted copy of the obstacle ids (counting sort by cell), such that the obstacles of a cell are
+a contiguous slice. A query gathers the obstacles of the (2r+1)^2 cells around every query point into a padded
+candidate table, which replaces a scan over all obstacles by a scan over the local candidates.
+"""
+
+from __future__ import annotations
+
+import torch
+
+
+class ObstacleGrid:
+    """Uniform grid over the xy-positions of a set of obstacles.
+
+    The grid extent is fitted to the obstacle positions at every :meth:`build`. Query points outside the extent are
+    clamped to the border cells, such that obstacles close to the border are still found.
+
+    Only obstacles within ``search_radius * cell_size`` of a query point are guaranteed to be returned as candidates.
+    Obstacles further away are only returned if they lie in the searched cells. Without a cell size, the grid has a
+    single cell and every obstacle is a candidate of every query, which makes all queries exact.
+    """
+
+    def __init__(self, cell_size: float | None, search_radius: int = 1):
+        """Initialize the grid.
+
+        Args:
+            cell_size: The side length of a grid cell in meters. None to search all obstacles.
+            search_radius: The number of cells searched around the cell of a query point. Defaults to 1.
+        """
+        if cell_size is not None and cell_size <= 0.0:
+            raise ValueError(f"The cell size must be positive, got {cell_size}.")
+        if search_radius < 0:
+            raise ValueError(f"The search radius must be non-negative, got {search_radius}.")
+        self.cell_size = cell_size
+        self.search_radius = search_radius if cell_size is not None else 0
+        self.num_obstacles = 0
+
+    @property
+    def max_exact_radius(self) -> float:
+        """The radius up to which all obstacles around a query point are candidates."""
+        return float("inf") if self.cell_size is None else self.search_radius * self.cell_size
+
+    def build(self, positions_w: torch.Tensor, ids: torch.Tensor | None = None):
+        """Sort the obstacles into the grid cells.
+
+        Sizing the padded candidate table requires the grid dimensions and the maximum cell occupancy on the host, so
+        a build with a cell size synchronizes once with the device. Queries do not synchronize.
+
+        Args:
+            positions_w: The obstacle positions in the world frame. Shape is (num_obstacles, 2) or (num_obstacles, 3).
+            ids: The ids returned for the obstacles. Shape is (num_obstacles,). Defaults to their index.
+        """
+        device = positions_w.device
+        self.num_obstacles = positions_w.shape[0]
+        self.positions_w = positions_w
+        self.ids = ids if ids is not None else torch.arange(self.num_obstacles, device=device)
+        # padded with a trailing entry for the empty slots (index -1)
+        self._positions_padded = torch.cat((positions_w, positions_w.new_zeros(1, positions_w.shape[1])))
+        self._ids_padded = torch.cat((self.ids, self.ids.new_full((1,), -1)))
+        xy = positions_w[:, :2]
+        if self.cell_size is None or self.num_obstacles == 0:
+            self._origin = torch.zeros(2, device=device)
+            self._dims = torch.ones(2, dtype=torch.long, device=device)
+            self._order = torch.arange(self.num_obstacles, device=device)
+            self._counts = torch.full((1,), self.num_obstacles, dtype=torch.long, device=device)
+            self._starts = torch.zeros(1, dtype=torch.long, device=device)
+            self._max_count = self.num_obstacles
+        else:
+            self._origin = xy.min(dim=0).values
+            cells = torch.floor((xy - self._origin) / self.cell_size).long()
+            self._dims = cells.max(dim=0).values + 1
+            num_cells = int((self._dims[0] * self._dims[1]).item())
+            keys = cells[:, 0] * self._dims[1] + cells[:, 1]
+            self._order = torch.argsort(keys, stable=True)
+            self._counts = torch.bincount(keys, minlength=num_cells)
+            self._starts = torch.cumsum(self._counts, dim=0) - self._counts
+            self._max_count = int(self._counts.max().item())
+
+        r = self.search_radius
+        offsets = torch.arange(-r, r + 1, device=device)
+        self._offsets = torch.stack(torch.meshgrid(offsets, offsets, indexing="ij"), dim=-1).reshape(-1, 2)
+        self._slots = torch.arange(self._max_count, device=device)
+
+    @property
+    def num_candidates(self) -> int:
+        """Number of candidate slots per query point."""
+        return self._offsets.shape[0] * self._max_count
+
+    def query(self, points_w: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """Gather the obstacles of the cells around the query points.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (..., 2) or (..., 3).
+
+        Returns:
+            A tuple containing the candidate obstacle indices into the built positions with -1 for empty slots
+            (..., num_candidates) and the mask of the occupied slots (..., num_candidates). Every obstacle appears at
+            most once per query point.
+        """
+        batch_shape = points_w.shape[:-1]
+        if self.cell_size is None:
+            candidates = self._order.expand(*batch_shape, -1)
+            return candidates, torch.ones_like(candidates, dtype=torch.bool)
+
+        query_cells = torch.floor((points_w[..., :2] - self._origin) / self.cell_size).long()
+        query_cells = torch.minimum(query_cells.clamp(min=0), self._dims - 1)
+        # cells of the neighbourhood, shape (..., num_offsets, 2)
+        cells = query_cells.unsqueeze(-2) + self._offsets
+        in_grid = ((cells >= 0) & (cells < self._dims)).all(dim=-1)
+        keys = torch.where(in_grid, cells[..., 0] * self._dims[1] + cells[..., 1], 0)
+        counts = torch.where(in_grid, self._counts[keys], 0)
+        # slots of the cells, shape (..., num_offsets, max_count)
+        sorted_idx = self._starts[keys].unsqueeze(-1) + self._slots
+        valid = self._slots < counts.unsqueeze(-1)
+        candidates = self._order[sorted_idx.clamp(max=max(self.num_obstacles - 1, 0))]
+        candidates = torch.where(valid, candidates, -1)
+        return candidates.reshape(*batch_shape, -1), valid.reshape(*batch_shape, -1)
+
+    def _candidate_distances(self, points_w: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """Candidates of the query points (num_points, dim) and their distances, inf for empty slots."""
+        candidates, valid = self.query(points_w)
+        dim = points_w.shape[-1]
+        candidate_pos_w = self._positions_padded[candidates, :dim]
+        distances = torch.linalg.norm(candidate_pos_w - points_w.unsqueeze(1), dim=-1)
+        return candidates, distances.masked_fill(~valid, float("inf"))
+
+    def knn(self, points_w: torch.Tensor, k: int) -> tuple[torch.Tensor, torch.Tensor]:
+        """The k nearest obstacles of the query points, sorted by distance.
+
+        The distance is taken over the dimensions of the query points, i.e. planar for 2D points.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (num_points, 2) or (num_points, 3).
+            k: The number of obstacles.
+
+        Returns:
+            A tuple containing the obstacle ids with -1 for missing obstacles (num_points, k) and their distances with
+            inf for missing obstacles (num_points, k).
+        """
+        candidates, distances = self._candidate_distances(points_w)
+        if distances.shape[1] < k:
+            pad = k - distances.shape[1]
+            candidates = torch.nn.functional.pad(candidates, (0, pad), value=-1)
+            distances = torch.nn.functional.pad(distances, (0, pad), value=float("inf"))
+        distances, idx = torch.topk(distances, k, dim=1, largest=False, sorted=True)
+        ids = self._ids_padded[torch.gather(candidates, 1, idx)]
+        return ids.masked_fill(torch.isinf(distances), -1), distances
+
+    def radius(self, points_w: torch.Tensor, radius: float) -> tuple[torch.Tensor, torch.Tensor]:
+        """All obstacles within a radius of the query points, in no particular order.
+
+        The result is exact for radii up to :attr:`max_exact_radius`.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (num_points, 2) or (num_points, 3).
+            radius: The search radius in meters.
+
+        Returns:
+            A tuple containing the obstacle ids with -1 for slots outside the radius (num_points, num_candidates) and
+            their distances with inf for slots outside the radius (num_points, num_candidates).
+        """
+        candidates, distances = self._candidate_distances(points_w)
+        inside = distances <= radius
+        ids = self._ids_padded[candidates].masked_fill(~inside, -1)
+        return ids, distances.masked_fill(~inside, float("inf"))
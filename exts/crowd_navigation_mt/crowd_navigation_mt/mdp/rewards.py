@@ -11,6 +11,7 @@ from typing import TYPE_CHECKING
 from omni.isaac.lab.managers import SceneEntityCfg
 from omni.isaac.lab.sensors import ContactSensor, RayCaster
 from omni.isaac.lab.assets import Articulation
+from omni.isaac.lab.utils import math as math_utils
 
 from crowd_navigation_mt import mdp
 from omni.isaac.lab.terrains import TerrainImporter
@@ -178,6 +179,8 @@ def obstacle_distance(
     threshold: float = 1,
     dist_std: float = 1,
     dist_sensor: SceneEntityCfg = SceneEntityCfg("lidar"),
+    obstacle_radius: float | None = None,
+    cell_size: float | None = None,
 ):
     """Reward the agent for avoiding obstacles using L2-Kernel.
 
@@ -186,16 +189,23 @@ def obstacle_distance(
         threshold: The distance threshold to the obstacles.
         dist_std: The standard deviation of the distance to the obstacles.
         dist_sensor: The name of the distance sensor (2d lidar).
+        obstacle_radius: If given, the distance is taken from the shared obstacle index instead of the lidar rays, as
+            the planar distance to the closest obstacle center minus this radius. Walls of the terrain are then ignored.
+        cell_size: The cell size of the obstacle index. None to search all obstacles.
 
     Returns:
         Dense reward [0, +1] based on the distance to the obstacles. Needs to have negative weight.
     """
     # extract the used quantities (to enable type-hinting)
     sensor: RayCaster = env.scene.sensors[dist_sensor.name]
-    distances = sensor.data.distances
-    valid = distances > 1e-3
-    filtered_data = torch.where(valid, distances, torch.tensor(float("inf")))
-    min_values = torch.min(filtered_data, dim=1)[0]
+    if obstacle_radius is not None:
+        index = mdp.obstacle_index(env, dist_sensor, cell_size)
+        min_values = index.knn(sensor.data.pos_w[:, :2], 1)[1][:, 0] - obstacle_radius
+    else:
+        distances = sensor.data.distances
+        valid = distances > 1e-3
+        filtered_data = torch.where(valid, distances, torch.tensor(float("inf")))
+        min_values = torch.min(filtered_data, dim=1)[0]
 
     reward = (1 - torch.tanh((min_values - threshold) / dist_std)) / env.max_episode_length 
     return reward
@@ -208,6 +218,8 @@ def obstacle_distance_in_front(
     dist_std: float = 1,
     degrees: float = 30,
     dist_sensor: SceneEntityCfg = SceneEntityCfg("lidar"),
+    obstacle_radius: float | None = None,
+    cell_size: float | None = None,
 ):
     """Reward the agent for avoiding obstacles using L2-Kernel.
 
@@ -217,6 +229,10 @@ def obstacle_distance_in_front(
         dist_std: The standard deviation of the distance to the obstacles.
         degrees: degrees in front of the robot to consider.
         dist_sensor: The name of the distance sensor (2d lidar).
+        obstacle_radius: If given, the distance is taken from the shared obstacle index instead of the lidar rays, as
+            the planar distance to the closest obstacle center in front minus this radius. Walls of the terrain are
+            then ignored.
+        cell_size: The cell size of the obstacle index. None to search all obstacles.
 
     Returns:
         Dense reward [0, +1] based on the distance to the obstacles. Needs to have negative weight.
@@ -225,14 +241,25 @@ def obstacle_distance_in_front(
 
     angle_threshold = torch.tensor(degrees / 2 * 3.141592653589793 / 180.0)
     # contact_sensor: RayCaster = env.scene.sensors[dist_sensor.name]
-    points = mdp.lidar_obs(env, dist_sensor, True)[:, :, :2]
-    invalid_dist = torch.isclose(points[..., 1], torch.tensor(0.0)) | torch.isclose(points[..., 0], torch.tensor(0.0))
+    if obstacle_radius is not None:
+        sensor: RayCaster = env.scene.sensors[dist_sensor.name]
+        index = mdp.obstacle_index(env, dist_sensor, cell_size)
+        candidates, valid = index.query(sensor.data.pos_w)
+        points_w = index.positions_w[candidates.clamp(min=0)] - sensor.data.pos_w.unsqueeze(1)
+        yaw_inv = math_utils.yaw_quat(math_utils.quat_inv(sensor.data.quat_w))
+        points = math_utils.transform_points(points_w, quat=yaw_inv)[:, :, :2]
+        invalid_dist = ~valid | (torch.norm(points, dim=2) > index.max_exact_radius)
+    else:
+        points = mdp.lidar_obs(env, dist_sensor, True)[:, :, :2]
+        invalid_dist = torch.isclose(points[..., 1], torch.tensor(0.0)) | torch.isclose(points[..., 0], torch.tensor(0.0))
     angles = torch.atan2(points[..., 1], points[..., 0])
     valid_angles = torch.abs(angles) < angle_threshold
     valid = ~invalid_dist & valid_angles
 
     filtered_data = torch.where(valid, torch.norm(points, dim=2), torch.tensor(float("inf")))
     min_values = torch.min(filtered_data, dim=1)[0]
+    if obstacle_radius is not None:
+        min_values = min_values - obstacle_radius
 
     # env.observation_manager.compute_group(group_name="policy").shape
 
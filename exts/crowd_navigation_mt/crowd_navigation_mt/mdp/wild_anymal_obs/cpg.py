@@ -17,13 +17,14 @@ class CPG(nn.Module):
         self.base_phase_step = dt * self.base_frequency
         self.phases = torch.zeros(shape, dtype=torch.float, requires_grad=False).to(device)
         self.dphases = torch.zeros(shape, dtype=torch.float, requires_grad=False).to(device)
-        self.uniform_dist = torch.distributions.uniform.Uniform(
-            torch.zeros(*shape).to(device).detach(), torch.ones(*shape).to(device).detach()
-        )
         self.device = device
         self.decimation = decimation
         self.trot_phase = torch.tensor([0, 0.5, 0.5, 0], requires_grad=False).to(device) - 0.25
         self.stance_phase = torch.tensor([0, 0.0, 0.0, 0], requires_grad=False).to(device) - 0.25
+        # scratch buffer of the in-place phase computation
+        self._wrap_buffer = torch.zeros(shape, dtype=torch.float, requires_grad=False).to(device)
+        # random phases of the reset environments, only the rows of the reset environments are sampled
+        self._random_phases = torch.zeros(shape, dtype=torch.float, requires_grad=False).to(device)
 
     def reset(self, idx):
         self.reset_random(idx)
@@ -46,7 +47,9 @@ class CPG(nn.Module):
         self.base_phase_step = self.base_frequency * self.dt
 
     def reset_random(self, idx):
-        self.phases[idx] = self.uniform_dist.sample()[idx]
+        # the random phases take the shape of the indexed rows, such that any index is accepted
+        shape = self.phases[idx].shape
+        self.phases[idx] = self._random_phases.view(-1)[: shape.numel()].view(shape).uniform_()
 
     def reset_dphase(self, idx):
         self.dphases[idx] = self.base_phase_step[idx]
@@ -63,11 +66,18 @@ class CPG(nn.Module):
         h = torch.where(self.phases < 0.5, h_lift, torch.zeros_like(h_lift))
         return h
 
-    def get_phase(self):
-        return self.angle_mod(self.phases * 2 * np.pi)
-
-    def get_d_phase(self):
-        return self.dphases * 2 * np.pi / self.decimation
+    def get_phase(self, out=None):
+        if out is None:
+            return self.angle_mod(self.phases * 2 * np.pi)
+        # same operations as angle_mod, written into the output (which may be a strided view)
+        torch.mul(self.phases, 2, out=out).mul_(np.pi).add_(np.pi)
+        torch.div(out, 2 * np.pi, out=self._wrap_buffer).floor_().mul_(2 * np.pi)
+        return out.sub_(self._wrap_buffer).sub_(np.pi)
+
+    def get_d_phase(self, out=None):
+        if out is None:
+            return self.dphases * 2 * np.pi / self.decimation
+        return torch.mul(self.dphases, 2, out=out).mul_(np.pi).div_(self.decimation)
 
     def round_phase(self, phases):
         phases -= torch.floor(phases)
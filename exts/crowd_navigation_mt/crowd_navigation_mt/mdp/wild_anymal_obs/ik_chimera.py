@@ -3,16 +3,14 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import math
 import numpy as np
 import torch
 import torch.nn as nn
 
-DEVICE = "cuda"
-# DEVICE = "cpu"
-
 
 class IK(nn.Module):
-    def __init__(self, device=DEVICE):
+    def __init__(self, device="cpu"):
         super().__init__()
         self.pos_base_to_hip_in_base_frame = np.zeros([4, 3])
         self.pos_hip_to_thigh_in_hip_frame = np.zeros([4, 3])
@@ -71,93 +69,135 @@ class IK(nn.Module):
             np.arctan(self.pos_shank_to_foot_in_shank_frame[0, 0] / self.pos_shank_to_foot_in_shank_frame[0, 2])
         )
 
-        self.pos_base_to_hip_in_base_frame = torch.from_numpy(self.pos_base_to_hip_in_base_frame).to(device)
-        self.pos_hip_to_thigh_in_hip_frame = torch.from_numpy(self.pos_hip_to_thigh_in_hip_frame).to(device)
-        self.pos_thigh_to_shank_in_thigh_frame = torch.from_numpy(self.pos_shank_to_foot_in_shank_frame).to(device)
-        self.pos_shank_to_foot_in_shank_frame = torch.from_numpy(self.pos_shank_to_foot_in_shank_frame).to(device)
-        self.pos_base_to_haa_center_in_base_frame = torch.from_numpy(self.pos_base_to_haa_center_in_base_frame).to(
-            device
+        # float32 constants, such that the solution is not upcast to float64
+        def to_tensor(x):
+            return torch.tensor(x, dtype=torch.float, device=device)
+
+        self.pos_base_to_hip_in_base_frame = to_tensor(self.pos_base_to_hip_in_base_frame)
+        self.pos_hip_to_thigh_in_hip_frame = to_tensor(self.pos_hip_to_thigh_in_hip_frame)
+        self.pos_thigh_to_shank_in_thigh_frame = to_tensor(self.pos_thigh_to_shank_in_thigh_frame)
+        self.pos_shank_to_foot_in_shank_frame = to_tensor(self.pos_shank_to_foot_in_shank_frame)
+        self.pos_base_to_haa_center_in_base_frame = to_tensor(self.pos_base_to_haa_center_in_base_frame)
+        self.hfe_to_foot_y_offset = to_tensor(self.hfe_to_foot_y_offset)
+        self.haa_to_foot_y_offset = to_tensor(self.haa_to_foot_y_offset)
+
+        self.a0 = float(self.a0)
+        self.haa_offset = float(self.haa_offset)
+        self.a1_squared = float(self.a1_squared)
+        self.a2_squared = float(self.a2_squared)
+        self.min_reach_sp = float(self.min_reach_sp)
+        self.max_reach_sp = float(self.max_reach_sp)
+        self.min_reach = float(self.min_reach)
+        self.max_reach = float(self.max_reach)
+        self.kfe_offset = float(self.kfe_offset)
+
+    def forward(self, pos_base_to_foot_in_base_frame, limb):
+        return solve_ik_kernel(
+            pos_base_to_foot_in_base_frame,
+            limb,
+            self.pos_base_to_haa_center_in_base_frame,
+            self.haa_to_foot_y_offset,
+            self.a1_squared,
+            self.a2_squared,
+            self.min_reach,
+            self.max_reach,
+            self.max_reach_sp,
+            self.kfe_offset,
         )
-        self.hfe_to_foot_y_offset = torch.from_numpy(self.hfe_to_foot_y_offset).to(device)
-        self.haa_to_foot_y_offset = torch.from_numpy(self.haa_to_foot_y_offset).to(device)
 
-        self.a1_squared = torch.tensor(self.a1_squared, requires_grad=False).to(device)
-        self.a2_squared = torch.tensor(self.a2_squared, requires_grad=False).to(device)
 
+def solve_ik_kernel(
+    pos_base_to_foot_in_base_frame: torch.Tensor,
+    limb: torch.Tensor,
+    pos_base_to_haa_center_in_base_frame: torch.Tensor,
+    haa_to_foot_y_offset: torch.Tensor,
+    a1_squared: float,
+    a2_squared: float,
+    min_reach: float,
+    max_reach: float,
+    max_reach_sp: float,
+    kfe_offset: float,
+) -> torch.Tensor:
+    """Closed-form leg inverse kinematics.
+
+    The function has no host-side branches and only scalar host constants, such that it can be compiled with
+    :func:`torch.jit.script` or :func:`torch.compile`. Out-of-domain arguments of the arc cosines are clamped, which
+    resolves unreachable targets to the stretched or folded leg. Any remaining NaN, e.g. from non-finite targets,
+    falls back to the zero joint position of the leg.
+
+    Args:
+        pos_base_to_foot_in_base_frame: The foot positions in the base frame. Shape is (N, 3).
+        limb: The limb of each foot in the order LF, LH, RF, RH. Shape is (N,).
+        pos_base_to_haa_center_in_base_frame: The HAA centers of the limbs in the base frame. Shape is (4, 3).
+        haa_to_foot_y_offset: The lateral offsets from the HAA to the foot of the limbs. Shape is (4,).
+        a1_squared: The squared length of the thigh.
+        a2_squared: The squared length of the shank.
+        min_reach: The minimum distance from the HAA center to the foot.
+        max_reach: The maximum distance from the HAA center to the foot.
+        max_reach_sp: The maximum reach in the sagittal plane.
+        kfe_offset: The angle offset of the KFE joint.
+
+    Returns:
+        The HAA, HFE and KFE joint positions. Shape is (N, 3).
+    """
+    pos_haa_to_foot = pos_base_to_foot_in_base_frame - pos_base_to_haa_center_in_base_frame.index_select(0, limb)
+    d = haa_to_foot_y_offset.index_select(0, limb)
+    d_squared = d * d
 
-ik = IK()
+    reach = torch.norm(pos_haa_to_foot, dim=1)
+    pos_haa_to_foot = pos_haa_to_foot * (torch.clamp(reach, min_reach, max_reach) / reach).unsqueeze(1)
+    x = pos_haa_to_foot[:, 0]
+    y = pos_haa_to_foot[:, 1]
+    z = pos_haa_to_foot[:, 2]
+    pos_yz_squared = y * y + z * z
+
+    # feet closer to the HAA axis than the lateral offset are pushed out to it
+    too_close = pos_yz_squared < d_squared
+    yz_scale = torch.where(too_close, (torch.abs(d) + 0.01) / torch.sqrt(pos_yz_squared), torch.ones_like(d))
+    y = y * yz_scale
+    z = z * yz_scale
+    x = torch.where(too_close, torch.clamp(x, max=max_reach_sp), x)
+    pos_yz_squared = torch.where(too_close, y * y + z * z, pos_yz_squared)
+
+    r_squared = torch.clamp(pos_yz_squared - d_squared, min=0.0)
+    r = torch.sqrt(r_squared)
+    delta = torch.atan2(y, -z)
+    beta = torch.atan2(r, d)
+    q_haa = beta + delta - 0.5 * math.pi
 
+    leg_length_squared = r_squared + x * x
+    leg_length = torch.sqrt(leg_length_squared)
+    cos_phi1 = (a1_squared + leg_length_squared - a2_squared) * 0.5 / (math.sqrt(a1_squared) * leg_length)
+    cos_phi2 = (a2_squared + leg_length_squared - a1_squared) * 0.5 / (math.sqrt(a2_squared) * leg_length)
+    phi1 = torch.acos(torch.clamp(cos_phi1, -1.0, 1.0))
+    phi2 = torch.acos(torch.clamp(cos_phi2, -1.0, 1.0))
 
-def solve_ik(pos_base_to_foot_in_base_frame, limb, device=DEVICE):
-    # limb order: LF, LH, RF, RH
-    num_envs = pos_base_to_foot_in_base_frame.shape[0]
-    leg_joints = torch.zeros([num_envs, 3], device=device, requires_grad=False)
-    pos_haa_to_foot_in_base_frame = (
-        pos_base_to_foot_in_base_frame - ik.pos_base_to_haa_center_in_base_frame.index_select(0, limb)
-    )
+    front = limb % 2 == 0
+    q_kfe = phi1 + phi2 - kfe_offset
+    q_kfe = torch.where(front, -q_kfe, q_kfe)
+    theta_prime = torch.atan2(x, r)
+    q_hfe = torch.where(front, phi1 - theta_prime, -phi1 - theta_prime)
 
-    d = ik.haa_to_foot_y_offset.index_select(0, limb)
-    d_squared = d * d
+    leg_joints = torch.stack((q_haa, q_hfe, q_kfe), dim=1)
+    return torch.where(torch.isnan(leg_joints), torch.zeros_like(leg_joints), leg_joints)
 
-    reach = torch.norm(pos_haa_to_foot_in_base_frame, dim=1)
-    clipped_reach = torch.clip(reach, ik.min_reach, ik.max_reach)
-    pos_haa_to_foot_in_base_frame = torch.einsum("bi,b->bi", pos_haa_to_foot_in_base_frame, clipped_reach / reach)
 
-    pos_yz_squared = torch.norm(pos_haa_to_foot_in_base_frame[:, -2:], dim=1) ** 2
+_ik_solvers: dict[torch.device, IK] = {}
+"""The IK solvers by device, constructed on first use."""
 
-    modified_pos_haa_to_foot_in_base_frame = pos_haa_to_foot_in_base_frame.clone()
-    modified_pos_haa_to_foot_in_base_frame[:, -2:] = torch.einsum(
-        "bi,b->bi", pos_haa_to_foot_in_base_frame[:, -2:], (torch.abs(d) + 0.01) / torch.sqrt(pos_yz_squared)
-    )
-    modified_pos_haa_to_foot_in_base_frame[:, 0] = torch.min(
-        pos_haa_to_foot_in_base_frame[:, 0], torch.tensor(ik.max_reach_sp)
-    )
-    modified_pos_yz_squared = torch.norm(modified_pos_haa_to_foot_in_base_frame[:, -2:], dim=1) ** 2
-    pos_haa_to_foot_in_base_frame = torch.where(
-        pos_yz_squared < d_squared,
-        modified_pos_haa_to_foot_in_base_frame.transpose(0, 1),
-        pos_haa_to_foot_in_base_frame.transpose(0, 1),
-    ).transpose(0, 1)
-    pos_yz_squared = torch.where(pos_yz_squared < d_squared, modified_pos_yz_squared, pos_yz_squared)
-
-    r_squared = pos_yz_squared - d_squared
-    r = torch.sqrt(r_squared)
-    delta = torch.atan2(pos_haa_to_foot_in_base_frame[:, 1], -pos_haa_to_foot_in_base_frame[:, 2])
-    beta = torch.atan2(r, d)
-    qHAA = beta + delta - np.pi / 2
-    leg_joints[:, 0] = qHAA
-
-    l_squared = r_squared + pos_haa_to_foot_in_base_frame[:, 0] ** 2
-    l = torch.sqrt(l_squared)
-    phi1 = torch.acos((ik.a1_squared + l_squared - ik.a2_squared) * 0.5 / (torch.sqrt(ik.a1_squared) * l))
-    phi2 = torch.acos((ik.a2_squared + l_squared - ik.a1_squared) * 0.5 / (torch.sqrt(ik.a2_squared) * l))
-
-    qKFE = phi1 + phi2 - ik.kfe_offset
-    qKFE = torch.where(limb % 2 == 0, -qKFE, qKFE)
-    leg_joints[:, 2] = qKFE
-
-    theta_prime = torch.atan2(pos_haa_to_foot_in_base_frame[:, 0], r)
-
-    qHFE = torch.where(limb % 2 != 0, -phi1 - theta_prime, phi1 - theta_prime)
-    leg_joints[:, 1] = qHFE
-    if torch.any(torch.isnan(leg_joints)):
-        print("Error: nan detected in IK.")
-        if torch.any(torch.isnan(qHAA)):
-            print("Nan in qHAA: ")
-            if torch.any(r_squared < 0):
-                print("r_squared < 0")
-        if torch.any(torch.isnan(qKFE)):
-            print("Nan in qKFE: ")
-            if torch.any(l_squared < 0):
-                print("l_squared < 0")
-            if torch.any(torch.isnan(phi1)):
-                print("Nan in phi1: ")
-            if torch.any(torch.isnan(phi2)):
-                print("Nan in phi2: ")
-        if torch.any(torch.isnan(qHFE)):
-            print("Nan in qHFE: ")
-
-    return leg_joints
+
+def get_ik(device) -> IK:
+    device = torch.device(device)
+    if device not in _ik_solvers:
+        _ik_solvers[device] = IK(device)
+    return _ik_solvers[device]
+
+
+def solve_ik(pos_base_to_foot_in_base_frame, limb, device=None):
+    # limb order: LF, LH, RF, RH
+    if device is None:
+        device = pos_base_to_foot_in_base_frame.device
+    return get_ik(device)(pos_base_to_foot_in_base_frame, limb)
 
 
 def get_foot_height(pi):
@@ -177,9 +217,9 @@ if __name__ == "__main__":
                     [0.3978, -0.1980, -0.5484],
                     [-0.4022, -0.1980, -0.5500],
                 ],
-                device=DEVICE,
+                device="cpu",
             ),
-            torch.tensor([0, 1, 2, 3], dtype=torch.int64, device=DEVICE),
+            torch.tensor([0, 1, 2, 3], dtype=torch.int64, device="cpu"),
         )
     )
     print(get_foot_height(torch.tensor([[0.1]])))
@@ -5,10 +5,10 @@
 
 import numpy as np
 import torch
-from torch.distributions.normal import Normal
+from torch._dynamo.exc import BackendCompilerFailed, Unsupported
 
 from .cpg import CPG
-from .ik_chimera import solve_ik
+from .ik_chimera import get_ik, solve_ik_kernel
 
 # from rlgpu.utils.torch_jit_utils import *
 # from isaacgym_anymal.anymal_common_rl.python.observation.observation_base import ObservationBase
@@ -20,11 +20,108 @@ from .raisim_conversion import (
 )
 
 
+def compute_joint_target(
+    action: torch.Tensor,
+    action_indices: torch.Tensor,
+    action_std: torch.Tensor,
+    action_mean: torch.Tensor,
+    base_phase_step: torch.Tensor,
+    decimation: float,
+    phases: torch.Tensor,
+    dphases: torch.Tensor,
+    projected_gravity: torch.Tensor,
+    foot_default_xy: torch.Tensor,
+    foot_default_z: float,
+    default_foot_height: float,
+    feet_id: torch.Tensor,
+    pos_base_to_haa_center_in_base_frame: torch.Tensor,
+    haa_to_foot_y_offset: torch.Tensor,
+    a1_squared: float,
+    a2_squared: float,
+    min_reach: float,
+    max_reach: float,
+    max_reach_sp: float,
+    kfe_offset: float,
+    joint_target: torch.Tensor,
+) -> torch.Tensor:
+    """Advance the CPG phases with an action and compute the joint targets.
+
+    Reorders and normalizes the action, advances the phases, computes the foot height targets and solves the leg IK
+    in a single function, such that it can be compiled into a few fused kernels with :func:`torch.compile`. The
+    operations are the ones of :meth:`CPG.update_phase`, :meth:`CPG.get_cubic_height` and :func:`solve_ik`, such that
+    the eager function returns identical targets.
+
+    Args:
+        action: The action of the policy. Shape is (num_envs, 16).
+        action_indices: The permutation of the action to the isaac order. Shape is (16,).
+        action_std: The scale of the action. Shape is (16,).
+        action_mean: The offset of the action. Shape is (16,).
+        base_phase_step: The phase step of the CPG without action. Shape is (num_envs, 4).
+        decimation: The number of simulation steps per control step.
+        phases: The CPG phases, updated in-place. Shape is (num_envs, 4).
+        dphases: The phase increments, written in-place. Shape is (num_envs, 4).
+        projected_gravity: The gravitational axis in the base frame. Shape is (num_envs, 3).
+        foot_default_xy: The default foot positions with zero height. Shape is (4, 3).
+        foot_default_z: The default foot height in the base frame.
+        default_foot_height: The swing height of the feet.
+        feet_id: The limb of every foot. Shape is (num_envs * 4,).
+        pos_base_to_haa_center_in_base_frame: See :func:`solve_ik_kernel`.
+        haa_to_foot_y_offset: See :func:`solve_ik_kernel`.
+        a1_squared: See :func:`solve_ik_kernel`.
+        a2_squared: See :func:`solve_ik_kernel`.
+        min_reach: See :func:`solve_ik_kernel`.
+        max_reach: See :func:`solve_ik_kernel`.
+        max_reach_sp: See :func:`solve_ik_kernel`.
+        kfe_offset: See :func:`solve_ik_kernel`.
+        joint_target: The joint targets, written in-place. Shape is (num_envs, 12).
+
+    Returns:
+        The joint targets.
+    """
+    normalized_action = torch.index_select(action, 1, action_indices) * action_std + action_mean
+    # CPG.update_phase
+    new_dphases = base_phase_step + normalized_action[:, :4] * decimation / (2 * np.pi)
+    new_phases = phases + new_dphases
+    new_phases = new_phases - torch.floor(new_phases)
+    # CPG.get_cubic_height
+    t = new_phases * 4
+    h_lift = torch.where(t < 1.0, -2 * t**3 + 3 * t**2, 2 * (t - 1) ** 3 - 3 * (t - 1) ** 2 + 1)
+    h = torch.where(new_phases < 0.5, h_lift, torch.zeros_like(h_lift))
+    # foot targets along the gravitational axis
+    foot_pos_target = foot_default_xy + projected_gravity.unsqueeze(1) * (
+        foot_default_z + h * default_foot_height
+    ).unsqueeze(2)
+    joint_targets = solve_ik_kernel(
+        foot_pos_target.view(-1, 3),
+        feet_id,
+        pos_base_to_haa_center_in_base_frame,
+        haa_to_foot_y_offset,
+        a1_squared,
+        a2_squared,
+        min_reach,
+        max_reach,
+        max_reach_sp,
+        kfe_offset,
+    )
+    phases.copy_(new_phases)
+    dphases.copy_(new_dphases)
+    return joint_target.copy_(joint_targets.view(-1, 12) + normalized_action[:, 4:16])
+
+
 class ProprioceptiveObservation(ObservationBase):
-    def __init__(self, default_joint_pos=None, simulation_dt=0.0025, control_dt=0.02, num_envs=1, device="cuda:0"):
+    def __init__(
+        self,
+        default_joint_pos=None,
+        simulation_dt=0.0025,
+        control_dt=0.02,
+        num_envs=1,
+        device="cuda:0",
+        compile_joint_target=True,
+    ):
         super().__init__(simulation_dt, control_dt)
 
         history_length = 14 if simulation_dt == 0.0025 else 7
+        self.history_length = history_length
         self.history_idx = [4, 9] if simulation_dt == 0.0025 else [3, 5]
 
         self.num_envs = num_envs
@@ -63,6 +160,8 @@ class ProprioceptiveObservation(ObservationBase):
         self.joint_vel_history = torch.zeros(num_envs, history_length, 12, dtype=torch.float, requires_grad=False).to(
             device
         )
+        # the histories are ring buffers, the latest entry is at the head slot (see history_slot)
+        self._history_head = history_length - 1
         self.joint_pos_scale = torch.tensor(
             [0.5, 0.4, 0.3, 0.5, 0.4, 0.3, 0.5, 0.4, 0.3, 0.5, 0.4, 0.3], requires_grad=False
         )
@@ -70,15 +169,13 @@ class ProprioceptiveObservation(ObservationBase):
             [6.5, 4.5, 3.5, 6.5, 4.5, 3.5, 6.5, 4.5, 3.5, 6.5, 4.5, 3.5], requires_grad=False
         )
         self.freqency_scale = self.simulation_dt * 2 * np.pi
-        self.history_randomizer = Normal(
-            torch.zeros(*self.joint_pos_history.shape, requires_grad=False).to(device),
-            torch.ones(*self.joint_pos_history.shape, requires_grad=False).to(device),
-        )
+        # noise of the reset histories, only the rows of the reset environments are sampled
+        self._history_noise = torch.zeros_like(self.joint_pos_history)
         gravity_vec = torch.tensor([0.0, 0.0, 1.0]).to(device)
         self.gravity_vecs = gravity_vec.repeat((self.num_envs, 1))
-        self.joint_target = torch.tile(self.default_joint_pos, (num_envs, 1)).to(device)
-        self.prev_joint_target = torch.tile(self.default_joint_pos, (num_envs, 1)).to(device)
-        self.prev2_joint_target = torch.tile(self.default_joint_pos, (num_envs, 1)).to(device)
+        # ring buffer of the current and the two previous joint targets
+        self._joint_target_history = torch.tile(self.default_joint_pos, (num_envs, 3, 1)).to(device)
+        self._joint_target_head = 0
         self.gravitational_axis_in_base = torch.tile(torch.tensor([0, 0, 1]), (num_envs, 1)).to(device)
         self.default_foot_height = 0.20
         self.feet_id = torch.tile(torch.tensor([0, 1, 2, 3], dtype=torch.int64), (num_envs,)).view(-1).to(device)
@@ -92,6 +189,12 @@ class ProprioceptiveObservation(ObservationBase):
         self.action_std = torch.ones(16, requires_grad=False).to(device) * 0.2
         self.action_std[:4] = 0.5 * self.freqency_scale
         self.projected_gravity = torch.tile(torch.tensor([0.0, 0.0, 1.0]), (self.num_envs, 1)).to(self.device)
+        self.foot_default_xy = self.foot_default_position[0].view(4, 3).clone()
+        self.foot_default_xy[:, 2] = 0.0
+        self.ik = get_ik(device)
+        # the action, CPG and IK pipeline as one function, compiled on the first call if enabled
+        self._joint_target_fn = torch.compile(compute_joint_target) if compile_joint_target else compute_joint_target
+        self._joint_target_compiled = not compile_joint_target
         self.init()
 
         # self.is_stand = False # TODO: Temporal
@@ -158,17 +261,53 @@ class ProprioceptiveObservation(ObservationBase):
             .to(self.device)
             .detach()
         )
-        self.noise_dist = torch.distributions.Normal(0, noise_std + 1e-10)
+        self.noise_std = noise_std + 1e-10
         self.std = 1.0 / self.std
         self.obs = torch.tile(self.mean.detach().clone(), (self.num_envs, 1)).to(self.device)
+        self._obs_noise = torch.zeros_like(self.obs)
         self.joint_start_indices = [12, 24, 36] + [12 * i for i in range(5, 11)]
         self.phase_start_indices = [48]
 
+        # views of the terms in the observation buffer, written in-place by update
+        sizes = [3, 3, 3, 3, 12, 12, 12, 4, 8, 12, 12, 12, 12, 12, 12, 1]
+        (
+            self._obs_command,
+            self._obs_gravity,
+            self._obs_lin_vel,
+            self._obs_ang_vel,
+            self._obs_joint_pos,
+            self._obs_joint_vel,
+            self._obs_joint_pos_error,
+            self._obs_d_phase,
+            self._obs_phase_sin_cos,
+            self._obs_joint_pos_error_lag0,
+            self._obs_joint_pos_error_lag1,
+            self._obs_joint_vel_lag0,
+            self._obs_joint_vel_lag1,
+            self._obs_prev_joint_target,
+            self._obs_prev2_joint_target,
+            self._obs_is_stand,
+        ) = torch.split(self.obs, sizes, dim=1)
+        self._obs_phase_sin_cos = self._obs_phase_sin_cos.view(-1, 4, 2)
+        self._phase = torch.zeros(self.num_envs, 4, device=self.device)
+        self._command_norm = torch.zeros(self.num_envs, device=self.device)
+        self._is_trot = torch.zeros(self.num_envs, dtype=torch.bool, device=self.device)
+        # joint and phase reordering to raisim as a single permutation, applied together with the normalization
+        indices = torch.arange(self.obs.shape[1], device=self.device).unsqueeze(0)
+        self._raisim_indices = self.convert_observation_phase(
+            isaac_to_raisim_joint_conversion(indices, self.joint_start_indices)
+        ).squeeze(0)
+        self._raisim_mean = self.mean[self._raisim_indices]
+        self._raisim_std = self.std[self._raisim_indices]
+        # action reordering from raisim as a single permutation
+        self._action_indices = torch.arange(16, device=self.device)
+        self._raisim_action_indices = self.convert_action_order(self._action_indices.unsqueeze(0)).squeeze(0)
+
     def update(self, joint_pos, joint_vel, command, base_lin_v, base_ang_v, projected_gravity):
         # If local variables are not available, calculate here.
         # Use local variables if they are already calculated to reduce computation.
 
-        self.is_stand = torch.norm(command, dim=1) < 0.01
+        torch.lt(torch.linalg.vector_norm(command, dim=1, out=self._command_norm), 0.01, out=self.is_stand)
         # self.update_stand_trot_phase()
         # base_quat = gc[:, 3:7]
         # if base_lin_v is None:
@@ -177,62 +316,95 @@ class ProprioceptiveObservation(ObservationBase):
         #     base_ang_v = math_utils.quat_rotate_inverse(base_quat, gv[:, 3:6])
         # if projected_gravity is None:
         #     projected_gravity = math_utils.quat_rotate_inverse(base_quat, self.gravity_vecs)
-        self.projected_gravity = projected_gravity * -1  # change orientation of gravity vector
-        phase = self.cpg.get_phase()
-        phase_sin_cos = torch.cat([torch.sin(phase).view(-1, 4, 1), torch.cos(phase).view(-1, 4, 1)], dim=2).view(-1, 8)
-        self.obs = torch.cat(
-            [
-                command,
-                self.projected_gravity,
-                base_lin_v,
-                base_ang_v,
-                joint_pos,  # gc[:, 7:19],
-                joint_vel,  # gv[:, 6:18],
-                self.joint_pos_history[:, -1, :],
-                self.cpg.get_d_phase(),
-                phase_sin_cos,
-                self.joint_pos_history[:, -self.history_idx[0], :],
-                self.joint_pos_history[:, -self.history_idx[1], :],
-                self.joint_vel_history[:, -self.history_idx[0], :],
-                self.joint_vel_history[:, -self.history_idx[1], :],
-                self.prev_joint_target,
-                self.prev2_joint_target,
-                self.is_stand_tensor(),
-            ],
-            dim=1,
-        )
+        torch.neg(projected_gravity, out=self.projected_gravity)  # change orientation of gravity vector
+        # write the terms into the preallocated observation buffer
+        self._obs_command.copy_(command)
+        self._obs_gravity.copy_(self.projected_gravity)
+        self._obs_lin_vel.copy_(base_lin_v)
+        self._obs_ang_vel.copy_(base_ang_v)
+        self._obs_joint_pos.copy_(joint_pos)  # gc[:, 7:19],
+        self._obs_joint_vel.copy_(joint_vel)  # gv[:, 6:18],
+        self._obs_joint_pos_error.copy_(self.joint_pos_history[:, self.history_slot(1), :])
+        self.cpg.get_d_phase(out=self._obs_d_phase)
+        phase = self.cpg.get_phase(out=self._phase)
+        torch.sin(phase, out=self._obs_phase_sin_cos[:, :, 0])
+        torch.cos(phase, out=self._obs_phase_sin_cos[:, :, 1])
+        lag0, lag1 = self.history_slot(self.history_idx[0]), self.history_slot(self.history_idx[1])
+        self._obs_joint_pos_error_lag0.copy_(self.joint_pos_history[:, lag0, :])
+        self._obs_joint_pos_error_lag1.copy_(self.joint_pos_history[:, lag1, :])
+        self._obs_joint_vel_lag0.copy_(self.joint_vel_history[:, lag0, :])
+        self._obs_joint_vel_lag1.copy_(self.joint_vel_history[:, lag1, :])
+        self._obs_prev_joint_target.copy_(self.prev_joint_target)
+        self._obs_prev2_joint_target.copy_(self.prev2_joint_target)
+        torch.logical_not(self.is_stand, out=self._is_trot)
+        torch.mul(self._is_trot.unsqueeze(1), self.base_frequency, out=self._obs_is_stand).mul_(self.freqency_scale)
         return self.obs
 
     def get_obs(self, use_raisim_order=False) -> torch.Tensor:
-        obs = (self.obs - self.mean) / self.std
         if use_raisim_order:
-            obs = isaac_to_raisim_joint_conversion(obs, self.joint_start_indices)
-            # obs = isaac_raisim_foot_conversion(obs, self.phase_start_indices)
-            obs = self.convert_observation_phase(obs)
-        return obs
+            # reorder first, then normalize with the reordered mean and std
+            obs = torch.index_select(self.obs, 1, self._raisim_indices)
+            return obs.sub_(self._raisim_mean).div_(self._raisim_std)
+        return (self.obs - self.mean) / self.std
 
     def get_noisy_obs(self, use_raisim_order=False) -> torch.Tensor:
         obs = self.get_obs(use_raisim_order=use_raisim_order)
-        return obs + self.noise_dist.sample((obs.shape[0],))
+        return obs.addcmul_(self._obs_noise.normal_(), self.noise_std)
 
     def store_action_and_get_joint_target(self, action, use_raisim_order=False):
-        if use_raisim_order:
-            # raisim order to isaac
-            action = self.convert_action_order(action)
-        self.prev2_joint_target = self.prev_joint_target
-        self.prev_joint_target = self.joint_target
-        normalized_action = action.detach() * self.action_std + self.action_mean
-        self.joint_target = self.apply_cpg_action_and_get_joint_target(normalized_action)
-        # return self.default_joint_pos
-        return self.joint_target
+        # raisim order to isaac
+        action_indices = self._raisim_action_indices if use_raisim_order else self._action_indices
+        # the target is written to the slot of prev2, the head only advances once it is computed
+        head = (self._joint_target_head + 1) % 3
+        args = (
+            action.detach(),
+            action_indices,
+            self.action_std,
+            self.action_mean,
+            self.cpg.base_phase_step,
+            float(self.cpg.decimation),
+            self.cpg.phases,
+            self.cpg.dphases,
+            self.projected_gravity,
+            self.foot_default_xy,
+            self.foot_default_z,
+            self.default_foot_height,
+            self.feet_id,
+            self.ik.pos_base_to_haa_center_in_base_frame,
+            self.ik.haa_to_foot_y_offset,
+            self.ik.a1_squared,
+            self.ik.a2_squared,
+            self.ik.min_reach,
+            self.ik.max_reach,
+            self.ik.max_reach_sp,
+            self.ik.kfe_offset,
+            self._joint_target_history[:, head],
+        )
+        try:
+            joint_target = self._joint_target_fn(*args)
+        except (BackendCompilerFailed, Unsupported) as e:
+            if self._joint_target_compiled:
+                raise
+            # fall back to the eager function if compiling on the first call is not supported
+            print(f"[ProprioceptiveObservation] Compiling the joint target failed, using eager mode instead: {e}")
+            self._joint_target_fn = compute_joint_target
+            joint_target = compute_joint_target(*args)
+        self._joint_target_compiled = True
+        # advance the ring buffer, the previous targets become prev and prev2
+        self._joint_target_head = head
+        return joint_target
 
     def reset(self, env_idx):
         self.joint_target[env_idx] = self.default_joint_pos
         self.prev_joint_target[env_idx] = self.default_joint_pos
         self.prev2_joint_target[env_idx] = self.default_joint_pos
 
-        self.joint_pos_history[env_idx] = 0.1 * self.history_randomizer.sample()[env_idx]
-        self.joint_vel_history[env_idx] = self.history_randomizer.sample()[env_idx]
+        # the entries are i.i.d., so the order of the ring buffer does not matter
+        # the noise takes the shape of the indexed rows, such that any index of the environments is accepted
+        shape = self.joint_pos_history[env_idx].shape
+        noise = self._history_noise.view(-1)[: shape.numel()].view(shape)
+        self.joint_pos_history[env_idx] = noise.normal_().mul_(0.1)
+        self.joint_vel_history[env_idx] = noise.normal_()
         self.set_trot_phase(env_idx)
 
     def is_stand_tensor(self):
@@ -255,28 +427,13 @@ class ProprioceptiveObservation(ObservationBase):
             indices[s + 5] = s + 3
         return torch.index_select(x, 1, indices)
 
-    def apply_cpg_action_and_get_joint_target(self, normalized_action):
-        dphase = normalized_action[:, :4]
-        self.cpg.update_phase(dphase)
-        h = self.cpg.get_cubic_height()
-        foot_pos_target = self.foot_default_position.detach().clone()  # (num_env, 12)
-        foot_pos_target[:, 2:12:3] = 0.0
-        gravitational_axis_in_base = torch.unsqueeze(self.projected_gravity, 1)
-        gravitational_axis_in_base = torch.tile(gravitational_axis_in_base, (1, 4, 1))
-        foot_pos_target += torch.einsum(
-            "efd,ef->efd", gravitational_axis_in_base, (self.foot_default_z + h * self.default_foot_height)
-        ).view(-1, 12)
-        joint_targets = solve_ik(foot_pos_target.view(-1, 3), self.feet_id)
-        self.joint_target = joint_targets.view(-1, 12) + normalized_action[:, 4:16]
-        return self.joint_target
-
     def update_stand_trot_phase(self):
         changed = ~(self.prev_is_stand == self.is_stand)
         stand_idx = ((self.is_stand > 0.5) & changed).nonzero().flatten()
         trot_idx = ((self.is_stand < 0.5) & changed).nonzero().flatten()
         self.set_stand_phase(stand_idx)
         self.set_trot_phase(trot_idx)
-        self.prev_is_stand = self.is_stand
+        self.prev_is_stand.copy_(self.is_stand)
 
     def set_stand_phase(self, idx):
         self.cpg.reset_stance(idx)
@@ -287,17 +444,27 @@ class ProprioceptiveObservation(ObservationBase):
     def reset_stand_phase(self):
         return None
 
+    @property
+    def joint_target(self):
+        return self._joint_target_history[:, self._joint_target_head]
+
+    @property
+    def prev_joint_target(self):
+        return self._joint_target_history[:, (self._joint_target_head - 1) % 3]
+
+    @property
+    def prev2_joint_target(self):
+        return self._joint_target_history[:, (self._joint_target_head - 2) % 3]
+
+    def history_slot(self, idx):
+        # slot of the ring-buffered histories that holds history[:, -idx] of a shifted history, 1 being the latest
+        return (self._history_head + 1 - idx) % self.history_length
+
     def substep_update(self, joint_pos, joint_vel):
-        if self.num_envs > 1:
-            self.joint_pos_history[:, :-1, :] = self.joint_pos_history[:, 1:, :]
-            self.joint_vel_history[:, :-1, :] = self.joint_vel_history[:, 1:, :]
-            self.joint_pos_history[:, -1, :] = self.joint_target - joint_pos
-            self.joint_vel_history[:, -1, :] = joint_vel
-        else:
-            self.joint_pos_history[:, :-1, :] = self.joint_pos_history[:, 1:, :].clone()
-            self.joint_vel_history[:, :-1, :] = self.joint_vel_history[:, 1:, :].clone()
-            self.joint_pos_history[:, -1, :] = self.joint_target - joint_pos
-            self.joint_vel_history[:, -1, :] = joint_vel
+        # overwrite the oldest entry instead of shifting the histories
+        self._history_head = (self._history_head + 1) % self.history_length
+        torch.sub(self.joint_target, joint_pos, out=self.joint_pos_history[:, self._history_head, :])
+        self.joint_vel_history[:, self._history_head, :] = joint_vel
 
     def get_base_frequency(self):
         return self.base_frequency
@@ -22,39 +22,111 @@ isaac_raisim_indices_foot = torch.tensor([0, 2, 1, 3])
 # isaac_raisim_indices_foot = torch.tensor([0, 2, 1, 3])
 
 
+class IndexConverter:
+    """Reorder blocks along the second dimension of a tensor with a fixed block permutation.
+
+    The block permutation is applied at every start index. The index tables of the full dimension, the forward
+    permutation and its inverse, only depend on the dimension, the start indices and the device. They are built once
+    per signature and cached, such that a conversion is a single :func:`torch.index_select` without host-device copies.
+    """
+
+    def __init__(self, block_indices: torch.Tensor):
+        """Initialize the converter.
+
+        Args:
+            block_indices: The permutation of a block of shape (block_size,).
+        """
+        self.block_indices = block_indices.long()
+        self._tables: dict[tuple, tuple[torch.Tensor, torch.Tensor | None]] = {}
+
+    def indices(
+        self, dim: int, start_indices: list[int], device: torch.device | str
+    ) -> tuple[torch.Tensor, torch.Tensor | None]:
+        """The forward and the inverse index table of a signature.
+
+        Args:
+            dim: The size of the converted dimension.
+            start_indices: The indices at which the block permutation is applied.
+            device: The device of the tables.
+
+        Returns:
+            A tuple containing the forward indices (dim,) and the inverse indices (dim,). The inverse is None if the
+            blocks overlap such that the forward indices are not a permutation.
+        """
+        key = (dim, tuple(start_indices), torch.device(device))
+        tables = self._tables.get(key)
+        if tables is None:
+            forward = torch.arange(dim)
+            n_block = self.block_indices.shape[0]
+            for idx in start_indices:
+                forward[idx : idx + n_block] = self.block_indices + idx
+            inverse = None
+            if torch.equal(torch.sort(forward).values, torch.arange(dim)):
+                inverse = torch.empty_like(forward)
+                inverse[forward] = torch.arange(dim)
+                inverse = inverse.to(device)
+            tables = (forward.to(device), inverse)
+            self._tables[key] = tables
+        return tables
+
+    def __call__(
+        self, x: torch.Tensor, start_indices: list[int] = [0], inverse: bool = False, out: torch.Tensor | None = None
+    ) -> torch.Tensor:
+        """Convert a tensor.
+
+        Args:
+            x: The tensor to convert of shape (batch, dim).
+            start_indices: The indices at which the block permutation is applied. Defaults to [0].
+            inverse: Whether to apply the inverse conversion. Defaults to False.
+            out: The buffer of shape (batch, dim) to write the result into. Defaults to None.
+
+        Returns:
+            The converted tensor.
+        """
+        forward, backward = self.indices(x.shape[1], start_indices, x.device)
+        if inverse and backward is None:
+            raise ValueError(f"The conversion at the start indices {start_indices} is not a permutation.")
+        return torch.index_select(x, 1, backward if inverse else forward, out=out)
+
+
+joint_converter = IndexConverter(isaac_gym_raisim_indices_joint)
+"""Converter of the joint order between isaac (legged gym) and raisim."""
+
+foot_converter = IndexConverter(isaac_raisim_indices_foot)
+"""Converter of the foot order between isaac and raisim."""
+
+_converters: dict[tuple[int, ...], IndexConverter] = {}
+"""Cached converters of other block permutations by their block indices."""
+
+
+def _get_converter(block_indices: tuple[int, ...]) -> IndexConverter:
+    """The cached converter of a block permutation."""
+    if block_indices not in _converters:
+        _converters[block_indices] = IndexConverter(torch.tensor(block_indices))
+    return _converters[block_indices]
+
+
 def convert(x, joint_indices, start_indices=[0]):
-    indices = torch.arange(x.shape[1]).to(x.device)
-    n_joint = joint_indices.shape[0]
-    for idx in start_indices:
-        indices[idx : idx + n_joint] = joint_indices.to(x.device) + idx
-    return torch.index_select(x, 1, indices)
+    return _get_converter(tuple(joint_indices.tolist()))(x, start_indices)
 
 
 def isaac_to_raisim_joint_conversion(x, start_indices=[0]):
-    indices = isaac_gym_raisim_indices_joint  # isaac_to_raisim_indices_joint
-    return convert(x, indices, start_indices=start_indices)
+    return joint_converter(x, start_indices)
 
 
 def raisim_to_isaac_joint_conversion(x, start_indices=[0]):
-    indices = isaac_gym_raisim_indices_joint  # raisim_to_isaac_indices_joint
-    return convert(x, indices, start_indices=start_indices)
+    return joint_converter(x, start_indices, inverse=True)
 
 
 def isaac_raisim_foot_conversion(x, start_indices=[0]):
-    indices = isaac_raisim_indices_foot
-    return convert(x, indices, start_indices=start_indices)
+    return foot_converter(x, start_indices)
 
 
 def isaac_raisim_batched_conversion(x, start_indices=[0], batch_size=1):
     # n = x.shape[1] // 4
     n = batch_size
-    indices = torch.arange(x.shape[1]).to(x.device)
-    batch = torch.cat(
-        (torch.arange(0, n), torch.arange(n * 2, n * 3), torch.arange(n, n * 2), torch.arange(n * 3, n * 4))
-    )
-    for idx in start_indices:
-        indices[idx : idx + batch.shape[0]] = batch.to(x.device) + idx
-    return torch.index_select(x, 1, indices.to(x.device))
+    batch = (*range(0, n), *range(n * 2, n * 3), *range(n, n * 2), *range(n * 3, n * 4))
+    return _get_converter(batch)(x, start_indices)
 
 
 if __name__ == "__main__":
@@ -1,2 +1,7 @@
 from .navigation_terrains_cfg import *
 from .height_field import *
+from .occupancy_map import OCCUPANCY_KEY, TerrainOccupancyMap, TileOccupancy, get_terrain_occupancy_map
+from .terrain_generator import ParallelTerrainGenerator, tile_seed
+from .terrain_generator_cfg import ParallelTerrainGeneratorCfg
+from .terrain_importer import TerrainGeneratorImporter
+from .terrain_importer_cfg import TerrainGeneratorImporterCfg
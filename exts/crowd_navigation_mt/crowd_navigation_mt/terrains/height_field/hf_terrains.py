@@ -231,6 +231,8 @@ def discrete_obstacles_terrain(difficulty: float, cfg: hf_terrains_cfg.HfDiscret
         The shape of the array is (width, length), where width and length are the number of points
         along the x and y axis, respectively.
     """
+    rng = _terrain_rng()
+
     # resolve terrain configuration
     obs_height = cfg.obstacle_height_range[0] + difficulty * (
         cfg.obstacle_height_range[1] - cfg.obstacle_height_range[0]
@@ -258,26 +260,21 @@ def discrete_obstacles_terrain(difficulty: float, cfg: hf_terrains_cfg.HfDiscret
     # create a terrain with a flat platform at the center
     hf_raw = np.zeros((width_pixels, length_pixels))
     # generate the obstacles
-    for _ in range(int(cfg.num_obstacles * difficulty)):
-        # sample size
-        if cfg.obstacle_height_mode == "choice":
-            height = np.random.choice([-obs_height, -obs_height // 2, obs_height // 2, obs_height])
-        elif cfg.obstacle_height_mode == "fixed":
-            height = obs_height
-        else:
-            raise ValueError(f"Unknown obstacle height mode '{cfg.obstacle_height_mode}'. Must be 'choice' or 'fixed'.")
-        width = int(np.random.choice(obs_width_range))
-        length = int(np.random.choice(obs_length_range))
-        # sample position
-        x_start = int(np.random.choice(obs_x_range))
-        y_start = int(np.random.choice(obs_y_range))
-        # clip start position to the terrain
-        if x_start + width > width_pixels:
-            x_start = width_pixels - width
-        if y_start + length > length_pixels:
-            y_start = length_pixels - length
-        # add to terrain
-        hf_raw[x_start : x_start + width, y_start : y_start + length] = height
+    num_obstacles = int(cfg.num_obstacles * difficulty)
+    # -- sample size
+    if cfg.obstacle_height_mode == "choice":
+        heights = rng.choice([-obs_height, -obs_height // 2, obs_height // 2, obs_height], size=num_obstacles)
+    elif cfg.obstacle_height_mode == "fixed":
+        heights = np.full(num_obstacles, obs_height)
+    else:
+        raise ValueError(f"Unknown obstacle height mode '{cfg.obstacle_height_mode}'. Must be 'choice' or 'fixed'.")
+    widths = rng.choice(obs_width_range, size=num_obstacles)
+    lengths = rng.choice(obs_length_range, size=num_obstacles)
+    # -- sample position and clip it to the terrain
+    x_starts = np.minimum(rng.choice(obs_x_range, size=num_obstacles), width_pixels - widths)
+    y_starts = np.minimum(rng.choice(obs_y_range, size=num_obstacles), length_pixels - lengths)
+    # -- add to terrain
+    _paint_rectangles(hf_raw, x_starts, y_starts, widths, lengths, heights)
     # clip the terrain to the platform
     x1 = (width_pixels - platform_width) // 2
     x2 = (width_pixels + platform_width) // 2
@@ -321,6 +318,8 @@ def discrete_obstacles_terrain_wedge(
         The shape of the array is (width, length), where width and length are the number of points
         along the x and y axis, respectively.
     """
+    rng = _terrain_rng()
+
     # resolve terrain configuration
     obs_height = cfg.obstacle_height_range[0] + difficulty * (
         cfg.obstacle_height_range[1] - cfg.obstacle_height_range[0]
@@ -348,50 +347,43 @@ def discrete_obstacles_terrain_wedge(
     # create a terrain with a flat platform at the center
     hf_raw = np.zeros((width_pixels, length_pixels))
     # generate the obstacles
-    for _ in range(int(cfg.num_obstacles * difficulty)):
-        # sample size
-        if cfg.obstacle_height_mode == "choice":
-            height = np.random.choice([-obs_height, -obs_height // 2, obs_height // 2, obs_height])
-        elif cfg.obstacle_height_mode == "fixed":
-            height = obs_height
-        else:
-            raise ValueError(f"Unknown obstacle height mode '{cfg.obstacle_height_mode}'. Must be 'choice' or 'fixed'.")
-        width = int(np.random.choice(obs_width_range))
-        length = int(np.random.choice(obs_length_range))
-        # sample position
-        x_start = int(np.random.choice(obs_x_range))
-        y_start = int(np.random.choice(obs_y_range))
-        # clip start position to the terrain
-        if x_start + width > width_pixels:
-            x_start = width_pixels - width
-        if y_start + length > length_pixels:
-            y_start = length_pixels - length
-        # add to terrain
-        hf_raw[x_start : x_start + width, y_start : y_start + length] = height
+    num_obstacles = int(cfg.num_obstacles * difficulty)
+    # -- sample size
+    if cfg.obstacle_height_mode == "choice":
+        heights = rng.choice([-obs_height, -obs_height // 2, obs_height // 2, obs_height], size=num_obstacles)
+    elif cfg.obstacle_height_mode == "fixed":
+        heights = np.full(num_obstacles, obs_height)
+    else:
+        raise ValueError(f"Unknown obstacle height mode '{cfg.obstacle_height_mode}'. Must be 'choice' or 'fixed'.")
+    widths = rng.choice(obs_width_range, size=num_obstacles)
+    lengths = rng.choice(obs_length_range, size=num_obstacles)
+    # -- sample position and clip it to the terrain
+    x_starts = np.minimum(rng.choice(obs_x_range, size=num_obstacles), width_pixels - widths)
+    y_starts = np.minimum(rng.choice(obs_y_range, size=num_obstacles), length_pixels - lengths)
+    # -- add to terrain
+    _paint_rectangles(hf_raw, x_starts, y_starts, widths, lengths, heights)
 
     # add wedge:
-    wedge_width = np.random.uniform(*cfg.wedge_width_range)
-    wedge_depth = np.random.uniform(*cfg.wedge_depth_range)
+    wedge_width = rng.uniform(*cfg.wedge_width_range)
+    wedge_depth = rng.uniform(*cfg.wedge_depth_range)
     wedge_width_pixels = int(wedge_width / cfg.horizontal_scale)
     wedge_depth_pixels = int(wedge_depth / cfg.horizontal_scale)
     thickness = int(cfg.wedge_thickness / cfg.horizontal_scale)
     center_x = width_pixels // 2
 
-    for y_pos in range(wedge_depth_pixels):
-        # x_pos = length_pixels - 1 - y_pos
-
-        # Calculate left arm x positions
-        left_x = -thickness // 2 + y_pos * (wedge_width_pixels // 2) // wedge_depth_pixels + center_x
-
-        # Calculate right arm x positions
-        right_x = thickness // 2 - y_pos * (wedge_width_pixels // 2) // wedge_depth_pixels + center_x
-
-        # Draw thickness
-        hf_raw[y_pos, left_x : left_x + thickness] = obs_height
-        hf_raw[y_pos, right_x - thickness : right_x] = obs_height
+    y_pos = np.arange(wedge_depth_pixels)
+    # Calculate left arm x positions
+    left_x = -thickness // 2 + y_pos * (wedge_width_pixels // 2) // wedge_depth_pixels + center_x
+    # Calculate right arm x positions
+    right_x = thickness // 2 - y_pos * (wedge_width_pixels // 2) // wedge_depth_pixels + center_x
+    # Draw thickness, every pixel row of an arm is a rectangle of width one
+    row_widths = np.ones_like(y_pos)
+    arm_thicknesses = np.full_like(y_pos, thickness)
+    _paint_rectangles(hf_raw, y_pos, left_x, row_widths, arm_thicknesses, obs_height)
+    _paint_rectangles(hf_raw, y_pos, right_x - thickness, row_widths, arm_thicknesses, obs_height)
 
     # random rotate
-    rotation_choice = np.random.choice([0, 90, 180, 270])
+    rotation_choice = rng.choice([0, 90, 180, 270])
     if rotation_choice == 90:
         hf_raw = np.fliplr(hf_raw.T)
     elif rotation_choice == 180:
@@ -655,6 +647,8 @@ def discrete_obstacles_cell_side_terrain(
         The shape of the array is (width, length), where width and length are the number of points
         along the x and y axis, respectively.
     """
+    rng = _terrain_rng()
+
     # resolve terrain configuration
     obs_height = cfg.obstacle_height_range[0] + difficulty * (
         cfg.obstacle_height_range[1] - cfg.obstacle_height_range[0]
@@ -682,26 +676,21 @@ def discrete_obstacles_cell_side_terrain(
     # create a terrain with a flat platform at the center
     hf_raw = np.zeros((width_pixels, length_pixels))
     # generate the obstacles
-    for _ in range(int(cfg.num_obstacles * difficulty)):
-        # sample size
-        if cfg.obstacle_height_mode == "choice":
-            height = np.random.choice([-obs_height, -obs_height // 2, obs_height // 2, obs_height])
-        elif cfg.obstacle_height_mode == "fixed":
-            height = obs_height
-        else:
-            raise ValueError(f"Unknown obstacle height mode '{cfg.obstacle_height_mode}'. Must be 'choice' or 'fixed'.")
-        width = int(np.random.choice(obs_width_range))
-        length = int(np.random.choice(obs_length_range))
-        # sample position
-        x_start = int(np.random.choice(obs_x_range))
-        y_start = int(np.random.choice(obs_y_range))
-        # clip start position to the terrain
-        if x_start + width > width_pixels:
-            x_start = width_pixels - width
-        if y_start + length > length_pixels:
-            y_start = length_pixels - length
-        # add to terrain
-        hf_raw[x_start : x_start + width, y_start : y_start + length] = height
+    num_obstacles = int(cfg.num_obstacles * difficulty)
+    # -- sample size
+    if cfg.obstacle_height_mode == "choice":
+        heights = rng.choice([-obs_height, -obs_height // 2, obs_height // 2, obs_height], size=num_obstacles)
+    elif cfg.obstacle_height_mode == "fixed":
+        heights = np.full(num_obstacles, obs_height)
+    else:
+        raise ValueError(f"Unknown obstacle height mode '{cfg.obstacle_height_mode}'. Must be 'choice' or 'fixed'.")
+    widths = rng.choice(obs_width_range, size=num_obstacles)
+    lengths = rng.choice(obs_length_range, size=num_obstacles)
+    # -- sample position and clip it to the terrain
+    x_starts = np.minimum(rng.choice(obs_x_range, size=num_obstacles), width_pixels - widths)
+    y_starts = np.minimum(rng.choice(obs_y_range, size=num_obstacles), length_pixels - lengths)
+    # -- add to terrain
+    _paint_rectangles(hf_raw, x_starts, y_starts, widths, lengths, heights)
     # clip the terrain to the platform
     x1 = (width_pixels - platform_width) // 2
     x2 = (width_pixels + platform_width) // 2
@@ -714,8 +703,8 @@ def discrete_obstacles_cell_side_terrain(
 
     half_cell_wall_width = int(difficulty_rescaled * cfg.cell_wall_width / (cfg.horizontal_scale * 2))
 
-    random_x_shift = np.random.uniform(*cfg.position_range) * difficulty
-    random_y_shift = np.random.uniform(*cfg.position_range) * difficulty
+    random_x_shift = rng.uniform(*cfg.position_range) * difficulty
+    random_y_shift = rng.uniform(*cfg.position_range) * difficulty
     midx = int(width_pixels / 2 + random_x_shift / cfg.horizontal_scale)
     midy = int(length_pixels / 2 + random_y_shift / cfg.horizontal_scale)
     thickness = int(cfg.cell_wall_thickness / cfg.horizontal_scale)
@@ -913,3 +902,73 @@ def stepping_stones_terrain(difficulty: float, cfg: hf_terrains_cfg.HfSteppingSt
     hf_raw[x1:x2, y1:y2] = 0
     # round off the heights to the nearest vertical step
     return np.rint(hf_raw).astype(np.int16)
+
+
+"""
+Helper functions.
+"""
+
+
+def _terrain_rng() -> np.random.Generator:
+    """Local random number generator of a terrain.
+
+    The generator is seeded with a single draw from the global NumPy random state. The terrains are therefore
+    reproducible under the seed of the terrain generator, and the number of random draws of one terrain does not shift
+    the random numbers of the following terrains.
+    """
+    return np.random.default_rng(np.random.randint(np.iinfo(np.int32).max))
+
+
+def _paint_rectangles(
+    hf: np.ndarray,
+    x_starts: np.ndarray,
+    y_starts: np.ndarray,
+    widths: np.ndarray,
+    lengths: np.ndarray,
+    heights: np.ndarray | float,
+):
+    """Set the pixels of axis-aligned rectangles in the height field to their height in-place.
+
+    All rectangles are painted at once. Where rectangles overlap, the later rectangle wins as if they were painted one
+    after the other. Rectangles are clipped to the height field.
+
+    If all rectangles have the same height, the covered pixels are found with a 2D difference array, which scales with
+    the number of pixels. Otherwise, the last rectangle covering a pixel is found over all rectangles.
+
+    Args:
+        hf: The height field of shape (width, length).
+        x_starts: The first x pixel of the rectangles of shape (num_rectangles,).
+        y_starts: The first y pixel of the rectangles of shape (num_rectangles,).
+        widths: The number of pixels along x of the rectangles of shape (num_rectangles,).
+        lengths: The number of pixels along y of the rectangles of shape (num_rectangles,).
+        heights: The heights of the rectangles of shape (num_rectangles,) or a single height for all rectangles.
+    """
+    num_rectangles = len(x_starts)
+    if num_rectangles == 0:
+        return
+    heights = np.broadcast_to(heights, num_rectangles)
+
+    if np.all(heights == heights[0]):
+        # difference array: +1 at the start corners and -1 at the end corners, the 2D cumsum counts the rectangles
+        x_stops = np.clip(x_starts + widths, 0, hf.shape[0])
+        y_stops = np.clip(y_starts + lengths, 0, hf.shape[1])
+        x_starts = np.clip(x_starts, 0, hf.shape[0])
+        y_starts = np.clip(y_starts, 0, hf.shape[1])
+        diff = np.zeros((hf.shape[0] + 1, hf.shape[1] + 1), dtype=np.int64)
+        np.add.at(diff, (x_starts, y_starts), 1)
+        np.add.at(diff, (x_stops, y_starts), -1)
+        np.add.at(diff, (x_starts, y_stops), -1)
+        np.add.at(diff, (x_stops, y_stops), 1)
+        painted = diff.cumsum(axis=0).cumsum(axis=1)[: hf.shape[0], : hf.shape[1]] > 0
+        hf[painted] = heights[0]
+        return
+
+    x = np.arange(hf.shape[0])
+    y = np.arange(hf.shape[1])
+    in_x = (x >= x_starts[:, None]) & (x < (x_starts + widths)[:, None])
+    in_y = (y >= y_starts[:, None]) & (y < (y_starts + lengths)[:, None])
+    # index of the last rectangle covering a pixel, shape (width, length)
+    covered = in_x[:, :, None] & in_y[:, None, :]
+    last = num_rectangles - 1 - np.argmax(covered[::-1], axis=0)
+    painted = covered.any(axis=0)
+    hf[painted] = heights[last[painted]]
@@ -28,6 +28,26 @@ class HfTerrainBaseCfg(SubTerrainBaseCfg):
     slope_threshold: float | None = None
     """The slope threshold above which surfaces are made vertical. Defaults to None,
     in which case no correction is applied."""
+    occupancy_height_threshold: float | None = None
+    """The height difference to the origin above which a pixel is occupied in meters. Defaults to None, in which case
+    no occupancy record is computed.
+
+    The occupancy record of the sub-terrain is attached to the metadata of its mesh, see :class:`TileOccupancy`. The
+    records are only stitched into an occupancy map by the :class:`ParallelTerrainGenerator`.
+    """
+    simplify_mesh: bool = False
+    """Whether to merge coplanar cells of the mesh into larger quads. Defaults to False.
+
+    Flat regions and vertical walls are merged without changing the surface, which reduces the number of triangles
+    and speeds up raycasting against the terrain. See :func:`simplify_height_field_mesh`.
+    """
+    mesh_cache_dir: str | None = None
+    """The directory of the on-disk cache of the converted meshes. Defaults to None, in which case the meshes are not
+    cached.
+
+    The meshes are cached by the content of the height field and the conversion parameters, such that the cache never
+    returns a stale mesh. This pays off for large height fields, for small ones the conversion is as fast as loading.
+    """
 
 
 """
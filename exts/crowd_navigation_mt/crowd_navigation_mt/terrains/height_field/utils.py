@@ -7,11 +7,15 @@ from __future__ import annotations
 
 import copy
 import functools
+import hashlib
 import numpy as np
+import os
 import trimesh
 from collections.abc import Callable
 from typing import TYPE_CHECKING
 
+from ..occupancy_map import OCCUPANCY_KEY, TileOccupancy
+
 if TYPE_CHECKING:
     from .hf_terrains_cfg import HfTerrainBaseCfg
 
@@ -59,9 +63,18 @@ def height_field_to_mesh(func: Callable) -> Callable:
         cfg.size = terrain_size
 
         # convert to trimesh
-        vertices, triangles = convert_height_field_to_mesh(
-            heights, cfg.horizontal_scale, cfg.vertical_scale, cfg.slope_threshold
-        )
+        if cfg.mesh_cache_dir is not None:
+            vertices, triangles = convert_height_field_to_mesh_cached(
+                heights, cfg.horizontal_scale, cfg.vertical_scale, cfg.slope_threshold, cfg.mesh_cache_dir
+            )
+        else:
+            vertices, triangles = convert_height_field_to_mesh(
+                heights, cfg.horizontal_scale, cfg.vertical_scale, cfg.slope_threshold
+            )
+        if cfg.simplify_mesh:
+            # the converted height field is padded by one pixel on each side
+            grid_shape = (heights.shape[0] + 2, heights.shape[1] + 2)
+            vertices, triangles = simplify_height_field_mesh(vertices, grid_shape)
         mesh = trimesh.Trimesh(vertices=vertices, faces=triangles)
         # compute origin
         x1 = int((cfg.size[0] * 0.125 - 1) / cfg.horizontal_scale)
@@ -70,6 +83,11 @@ def height_field_to_mesh(func: Callable) -> Callable:
         y2 = int((cfg.size[1] * 0.125 + 1) / cfg.horizontal_scale)
         origin_z = np.max(heights[x1:x2, y1:y2]) * cfg.vertical_scale
         origin = np.array([0.5 * cfg.size[0], 0.5 * cfg.size[1], origin_z])
+        # attach the occupancy of the height field
+        if cfg.occupancy_height_threshold is not None:
+            mesh.metadata[OCCUPANCY_KEY] = TileOccupancy.from_height_field(
+                heights, cfg.horizontal_scale, cfg.vertical_scale, origin_z, cfg.occupancy_height_threshold
+            )
         # return mesh and origin
         return [mesh], origin
 
@@ -158,20 +176,152 @@ def convert_height_field_to_mesh(
     vertices[:, 0] = xx.flatten()
     vertices[:, 1] = yy.flatten()
     vertices[:, 2] = hf.flatten() * vertical_scale
-    # create triangles for the mesh
-    triangles = -np.ones((2 * (num_rows - 1) * (num_cols - 1), 3), dtype=np.uint32)
-    for i in range(num_rows - 1):
-        ind0 = np.arange(0, num_cols - 1) + i * num_cols
-        ind1 = ind0 + 1
-        ind2 = ind0 + num_cols
-        ind3 = ind2 + 1
-        start = 2 * i * (num_cols - 1)
-        stop = start + 2 * (num_cols - 1)
-        triangles[start:stop:2, 0] = ind0
-        triangles[start:stop:2, 1] = ind3
-        triangles[start:stop:2, 2] = ind1
-        triangles[start + 1 : stop : 2, 0] = ind0
-        triangles[start + 1 : stop : 2, 1] = ind2
-        triangles[start + 1 : stop : 2, 2] = ind3
+    # create triangles for the mesh, two per grid cell ordered row by row
+    ind0 = (np.arange(num_rows - 1)[:, None] * num_cols + np.arange(num_cols - 1)[None, :]).astype(np.uint32)
+    ind1 = ind0 + 1
+    ind2 = ind0 + num_cols
+    ind3 = ind2 + 1
+    triangles = np.stack((np.stack((ind0, ind3, ind1), axis=-1), np.stack((ind0, ind2, ind3), axis=-1)), axis=2)
+
+    return vertices, triangles.reshape(-1, 3)
+
+
+def convert_height_field_to_mesh_cached(
+    height_field: np.ndarray,
+    horizontal_scale: float,
+    vertical_scale: float,
+    slope_threshold: float | None = None,
+    cache_dir: str = "/tmp/crowd_navigation_mt/hf_meshes",
+) -> tuple[np.ndarray, np.ndarray]:
+    """Convert a height-field array to a triangle mesh with an on-disk cache.
+
+    The cache is content-addressed: the vertices and triangles of :func:`convert_height_field_to_mesh` are stored as
+    ``.npz`` file named by a hash of the height field and the conversion parameters. The same height field is therefore
+    only converted once, independent of the terrain configuration or the random seed that produced it.
+
+    Args:
+        height_field: The input height-field array.
+        horizontal_scale: The discretization of the terrain along the x and y axis.
+        vertical_scale: The discretization of the terrain along the z axis.
+        slope_threshold: The slope threshold above which surfaces are made vertical.
+            Defaults to None, in which case no correction is applied.
+        cache_dir: The directory of the cached meshes. Defaults to "/tmp/crowd_navigation_mt/hf_meshes".
+
+    Returns:
+        The vertices and triangles of the mesh, see :func:`convert_height_field_to_mesh`.
+    """
+    sha = hashlib.sha1()
+    sha.update(f"{height_field.shape}_{height_field.dtype}".encode())
+    sha.update(np.ascontiguousarray(height_field).tobytes())
+    sha.update(repr((horizontal_scale, vertical_scale, slope_threshold)).encode())
+    filename = os.path.join(cache_dir, f"{sha.hexdigest()}.npz")
+
+    if os.path.isfile(filename):
+        with np.load(filename) as data:
+            return data["vertices"], data["triangles"]
 
+    vertices, triangles = convert_height_field_to_mesh(height_field, horizontal_scale, vertical_scale, slope_threshold)
+    # write to a temporary file first, such that a concurrent read never sees a partial file
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_filename = f"{filename}.tmp{os.getpid()}"
+    with open(tmp_filename, "wb") as f:
+        np.savez(f, vertices=vertices, triangles=triangles)
+    os.replace(tmp_filename, filename)
     return vertices, triangles
+
+
+def simplify_height_field_mesh(vertices: np.ndarray, grid_shape: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Merge coplanar cells of a height field mesh into larger quads without changing the surface.
+
+    The mesh of :func:`convert_height_field_to_mesh` has two triangles per grid cell. This function merges
+
+    - flat cells (four corners at the same height) into maximal rectangles, first along y and then along x,
+    - vertical wall cells created by the slope correction (all corners in the same x- or y-plane) into strips along
+      the wall.
+
+    Only cells that are rectangles in their plane are merged, i.e. the corners of a cell share their x-coordinate along
+    the rows and their y-coordinate along the columns of the grid. The union of neighbouring rectangles with the same
+    extent is again a rectangle, such that every merged quad covers exactly its cells. This also merges cells whose
+    vertices were moved by the slope correction. All other cells keep their two triangles. The merged quads introduce
+    T-junctions at their borders, which do not change the surface and are irrelevant for raycasting.
+
+    Args:
+        vertices: The vertices of the height field mesh of shape (num_rows * num_cols, 3), ordered row by row.
+        grid_shape: The number of vertices (num_rows, num_cols) of the grid.
+
+    Returns:
+        The vertices and triangles of the simplified mesh, see :func:`convert_height_field_to_mesh`. Unused vertices
+        are removed.
+    """
+    num_rows, num_cols = grid_shape
+    grid = vertices.reshape(num_rows, num_cols, 3)
+    # corners (i, j), (i, j + 1), (i + 1, j) and (i + 1, j + 1) of every cell
+    x0, x1, x2, x3 = grid[:-1, :-1, 0], grid[:-1, 1:, 0], grid[1:, :-1, 0], grid[1:, 1:, 0]
+    y0, y1, y2, y3 = grid[:-1, :-1, 1], grid[:-1, 1:, 1], grid[1:, :-1, 1], grid[1:, 1:, 1]
+    z0, z1, z2, z3 = grid[:-1, :-1, 2], grid[:-1, 1:, 2], grid[1:, :-1, 2], grid[1:, 1:, 2]
+    rows_aligned = (x0 == x1) & (x2 == x3)
+    cols_aligned = (y0 == y2) & (y1 == y3)
+    # flat cells, merged along both axes
+    flat = rows_aligned & cols_aligned & (z0 == z1) & (z0 == z2) & (z0 == z3)
+    # walls in a y-plane are merged along x, walls in an x-plane along y
+    wall_y = rows_aligned & (y0 == y1) & cols_aligned & (z0 == z2) & (z1 == z3) & (z0 != z1)
+    wall_x = cols_aligned & (x0 == x2) & rows_aligned & (z0 == z1) & (z2 == z3) & (z0 != z2)
+
+    # rectangles of cells (row_start, row_stop, col_start, col_stop)
+    rectangles = []
+    # -- flat regions: runs along y, then runs with the same columns and height in consecutive rows
+    open_rectangles = {}
+    for row, col_start, col_stop in zip(*_cell_runs(flat, z0[..., None])):
+        key = (col_start, col_stop, z0[row, col_start])
+        if key in open_rectangles and open_rectangles[key][1] == row:
+            open_rectangles[key][1] = row + 1
+        else:
+            if key in open_rectangles:
+                rectangles.append((*open_rectangles[key], col_start, col_stop))
+            open_rectangles[key] = [row, row + 1]
+    rectangles += [(*rows, key[0], key[1]) for key, rows in open_rectangles.items()]
+    # -- walls in a y-plane: runs along x
+    col, row_start, row_stop = _cell_runs(wall_y.T, np.stack((y0, z0, z1), axis=-1).transpose(1, 0, 2))
+    rectangles += list(zip(row_start, row_stop, col, col + 1))
+    # -- walls in an x-plane: runs along y
+    row, col_start, col_stop = _cell_runs(wall_x, np.stack((x0, z0, z2), axis=-1))
+    rectangles += list(zip(row, row + 1, col_start, col_stop))
+
+    # two triangles per rectangle, with the same winding as the triangles of a cell
+    rectangles = np.array(rectangles, dtype=np.int64).reshape(-1, 4)
+    ind0 = rectangles[:, 0] * num_cols + rectangles[:, 2]
+    ind1 = rectangles[:, 0] * num_cols + rectangles[:, 3]
+    ind2 = rectangles[:, 1] * num_cols + rectangles[:, 2]
+    ind3 = rectangles[:, 1] * num_cols + rectangles[:, 3]
+    merged = np.stack((np.stack((ind0, ind3, ind1), axis=-1), np.stack((ind0, ind2, ind3), axis=-1)), axis=1)
+    # triangles of the remaining cells
+    rows, cols = np.nonzero(~(flat | wall_y | wall_x))
+    ind0 = rows * num_cols + cols
+    ind1 = ind0 + 1
+    ind2 = ind0 + num_cols
+    ind3 = ind2 + 1
+    kept = np.stack((np.stack((ind0, ind3, ind1), axis=-1), np.stack((ind0, ind2, ind3), axis=-1)), axis=1)
+    triangles = np.concatenate((merged.reshape(-1, 3), kept.reshape(-1, 3)))
+
+    # remove unused vertices
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return vertices[used], triangles.reshape(-1, 3).astype(np.uint32)
+
+
+def _cell_runs(mask: np.ndarray, key: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Runs of consecutive masked cells with the same key along the second axis.
+
+    Args:
+        mask: The mask of the cells of shape (num_rows, num_cols).
+        key: The key of the cells of shape (num_rows, num_cols, key_size).
+
+    Returns:
+        The row, the first column and the column after the last cell of every run, ordered by row and column.
+    """
+    continues = np.zeros_like(mask)
+    continues[:, 1:] = mask[:, 1:] & mask[:, :-1] & (key[:, 1:] == key[:, :-1]).all(axis=-1)
+    ends = np.zeros_like(mask)
+    ends[:, :-1] = continues[:, 1:]
+    rows, col_starts = np.nonzero(mask & ~continues)
+    _, col_ends = np.nonzero(mask & ~ends)
+    return rows, col_starts, col_ends + 1
@@ -0,0 +1,281 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Occupancy of the height field sub-terrains and of the whole terrain grid.
+
+Every height field sub-terrain attaches a :class:`TileOccupancy` record to the metadata of its mesh under
+:data:`OCCUPANCY_KEY` if its ``occupancy_height_threshold`` is set. The record holds a bit-packed occupancy bitmap at
+the height field resolution, the free-space distance of every pixel and the height of the sub-terrain origin.
+:class:`ParallelTerrainGenerator` stitches the records of all sub-terrains into a :class:`TerrainOccupancyMap` on the
+simulation device and attaches it to the metadata of the terrain mesh. The map is available through the terrain
+importer of a :class:`TerrainGeneratorImporterCfg` with a :class:`ParallelTerrainGeneratorCfg`, see
+:func:`get_terrain_occupancy_map`.
+
+Spawn, goal and proximity queries against the map are constant-time gathers instead of raycasts against the terrain
+mesh. The map is a building block: the spawn sampling and goal checks of :class:`TerrainAnalysis` still raycast.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import torch
+from scipy.ndimage import distance_transform_edt
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omni.isaac.lab.terrains import TerrainImporter
+
+OCCUPANCY_KEY = "occupancy"
+"""Key of the occupancy record in the metadata of the sub-terrain meshes and of the occupancy map in the metadata of
+the terrain mesh."""
+
+
+def _free_space_distances(occupied: np.ndarray, horizontal_scale: float) -> np.ndarray:
+    """Distance of every pixel to the closest occupied pixel in meters, inf without occupied pixels."""
+    if not occupied.any():
+        return np.full(occupied.shape, np.inf, dtype=np.float32)
+    return (distance_transform_edt(~occupied) * horizontal_scale).astype(np.float32)
+
+
+class TileOccupancy:
+    """Occupancy record of a height field sub-terrain.
+
+    A pixel is occupied if its height differs from the height of the sub-terrain origin by more than a threshold, i.e.
+    the free pixels are the ones on the level of the origin. The record covers the pixels of the height field
+    including its border. The mesh conversion pads the height field by one pixel, such that pixel (i, j) lies at
+    ((i + 1) * horizontal_scale, (j + 1) * horizontal_scale) in the frame of the sub-terrain function.
+    """
+
+    def __init__(self, occupied: np.ndarray, horizontal_scale: float, origin_height: float):
+        """Initialize the record.
+
+        Args:
+            occupied: The occupied pixels of the height field of shape (num_rows, num_cols).
+            horizontal_scale: The discretization of the height field along the x and y axis.
+            origin_height: The height of the sub-terrain origin in meters.
+        """
+        self.shape = occupied.shape
+        self.horizontal_scale = horizontal_scale
+        self.origin_height = float(origin_height)
+        # occupancy bits of the pixels in row-major order
+        self.bits = np.packbits(occupied, axis=None)
+        # distances are only exact within the sub-terrain, obstacles of the neighbouring sub-terrains are not known
+        self.distances = _free_space_distances(occupied, horizontal_scale)
+
+    @classmethod
+    def from_height_field(
+        cls,
+        heights: np.ndarray,
+        horizontal_scale: float,
+        vertical_scale: float,
+        origin_height: float,
+        height_threshold: float,
+    ) -> TileOccupancy:
+        """Create the record of a height field.
+
+        Args:
+            heights: The discretized heights of the sub-terrain including its border.
+            horizontal_scale: The discretization of the height field along the x and y axis.
+            vertical_scale: The discretization of the height field along the z axis.
+            origin_height: The height of the sub-terrain origin in meters.
+            height_threshold: The height difference to the origin above which a pixel is occupied in meters.
+
+        Returns:
+            The occupancy record.
+        """
+        occupied = np.abs(heights * vertical_scale - origin_height) > height_threshold
+        return cls(occupied, horizontal_scale, origin_height)
+
+    @property
+    def occupied(self) -> np.ndarray:
+        """The occupied pixels of shape (num_rows, num_cols)."""
+        return np.unpackbits(self.bits, count=self.shape[0] * self.shape[1]).reshape(self.shape).astype(bool)
+
+
+class TerrainOccupancyMap:
+    """Occupancy map of a grid of height field sub-terrains on the simulation device.
+
+    The records of the sub-terrains are stitched into one map with the resolution of the height fields. Neighbouring
+    sub-terrains share their border pixels, a shared pixel is occupied if it is occupied in either record. The
+    free-space distances are recomputed on the stitched map, such that they account for obstacles across the borders
+    of the sub-terrains. Pixels of sub-terrains without a record (e.g. mesh sub-terrains or sub-terrains loaded from
+    the cache) and points outside the grid are occupied.
+
+    All lookups are gathers at the pixel closest to the query points and do not synchronize with the device.
+    """
+
+    def __init__(self, tiles: dict[tuple[int, int], TileOccupancy], num_rows: int, num_cols: int, device: str = "cpu"):
+        """Stitch the records of the sub-terrains.
+
+        The grid is centered at the origin of the world frame as in :class:`TerrainGenerator`.
+
+        Args:
+            tiles: The occupancy records of the sub-terrains by their (row, column) index.
+            num_rows: The number of sub-terrain rows.
+            num_cols: The number of sub-terrain columns.
+            device: The device of the map. Defaults to "cpu".
+
+        Raises:
+            ValueError: If the records differ in their shape or resolution.
+        """
+        if not tiles:
+            raise ValueError("The occupancy map requires at least one sub-terrain record.")
+        reference = next(iter(tiles.values()))
+        for tile in tiles.values():
+            if tile.shape != reference.shape or tile.horizontal_scale != reference.horizontal_scale:
+                raise ValueError(
+                    "All sub-terrain records must have the same shape and horizontal scale, got"
+                    f" {tile.shape} ({tile.horizontal_scale}) and {reference.shape} ({reference.horizontal_scale})."
+                )
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.horizontal_scale = reference.horizontal_scale
+        self.device = device
+        # pixels per sub-terrain side, the last pixel is the first pixel of the next sub-terrain
+        self.tile_pixels = (reference.shape[0] - 1, reference.shape[1] - 1)
+        shape = (num_rows * self.tile_pixels[0] + 2, num_cols * self.tile_pixels[1] + 2)
+
+        # stitch the records, pixel (i, j) of sub-terrain (row, col) is pixel (row * P + i + 1, col * P + j + 1)
+        occupied = np.ones(shape, dtype=bool)
+        known = np.zeros(shape, dtype=bool)
+        origin_heights = np.zeros((num_rows, num_cols), dtype=np.float32)
+        for (row, col), tile in tiles.items():
+            x0 = row * self.tile_pixels[0] + 1
+            y0 = col * self.tile_pixels[1] + 1
+            region = (slice(x0, x0 + tile.shape[0]), slice(y0, y0 + tile.shape[1]))
+            occupied[region] = np.where(known[region], occupied[region] | tile.occupied, tile.occupied)
+            known[region] = True
+            origin_heights[row, col] = tile.origin_height
+
+        self.shape = shape
+        self.bits = torch.from_numpy(np.packbits(occupied, axis=None)).to(device)
+        self.distances = torch.from_numpy(_free_space_distances(occupied, self.horizontal_scale)).to(device)
+        self.origin_heights = torch.from_numpy(origin_heights).to(device)
+        # position of pixel (0, 0) in the world frame
+        size = (self.tile_pixels[0] * self.horizontal_scale, self.tile_pixels[1] * self.horizontal_scale)
+        self._origin_w = torch.tensor([-0.5 * num_rows * size[0], -0.5 * num_cols * size[1]], device=device)
+        self._dims = torch.tensor(shape, device=device)
+
+    """
+    Operations.
+    """
+
+    def is_occupied(self, points_w: torch.Tensor) -> torch.Tensor:
+        """Whether the pixels at the query points are occupied.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (..., 2) or (..., 3).
+
+        Returns:
+            The occupancy of the query points of shape (...). Points outside the grid are occupied.
+        """
+        index, inside = self._pixel_index(points_w)
+        bits = self.bits[index >> 3] >> (7 - (index & 7))
+        return (bits & 1).bool() | ~inside
+
+    def clearance(self, points_w: torch.Tensor) -> torch.Tensor:
+        """The distance of the query points to the closest occupied pixel.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (..., 2) or (..., 3).
+
+        Returns:
+            The distances in meters of shape (...). Points outside the grid have zero clearance.
+        """
+        index, inside = self._pixel_index(points_w)
+        return torch.where(inside, self.distances.view(-1)[index], 0.0)
+
+    def is_free(self, points_w: torch.Tensor, min_clearance: float = 0.0) -> torch.Tensor:
+        """Whether the query points are free and at least a clearance away from the closest occupied pixel.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (..., 2) or (..., 3).
+            min_clearance: The minimum distance to the closest occupied pixel in meters. Defaults to 0.0.
+
+        Returns:
+            Whether the query points are free of shape (...).
+        """
+        return ~self.is_occupied(points_w) & (self.clearance(points_w) >= min_clearance)
+
+    def spawn_height(self, points_w: torch.Tensor) -> torch.Tensor:
+        """The origin height of the sub-terrains at the query points.
+
+        Free pixels are within the occupancy threshold of this height. Points outside the grid take the height of the
+        closest sub-terrain.
+
+        Args:
+            points_w: The query points in the world frame. Shape is (..., 2) or (..., 3).
+
+        Returns:
+            The heights in meters of shape (...).
+        """
+        pixels = self._pixels(points_w)
+        rows = ((pixels[..., 0] - 1) // self.tile_pixels[0]).clamp(0, self.num_rows - 1)
+        cols = ((pixels[..., 1] - 1) // self.tile_pixels[1]).clamp(0, self.num_cols - 1)
+        return self.origin_heights[rows, cols]
+
+    def sample_free(
+        self, rows: torch.Tensor, cols: torch.Tensor, min_clearance: float = 0.0, num_tries: int = 16
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Sample free positions on the given sub-terrains.
+
+        Every position is the first free pixel out of a number of uniformly sampled pixels of its sub-terrain.
+
+        Args:
+            rows: The row indices of the sub-terrains of shape (N,).
+            cols: The column indices of the sub-terrains of shape (N,).
+            min_clearance: The minimum distance to the closest occupied pixel in meters. Defaults to 0.0.
+            num_tries: The number of sampled pixels per position. Defaults to 16.
+
+        Returns:
+            A tuple containing the positions in the world frame at the origin height of their sub-terrain (N, 3) and
+            whether a free pixel was found (N,). Positions without a free pixel are the last sampled pixel.
+        """
+        num_samples = rows.shape[0]
+        # pixels of the sub-terrains including their border pixels
+        rows_pixels = torch.randint(0, self.tile_pixels[0] + 1, (num_samples, num_tries), device=self.device)
+        cols_pixels = torch.randint(0, self.tile_pixels[1] + 1, (num_samples, num_tries), device=self.device)
+        rows_pixels += rows.long().unsqueeze(1) * self.tile_pixels[0] + 1
+        cols_pixels += cols.long().unsqueeze(1) * self.tile_pixels[1] + 1
+        pixels = torch.stack((rows_pixels, cols_pixels), dim=-1)
+        points_w = self._origin_w + pixels * self.horizontal_scale
+        free = self.is_free(points_w, min_clearance)
+        # first free try, the last try if none is free
+        first = torch.where(free.any(dim=1), free.int().argmax(dim=1), num_tries - 1)
+        positions_w = torch.zeros(num_samples, 3, device=self.device)
+        positions_w[:, :2] = points_w[torch.arange(num_samples, device=self.device), first]
+        positions_w[:, 2] = self.origin_heights[rows, cols]
+        return positions_w, free.any(dim=1)
+
+    """
+    Internal helpers.
+    """
+
+    def _pixels(self, points_w: torch.Tensor) -> torch.Tensor:
+        """Pixel indices closest to the query points, not clamped to the map (..., 2)."""
+        return torch.round((points_w[..., :2] - self._origin_w) / self.horizontal_scale).long()
+
+    def _pixel_index(self, points_w: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """Flat pixel indices of the query points clamped to the map and whether the points are inside the map."""
+        pixels = self._pixels(points_w)
+        inside = ((pixels >= 0) & (pixels < self._dims)).all(dim=-1)
+        pixels = torch.minimum(pixels.clamp(min=0), self._dims - 1)
+        return pixels[..., 0] * self.shape[1] + pixels[..., 1], inside
+
+
+def get_terrain_occupancy_map(terrain: TerrainImporter, key: str = "terrain") -> TerrainOccupancyMap | None:
+    """The occupancy map of an imported terrain.
+
+    Args:
+        terrain: The terrain importer of the scene.
+        key: The key of the terrain mesh in the importer. Defaults to "terrain".
+
+    Returns:
+        The occupancy map of the terrain or None if the terrain was not generated with an occupancy map, e.g. by the
+        serial :class:`TerrainGenerator` or without an ``occupancy_height_threshold`` on the height field
+        sub-terrains.
+    """
+    mesh = terrain.meshes.get(key)
+    return None if mesh is None else mesh.metadata.get(OCCUPANCY_KEY)
@@ -0,0 +1,192 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Terrain generator that generates the sub-terrains in parallel processes."""
+
+from __future__ import annotations
+
+import multiprocessing
+import numpy as np
+import trimesh
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+from omni.isaac.lab.terrains import SubTerrainBaseCfg, TerrainGenerator
+
+from .occupancy_map import OCCUPANCY_KEY, TerrainOccupancyMap, TileOccupancy
+
+if TYPE_CHECKING:
+    from .terrain_generator_cfg import ParallelTerrainGeneratorCfg
+
+
+def tile_seed(seed: int, row: int, col: int, difficulty: float) -> int:
+    """Seed of the random number generators of a sub-terrain.
+
+    Args:
+        seed: The seed of the terrain generator.
+        row: The row index of the sub-terrain.
+        col: The column index of the sub-terrain.
+        difficulty: The difficulty of the sub-terrain.
+
+    Returns:
+        A 32-bit seed that only depends on the inputs.
+    """
+    difficulty_bits = int(np.float64(difficulty).view(np.uint64))
+    return int(np.random.SeedSequence([seed, row, col, difficulty_bits]).generate_state(1)[0])
+
+
+_worker_generator: ParallelTerrainGenerator | None = None
+"""The terrain generator of the worker processes, set once per process by the pool initializer."""
+
+
+def _init_tile_worker(generator: ParallelTerrainGenerator):
+    """Share the generator with a worker process once instead of sending it with every tile."""
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _worker_generate_tile(tile: tuple[int, int, float, SubTerrainBaseCfg]) -> tuple[trimesh.Trimesh, np.ndarray]:
+    """:meth:`ParallelTerrainGenerator._generate_tile` with the generator of the worker process."""
+    return _worker_generator._generate_tile(*tile)
+
+
+class ParallelTerrainGenerator(TerrainGenerator):
+    """Terrain generator that builds the sub-terrains in a process pool.
+
+    The difficulties and the sub-terrain types are sampled as in :class:`TerrainGenerator`. Each sub-terrain is then
+    generated with the global NumPy random state seeded by :func:`tile_seed` of its row, column and difficulty, such
+    that the generated terrain is bit-identical for any number of workers. The meshes are gathered and added in the
+    order of the serial generator.
+
+    The occupancy records of the height field sub-terrains are stitched into :attr:`occupancy_map`, which is also
+    attached to the metadata of the terrain mesh under :data:`OCCUPANCY_KEY`.
+
+    .. note::
+        The worker processes are forked, as spawned workers would re-execute the launching script including the
+        simulation app. Sub-terrain functions must therefore not touch the simulation or the GPU.
+    """
+
+    cfg: ParallelTerrainGeneratorCfg
+
+    tile_occupancy: dict[tuple[int, int], TileOccupancy]
+    """The occupancy records of the height field sub-terrains by their (row, column) index."""
+
+    occupancy_map: TerrainOccupancyMap | None
+    """The occupancy map of the terrain grid. None if no sub-terrain has an occupancy record."""
+
+    def __init__(self, cfg: ParallelTerrainGeneratorCfg, device: str = "cpu"):
+        """Generate the terrain and stitch the occupancy records of the sub-terrains.
+
+        Args:
+            cfg: Configuration for the terrain generator.
+            device: The device to use for the flat patches tensor and the occupancy map.
+        """
+        self.tile_occupancy = dict()
+        super().__init__(cfg, device)
+        # stitch the occupancy of the sub-terrains
+        self.occupancy_map = None
+        if self.tile_occupancy:
+            self.occupancy_map = TerrainOccupancyMap(self.tile_occupancy, cfg.num_rows, cfg.num_cols, device=device)
+            self.terrain_mesh.metadata[OCCUPANCY_KEY] = self.occupancy_map
+
+    """
+    Terrain generator functions.
+    """
+
+    def _generate_random_terrains(self):
+        """Add terrains based on randomly sampled difficulty parameter."""
+        # normalize the proportions of the sub-terrains
+        proportions = np.array([sub_cfg.proportion for sub_cfg in self.cfg.sub_terrains.values()])
+        proportions /= np.sum(proportions)
+        # create a list of all terrain configs
+        sub_terrains_cfgs = list(self.cfg.sub_terrains.values())
+
+        # randomly sample sub-terrains
+        tiles = []
+        for index in range(self.cfg.num_rows * self.cfg.num_cols):
+            # coordinate index of the sub-terrain
+            (sub_row, sub_col) = np.unravel_index(index, (self.cfg.num_rows, self.cfg.num_cols))
+            # randomly sample terrain index
+            sub_index = self.np_rng.choice(len(proportions), p=proportions)
+            # randomly sample difficulty parameter
+            difficulty = self.np_rng.uniform(*self.cfg.difficulty_range)
+            tiles.append((int(sub_row), int(sub_col), difficulty, sub_terrains_cfgs[sub_index]))
+        self._generate_tiles(tiles)
+
+    def _generate_curriculum_terrains(self):
+        """Add terrains based on the difficulty parameter."""
+        # normalize the proportions of the sub-terrains
+        proportions = np.array([sub_cfg.proportion for sub_cfg in self.cfg.sub_terrains.values()])
+        proportions /= np.sum(proportions)
+
+        # find the sub-terrain index for each column
+        # we generate the terrains based on their proportion (not randomly sampled)
+        sub_indices = []
+        for index in range(self.cfg.num_cols):
+            sub_index = np.min(np.where(index / self.cfg.num_cols + 0.001 < np.cumsum(proportions))[0])
+            sub_indices.append(sub_index)
+        sub_indices = np.array(sub_indices, dtype=np.int32)
+        # create a list of all terrain configs
+        sub_terrains_cfgs = list(self.cfg.sub_terrains.values())
+
+        # curriculum-based sub-terrains
+        tiles = []
+        for sub_col in range(self.cfg.num_cols):
+            for sub_row in range(self.cfg.num_rows):
+                # vary the difficulty parameter linearly over the number of rows, with a small random offset
+                lower, upper = self.cfg.difficulty_range
+                difficulty = (sub_row + self.np_rng.uniform()) / self.cfg.num_rows
+                difficulty = lower + (upper - lower) * difficulty
+                tiles.append((sub_row, sub_col, difficulty, sub_terrains_cfgs[sub_indices[sub_col]]))
+        self._generate_tiles(tiles)
+
+    """
+    Internal helper functions.
+    """
+
+    def _generate_tiles(self, tiles: list[tuple[int, int, float, SubTerrainBaseCfg]]):
+        """Generate the sub-terrains (row, col, difficulty, cfg) and add them in the given order."""
+        # seed of the sub-terrains, drawn from the generator if not set such that it follows the global seed
+        if self.cfg.seed is not None:
+            self._tile_seed = self.cfg.seed
+        else:
+            self._tile_seed = int(self.np_rng.integers(np.iinfo(np.int32).max))
+
+        num_workers = min(self.cfg.num_workers, len(tiles))
+        if num_workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_tile_worker,
+                initargs=(self,),
+            ) as executor:
+                results = list(executor.map(_worker_generate_tile, tiles))
+        else:
+            results = [self._generate_tile(*tile) for tile in tiles]
+
+        # add to sub-terrains
+        for (sub_row, sub_col, _, sub_cfg), (mesh, origin) in zip(tiles, results):
+            self._add_sub_terrain(mesh, origin, sub_row, sub_col, sub_cfg)
+
+    def _add_sub_terrain(
+        self, mesh: trimesh.Trimesh, origin: np.ndarray, row: int, col: int, sub_terrain_cfg: SubTerrainBaseCfg
+    ):
+        """Add the sub-terrain and keep its occupancy record."""
+        if OCCUPANCY_KEY in mesh.metadata:
+            self.tile_occupancy[(row, col)] = mesh.metadata[OCCUPANCY_KEY]
+        super()._add_sub_terrain(mesh, origin, row, col, sub_terrain_cfg)
+
+    def _generate_tile(
+        self, row: int, col: int, difficulty: float, cfg: SubTerrainBaseCfg
+    ) -> tuple[trimesh.Trimesh, np.ndarray]:
+        """Generate a sub-terrain with the global random state seeded for its tile.
+
+        The global random state of the calling process is restored afterwards."""
+        state = np.random.get_state()
+        np.random.seed(tile_seed(self._tile_seed, row, col, difficulty))
+        try:
+            return self._get_terrain_mesh(difficulty, cfg)
+        finally:
+            np.random.set_state(state)
@@ -0,0 +1,30 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from omni.isaac.lab.terrains import TerrainGeneratorCfg
+from omni.isaac.lab.utils import configclass
+
+from .terrain_generator import ParallelTerrainGenerator
+
+
+@configclass
+class ParallelTerrainGeneratorCfg(TerrainGeneratorCfg):
+    """Configuration for the terrain generator that generates the sub-terrains in parallel processes.
+
+    Only used by the terrain importer of a :class:`TerrainGeneratorImporterCfg`.
+    """
+
+    class_type: type = ParallelTerrainGenerator
+    """The class of the terrain generator.
+
+    The stock :class:`TerrainImporter` of Isaac Lab 1.2 does not read this field and always creates the serial
+    generator. Use a :class:`TerrainGeneratorImporterCfg` for the scene terrain to create this generator.
+    """
+
+    num_workers: int = 1
+    """Number of processes generating the sub-terrains. Defaults to 1, in which case they are generated serially.
+
+    The generated terrain is the same for any number of workers.
+    """
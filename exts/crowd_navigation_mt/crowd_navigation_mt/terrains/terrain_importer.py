@@ -0,0 +1,61 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Terrain importer that creates the terrain generator from its config class."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import omni.isaac.lab.sim as sim_utils
+from omni.isaac.lab.terrains import TerrainGenerator, TerrainImporter
+
+if TYPE_CHECKING:
+    from .terrain_importer_cfg import TerrainGeneratorImporterCfg
+
+
+class TerrainGeneratorImporter(TerrainImporter):
+    """Terrain importer that creates the terrain generator of ``cfg.terrain_generator.class_type``.
+
+    The :class:`TerrainImporter` of Isaac Lab 1.2 always creates a :class:`TerrainGenerator` and ignores the class of
+    the generator config, so a :class:`ParallelTerrainGeneratorCfg` would silently run the serial generator. This
+    importer creates the generator from the ``class_type`` of the config, falling back to :class:`TerrainGenerator`
+    for configs without one. Other terrain types are imported as by :class:`TerrainImporter`.
+    """
+
+    cfg: TerrainGeneratorImporterCfg
+
+    def __init__(self, cfg: TerrainGeneratorImporterCfg):
+        """Initialize the terrain importer.
+
+        Args:
+            cfg: The configuration for the terrain importer.
+
+        Raises:
+            ValueError: If terrain type is 'generator' and no configuration provided for ``terrain_generator``.
+        """
+        if cfg.terrain_type != "generator":
+            super().__init__(cfg)
+            return
+
+        # same as the generator branch of TerrainImporter.__init__, with the generator class of the config
+        cfg.validate()
+        self.cfg = cfg
+        self.device = sim_utils.SimulationContext.instance().device  # type: ignore
+        self.meshes = dict()
+        self.warp_meshes = dict()
+        self.env_origins = None
+        self.terrain_origins = None
+        self._terrain_flat_patches = dict()
+
+        if self.cfg.terrain_generator is None:
+            raise ValueError("Input terrain type is 'generator' but no value provided for 'terrain_generator'.")
+        generator_class = getattr(self.cfg.terrain_generator, "class_type", TerrainGenerator)
+        terrain_generator = generator_class(cfg=self.cfg.terrain_generator, device=self.device)
+        self.import_mesh("terrain", terrain_generator.terrain_mesh)
+        self.configure_env_origins(terrain_generator.terrain_origins)
+        self._terrain_flat_patches = terrain_generator.flat_patches
+
+        self.set_debug_vis(self.cfg.debug_vis)
@@ -0,0 +1,17 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from omni.isaac.lab.terrains import TerrainImporterCfg
+from omni.isaac.lab.utils import configclass
+
+from .terrain_importer import TerrainGeneratorImporter
+
+
+@configclass
+class TerrainGeneratorImporterCfg(TerrainImporterCfg):
+    """Configuration for the terrain importer that creates the generator from ``terrain_generator.class_type``."""
+
+    class_type: type = TerrainGeneratorImporter
+    """The class of the terrain importer."""
@@ -0,0 +1,172 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Launch Isaac Sim Simulator first."""
+
+from omni.isaac.lab.app import AppLauncher, run_tests
+
+# launch omniverse app
+simulation_app = AppLauncher(headless=True).app
+
+"""Rest everything follows."""
+
+import math
+import torch
+import unittest
+
+from crowd_navigation_mt.mdp.wild_anymal_obs.ik_chimera import get_ik, solve_ik, solve_ik_kernel
+
+# float64 constants of the previous IK
+HAA_CENTERS = torch.tensor(
+    [[0.36, 0.104, 0.0], [-0.36, 0.104, 0.0], [0.36, -0.104, 0.0], [-0.36, -0.104, 0.0]], dtype=torch.float64
+)
+HAA_TO_FOOT_Y_OFFSET = torch.tensor([1.0, 1.0, -1.0, -1.0], dtype=torch.float64) * (0.1003 - 0.01305 + 0.08381)
+A1_SQUARED = 0.285**2
+A2_SQUARED = 0.08795**2 + (0.33797 - 0.0225) ** 2
+MIN_REACH_SP = abs(math.sqrt(A1_SQUARED) - math.sqrt(A2_SQUARED)) + 0.1
+MAX_REACH_SP = math.sqrt(A1_SQUARED) + math.sqrt(A2_SQUARED) - 0.05
+MIN_REACH = math.sqrt(HAA_TO_FOOT_Y_OFFSET[0].item() ** 2 + MIN_REACH_SP**2)
+MAX_REACH = math.sqrt(HAA_TO_FOOT_Y_OFFSET[0].item() ** 2 + MAX_REACH_SP**2)
+KFE_OFFSET = abs(math.atan(0.08795 / (-0.33797 + 0.0225)))
+
+DEFAULT_FOOT_POSITIONS = torch.tensor([[0.4, 0.2, -0.55], [-0.4, 0.2, -0.55], [0.4, -0.2, -0.55], [-0.4, -0.2, -0.55]])
+"""The default foot positions in the base frame in the limb order LF, LH, RF, RH."""
+
+
+def previous_solve_ik(pos_base_to_foot_in_base_frame, limb):
+    """Frozen copy of the previous :func:`solve_ik`, which computes in float64 and returns NaN on failure."""
+    leg_joints = torch.zeros([pos_base_to_foot_in_base_frame.shape[0], 3])
+    pos_haa_to_foot_in_base_frame = pos_base_to_foot_in_base_frame - HAA_CENTERS.index_select(0, limb)
+    d = HAA_TO_FOOT_Y_OFFSET.index_select(0, limb)
+    d_squared = d * d
+    reach = torch.norm(pos_haa_to_foot_in_base_frame, dim=1)
+    clipped_reach = torch.clip(reach, MIN_REACH, MAX_REACH)
+    pos_haa_to_foot_in_base_frame = torch.einsum("bi,b->bi", pos_haa_to_foot_in_base_frame, clipped_reach / reach)
+    pos_yz_squared = torch.norm(pos_haa_to_foot_in_base_frame[:, -2:], dim=1) ** 2
+    modified_pos_haa_to_foot_in_base_frame = pos_haa_to_foot_in_base_frame.clone()
+    modified_pos_haa_to_foot_in_base_frame[:, -2:] = torch.einsum(
+        "bi,b->bi", pos_haa_to_foot_in_base_frame[:, -2:], (torch.abs(d) + 0.01) / torch.sqrt(pos_yz_squared)
+    )
+    modified_pos_haa_to_foot_in_base_frame[:, 0] = torch.min(
+        pos_haa_to_foot_in_base_frame[:, 0], torch.tensor(MAX_REACH_SP, dtype=torch.float64)
+    )
+    modified_pos_yz_squared = torch.norm(modified_pos_haa_to_foot_in_base_frame[:, -2:], dim=1) ** 2
+    pos_haa_to_foot_in_base_frame = torch.where(
+        pos_yz_squared < d_squared,
+        modified_pos_haa_to_foot_in_base_frame.transpose(0, 1),
+        pos_haa_to_foot_in_base_frame.transpose(0, 1),
+    ).transpose(0, 1)
+    pos_yz_squared = torch.where(pos_yz_squared < d_squared, modified_pos_yz_squared, pos_yz_squared)
+    r_squared = pos_yz_squared - d_squared
+    r = torch.sqrt(r_squared)
+    delta = torch.atan2(pos_haa_to_foot_in_base_frame[:, 1], -pos_haa_to_foot_in_base_frame[:, 2])
+    beta = torch.atan2(r, d)
+    leg_joints[:, 0] = beta + delta - math.pi / 2
+    l_squared = r_squared + pos_haa_to_foot_in_base_frame[:, 0] ** 2
+    leg_length = torch.sqrt(l_squared)
+    phi1 = torch.acos((A1_SQUARED + l_squared - A2_SQUARED) * 0.5 / (math.sqrt(A1_SQUARED) * leg_length))
+    phi2 = torch.acos((A2_SQUARED + l_squared - A1_SQUARED) * 0.5 / (math.sqrt(A2_SQUARED) * leg_length))
+    q_kfe = phi1 + phi2 - KFE_OFFSET
+    leg_joints[:, 2] = torch.where(limb % 2 == 0, -q_kfe, q_kfe)
+    theta_prime = torch.atan2(pos_haa_to_foot_in_base_frame[:, 0], r)
+    leg_joints[:, 1] = torch.where(limb % 2 != 0, -phi1 - theta_prime, phi1 - theta_prime)
+    return leg_joints
+
+
+def kernel_args(ik) -> tuple:
+    """The constant arguments of :func:`solve_ik_kernel` of an IK solver."""
+    return (
+        ik.pos_base_to_haa_center_in_base_frame,
+        ik.haa_to_foot_y_offset,
+        ik.a1_squared,
+        ik.a2_squared,
+        ik.min_reach,
+        ik.max_reach,
+        ik.max_reach_sp,
+        ik.kfe_offset,
+    )
+
+
+class TestIKChimera(unittest.TestCase):
+    """Test the float32 leg inverse kinematics kernel against the previous float64 implementation."""
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.limb = torch.arange(4).repeat(256)
+
+    def test_constants(self):
+        """The float32 constants of the solver round the previous float64 constants."""
+        ik = get_ik("cpu")
+        torch.testing.assert_close(ik.pos_base_to_haa_center_in_base_frame, HAA_CENTERS.float())
+        torch.testing.assert_close(ik.haa_to_foot_y_offset, HAA_TO_FOOT_Y_OFFSET.float())
+        for value, expected in (
+            (ik.a1_squared, A1_SQUARED),
+            (ik.a2_squared, A2_SQUARED),
+            (ik.min_reach, MIN_REACH),
+            (ik.max_reach, MAX_REACH),
+            (ik.max_reach_sp, MAX_REACH_SP),
+            (ik.kfe_offset, KFE_OFFSET),
+        ):
+            self.assertAlmostEqual(value, expected, places=12)
+
+    def test_in_domain(self):
+        """Feet around their default positions match the previous implementation."""
+        pos = DEFAULT_FOOT_POSITIONS.repeat(256, 1) + 0.05 * torch.randn(1024, 3)
+        expected = previous_solve_ik(pos, self.limb)
+        self.assertFalse(torch.isnan(expected).any())
+        leg_joints = solve_ik(pos, self.limb)
+        self.assertEqual(leg_joints.dtype, torch.float32)
+        torch.testing.assert_close(leg_joints, expected, atol=1e-5, rtol=0.0)
+
+    def test_unreachable(self):
+        """Feet out of reach or too close to the HAA are clamped to the previous solution."""
+        offsets = torch.tensor([[0.0, 0.0, -2.0], [0.0, 0.0, -0.05], [1.0, 0.0, -0.1], [0.05, 0.05, -0.15]])
+        for offset in offsets:
+            with self.subTest(offset=offset.tolist()):
+                pos = HAA_CENTERS.float() + offset
+                expected = previous_solve_ik(pos, torch.arange(4))
+                self.assertFalse(torch.isnan(expected).any())
+                torch.testing.assert_close(solve_ik(pos, torch.arange(4)), expected, atol=1e-5, rtol=0.0)
+
+    def test_haa_axis(self):
+        """Feet on the HAA axis have no lateral direction and fall back to the zero joint positions."""
+        for offset in (0.4, 0.1, -0.3):
+            with self.subTest(offset=offset):
+                pos = HAA_CENTERS.float() + torch.tensor([offset, 0.0, 0.0])
+                torch.testing.assert_close(solve_ik(pos, torch.arange(4)), torch.zeros(4, 3))
+
+    def test_non_finite(self):
+        """Non-finite targets fall back to the zero joint positions without affecting the other feet."""
+        pos = DEFAULT_FOOT_POSITIONS.repeat(3, 1)
+        pos[0, 0] = float("nan")
+        pos[5, 2] = float("inf")
+        pos[10, 1] = -float("inf")
+        leg_joints = solve_ik(pos, torch.arange(4).repeat(3))
+        self.assertTrue(torch.isfinite(leg_joints).all())
+        invalid = [0, 5, 10]
+        valid = [i for i in range(12) if i not in invalid]
+        torch.testing.assert_close(leg_joints[invalid], torch.zeros(3, 3))
+        torch.testing.assert_close(
+            leg_joints[valid], previous_solve_ik(pos[valid], torch.arange(4).repeat(3)[valid]), atol=1e-5, rtol=0.0
+        )
+
+    def test_script(self):
+        """The scripted kernel matches the eager kernel, including the clamp and the fallback."""
+        scripted_kernel = torch.jit.script(solve_ik_kernel)
+        pos = torch.cat(
+            (
+                DEFAULT_FOOT_POSITIONS.repeat(256, 1) + 0.05 * torch.randn(1024, 3),
+                HAA_CENTERS.float() + torch.tensor([0.0, 0.0, -2.0]),
+                HAA_CENTERS.float() + torch.tensor([0.4, 0.0, 0.0]),
+                torch.full((4, 3), float("nan")),
+            )
+        )
+        limb = torch.arange(4).repeat(259)
+        args = kernel_args(get_ik("cpu"))
+        torch.testing.assert_close(scripted_kernel(pos, limb, *args), solve_ik_kernel(pos, limb, *args))
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,52 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Launch Isaac Sim Simulator first."""
+
+from omni.isaac.lab.app import AppLauncher, run_tests
+
+# launch omniverse app
+simulation_app = AppLauncher(headless=True).app
+
+"""Rest everything follows."""
+
+import torch
+import unittest
+
+from crowd_navigation_mt.mdp.wild_anymal_obs import ProprioceptiveObservation
+
+
+class TestProprioceptiveObservation(unittest.TestCase):
+    """Test the reset of the proprioceptive observation."""
+
+    def setUp(self):
+        self.obs = ProprioceptiveObservation(
+            num_envs=8, device="cpu", simulation_dt=0.005, control_dt=0.02, compile_joint_target=False
+        )
+        mask = torch.zeros(8, dtype=torch.bool)
+        mask[[1, 5]] = True
+        self.indices = (torch.tensor([0, 3]), [2, 4, 6], mask, slice(2, 5), slice(None), 7, torch.arange(8))
+
+    def test_reset_indices(self):
+        """The noise of the histories and the random phases are sampled for any index of the environments."""
+        for env_idx in self.indices:
+            with self.subTest(env_idx=env_idx):
+                expected = torch.zeros(8, dtype=torch.bool)
+                expected[env_idx] = True
+
+                self.obs.joint_pos_history.zero_()
+                self.obs.joint_vel_history.zero_()
+                self.obs.reset(env_idx)
+                self.assertTrue(torch.equal((self.obs.joint_pos_history != 0).flatten(1).any(1), expected))
+                self.assertTrue(torch.equal((self.obs.joint_vel_history != 0).flatten(1).any(1), expected))
+
+                self.obs.cpg.phases.fill_(2.0)
+                self.obs.cpg.reset_random(env_idx)
+                self.assertTrue(torch.equal((self.obs.cpg.phases != 2.0).any(1), expected))
+                self.assertTrue(((self.obs.cpg.phases[expected] >= 0.0) & (self.obs.cpg.phases[expected] < 1.0)).all())
+
+
+if __name__ == "__main__":
+    run_tests()
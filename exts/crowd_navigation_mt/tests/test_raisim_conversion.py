@@ -0,0 +1,156 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Launch Isaac Sim Simulator first."""
+
+from omni.isaac.lab.app import AppLauncher, run_tests
+
+# launch omniverse app
+simulation_app = AppLauncher(headless=True).app
+
+"""Rest everything follows."""
+
+import torch
+import unittest
+
+from crowd_navigation_mt.mdp.wild_anymal_obs.raisim_conversion import (
+    IndexConverter,
+    convert,
+    foot_converter,
+    isaac_gym_raisim_indices_joint,
+    isaac_raisim_batched_conversion,
+    isaac_raisim_foot_conversion,
+    isaac_raisim_indices_foot,
+    isaac_to_raisim_joint_conversion,
+    joint_converter,
+    raisim_to_isaac_joint_conversion,
+)
+
+
+def previous_convert(x, joint_indices, start_indices=[0]):
+    """The previous index construction of :func:`convert`, rebuilt on every call."""
+    indices = torch.arange(x.shape[1]).to(x.device)
+    n_joint = joint_indices.shape[0]
+    for idx in start_indices:
+        indices[idx : idx + n_joint] = joint_indices.to(x.device) + idx
+    return torch.index_select(x, 1, indices)
+
+
+def previous_batched_conversion(x, start_indices=[0], batch_size=1):
+    """The previous index construction of :func:`isaac_raisim_batched_conversion`."""
+    n = batch_size
+    batch = torch.cat(
+        (torch.arange(0, n), torch.arange(n * 2, n * 3), torch.arange(n, n * 2), torch.arange(n * 3, n * 4))
+    )
+    return previous_convert(x, batch, start_indices)
+
+
+class TestRaisimConversion(unittest.TestCase):
+    """Test the conversions between the isaac and the raisim order."""
+
+    def setUp(self):
+        self.devices = ["cpu"] + (["cuda:0"] if torch.cuda.is_available() else [])
+
+    def test_joint_round_trip(self):
+        """The joint conversion and its inverse restore the input at one and several start indices."""
+        for device in self.devices:
+            for dim, start_indices in ((12, [0]), (19, [7]), (37, [7, 25]), (48, [0, 12, 24, 36])):
+                with self.subTest(device=device, start_indices=start_indices):
+                    x = torch.randn(5, dim, device=device)
+                    raisim = isaac_to_raisim_joint_conversion(x, start_indices)
+                    torch.testing.assert_close(raisim_to_isaac_joint_conversion(raisim, start_indices), x)
+                    isaac = raisim_to_isaac_joint_conversion(x, start_indices)
+                    torch.testing.assert_close(isaac_to_raisim_joint_conversion(isaac, start_indices), x)
+
+    def test_foot_round_trip(self):
+        """The foot conversion and its inverse restore the input at one and several start indices."""
+        for device in self.devices:
+            for dim, start_indices in ((4, [0]), (24, [4, 8, 15]), (16, [0, 4, 8, 12])):
+                with self.subTest(device=device, start_indices=start_indices):
+                    x = torch.randn(3, dim, device=device)
+                    raisim = isaac_raisim_foot_conversion(x, start_indices)
+                    torch.testing.assert_close(foot_converter(raisim, start_indices, inverse=True), x)
+                    torch.testing.assert_close(foot_converter(x, start_indices, inverse=True), raisim)
+
+    def test_batched_round_trip(self):
+        """The batched conversion is its own inverse at one and several start indices."""
+        for device in self.devices:
+            for batch_size, dim, start_indices in ((5, 20, [0]), (3, 30, [2]), (2, 20, [0, 10])):
+                with self.subTest(device=device, batch_size=batch_size, start_indices=start_indices):
+                    x = torch.randn(4, dim, device=device)
+                    raisim = isaac_raisim_batched_conversion(x, start_indices, batch_size=batch_size)
+                    torch.testing.assert_close(
+                        isaac_raisim_batched_conversion(raisim, start_indices, batch_size=batch_size), x
+                    )
+
+    def test_previous_indices(self):
+        """The cached index tables select the same entries as the previous index construction."""
+        for device in self.devices:
+            with self.subTest(device=device):
+                x = torch.arange(2 * 48, device=device).reshape(2, 48)
+                for start_indices in ([0], [7], [7, 25], [0, 12, 24, 36], [0, 6]):
+                    expected = previous_convert(x, isaac_gym_raisim_indices_joint, start_indices)
+                    torch.testing.assert_close(isaac_to_raisim_joint_conversion(x, start_indices), expected)
+                    torch.testing.assert_close(convert(x, isaac_gym_raisim_indices_joint, start_indices), expected)
+                for start_indices in ([0], [4, 8, 15], [0, 2]):
+                    torch.testing.assert_close(
+                        isaac_raisim_foot_conversion(x, start_indices),
+                        previous_convert(x, isaac_raisim_indices_foot, start_indices),
+                    )
+                for batch_size, start_indices in ((12, [0]), (5, [3]), (4, [0, 16])):
+                    torch.testing.assert_close(
+                        isaac_raisim_batched_conversion(x, start_indices, batch_size=batch_size),
+                        previous_batched_conversion(x, start_indices, batch_size=batch_size),
+                    )
+
+    def test_out(self):
+        """The conversion writes into the given buffer."""
+        for device in self.devices:
+            with self.subTest(device=device):
+                x = torch.randn(6, 37, device=device)
+                out = torch.empty_like(x)
+                result = joint_converter(x, [7, 25], out=out)
+                self.assertEqual(result.data_ptr(), out.data_ptr())
+                torch.testing.assert_close(out, isaac_to_raisim_joint_conversion(x, [7, 25]))
+                inverse_out = torch.empty_like(x)
+                joint_converter(out, [7, 25], inverse=True, out=inverse_out)
+                torch.testing.assert_close(inverse_out, x)
+
+    def test_tables_cached(self):
+        """No index tensors are created after the first call of a signature."""
+        converter = IndexConverter(isaac_raisim_indices_foot)
+        for device in self.devices:
+            with self.subTest(device=device):
+                x = torch.randn(3, 24, device=device)
+                converter(x, [4, 8, 15])
+                tables = converter.indices(24, [4, 8, 15], device)
+                num_tables = len(converter._tables)
+                for _ in range(3):
+                    converter(x, [4, 8, 15])
+                    converter(x, [4, 8, 15], inverse=True)
+                    self.assertIs(converter.indices(24, [4, 8, 15], device)[0], tables[0])
+                    self.assertIs(converter.indices(24, [4, 8, 15], device)[1], tables[1])
+                self.assertEqual(len(converter._tables), num_tables)
+                self.assertEqual(tables[0].device, x.device)
+                self.assertEqual(tables[1].device, x.device)
+
+    def test_overlapping_blocks(self):
+        """The inverse of overlapping blocks raises, the forward conversion matches the previous one."""
+        x = torch.randn(2, 24)
+        for converter, start_indices in ((joint_converter, [0, 6]), (foot_converter, [0, 2])):
+            with self.subTest(start_indices=start_indices):
+                self.assertIsNone(converter.indices(24, start_indices, "cpu")[1])
+                with self.assertRaises(ValueError):
+                    converter(x, start_indices, inverse=True)
+                torch.testing.assert_close(
+                    converter(x, start_indices), previous_convert(x, converter.block_indices, start_indices)
+                )
+        # the previous raisim to isaac conversion applied the forward tables and did not raise
+        with self.assertRaises(ValueError):
+            raisim_to_isaac_joint_conversion(x, [0, 6])
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,103 @@
+# Copyright (c) 2022-2024, The Isaac Lab Project Developers.
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Launch Isaac Sim Simulator first."""
+
+from omni.isaac.lab.app import AppLauncher, run_tests
+
+# launch omniverse app
+simulation_app = AppLauncher(headless=True).app
+
+"""Rest everything follows."""
+
+import os
+import tempfile
+import torch
+import trimesh
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import warp as wp
+
+from omni.isaac.lab.sensors import RayCaster
+
+from crowd_navigation_mt.mdp.commands.terrain_analysis_fdm import TerrainAnalysis, TerrainAnalysisCfg
+
+
+def make_env(usd_path: str, track_mesh_transforms: bool = False) -> SimpleNamespace:
+    """An environment with a flat ground and a wall, raycast by a single raycaster sensor on the CPU."""
+    ground = trimesh.creation.box(extents=(10.0, 10.0, 0.2))
+    ground.apply_translation((0.0, 0.0, -0.1))
+    wall = trimesh.creation.box(extents=(0.2, 6.0, 2.0))
+    wall.apply_translation((0.0, -2.0, 1.0))
+    mesh = trimesh.util.concatenate([ground, wall])
+    wp_mesh = wp.Mesh(
+        points=wp.array(mesh.vertices.astype("float32"), dtype=wp.vec3, device="cpu"),
+        indices=wp.array(mesh.faces.astype("int32").flatten(), dtype=wp.int32, device="cpu"),
+    )
+
+    raycaster = mock.MagicMock(spec=RayCaster)
+    raycaster.cfg = SimpleNamespace(mesh_prim_paths=["/World/ground"], track_mesh_transforms=track_mesh_transforms)
+    raycaster.meshes = {"/World/ground": wp_mesh}
+    raycaster._mesh_ids_wp = wp.array([[wp_mesh.id]], dtype=wp.uint64, device="cpu")
+    raycaster.data.mesh_positions_w = torch.zeros(1, 1, 3)
+    raycaster.data.mesh_orientations_w = torch.tensor([[[1.0, 0.0, 0.0, 0.0]]])
+
+    terrain = SimpleNamespace(cfg=SimpleNamespace(usd_path=usd_path), meshes={"terrain": mesh})
+    scene = SimpleNamespace(sensors={"lidar": raycaster}, terrain=terrain)
+    # the raycaster mesh is kept alive by the environment
+    return SimpleNamespace(scene=scene, device="cpu", _wp_mesh=wp_mesh)
+
+
+class TestTerrainAnalysisFDM(unittest.TestCase):
+    """Test the path sampling and the graph cache of the terrain analysis."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.usd_path = os.path.join(self.tmp_dir.name, "ground.usd")
+        self.cfg = TerrainAnalysisCfg(
+            raycaster_sensor="lidar", tree_nodes=400, grid_resolution=0.2, viz_graph=False, cache_graph=True
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def graph_cache_dirs(self) -> list[str]:
+        save_dir = os.path.splitext(self.usd_path)[0]
+        return [name for name in os.listdir(save_dir) if name.startswith("graph_")]
+
+    def test_cold_start(self):
+        """Sampling paths with an empty cache directory constructs and caches the graph."""
+        env = make_env(self.usd_path)
+        paths = TerrainAnalysis(self.cfg, env).sample_paths([20], [0.5], [5.0])
+        self.assertEqual(paths.shape, (20, 7))
+        self.assertTrue(((paths[:, 6] > 0.5) & (paths[:, 6] <= 5.0)).all())
+        self.assertEqual(len(self.graph_cache_dirs()), 1)
+
+    def test_cached_graph(self):
+        """A second analysis of the same scene loads the cached graph instead of sampling the points."""
+        env = make_env(self.usd_path)
+        analysis = TerrainAnalysis(self.cfg, env)
+        analysis.sample_paths([20], [0.5], [5.0], seed=1)
+
+        cached_analysis = TerrainAnalysis(self.cfg, env)
+        with mock.patch.object(TerrainAnalysis, "_sample_points", side_effect=AssertionError("graph not loaded")):
+            paths = cached_analysis.sample_paths([20], [0.5], [5.0], seed=2)
+        self.assertEqual(paths.shape, (20, 7))
+        torch.testing.assert_close(cached_analysis.points, analysis.points)
+        self.assertEqual((cached_analysis.graph != analysis.graph).nnz, 0)
+        self.assertEqual(len(self.graph_cache_dirs()), 1)
+
+    def test_tracked_meshes(self):
+        """The graph of a raycaster that tracks the mesh transforms is not cached."""
+        env = make_env(self.usd_path, track_mesh_transforms=True)
+        paths = TerrainAnalysis(self.cfg, env).sample_paths([20], [0.5], [5.0])
+        self.assertEqual(paths.shape, (20, 7))
+        self.assertEqual(self.graph_cache_dirs(), [])
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,110 @@
+"""
+Benchmark of the line-of-sight test of the height difference edge filter of the terrain analysis.
+
+Compares the previous per-edge loop over ``skimage.draw.line`` against :func:`lines_cross_grid` on a synthetic height
+map with random steps. The edges connect every node to its nearest neighbors, as in the terrain analysis graph.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the height difference edge filter.")
+parser.add_argument("--size", type=float, default=50.0, help="Side length of the height map in meters.")
+parser.add_argument("--grid_resolution", type=float, default=0.1, help="Resolution of the height map.")
+parser.add_argument("--num_nodes", type=int, nargs="+", default=[1000, 5000, 15000], help="Number of graph nodes.")
+parser.add_argument("--num_connections", type=int, default=5, help="Number of connections per node.")
+parser.add_argument("--num_steps", type=int, default=50, help="Number of random height steps in the map.")
+parser.add_argument("--device", type=str, default="cuda:0", help="Device of the height difference grid.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import numpy as np
+import time
+import torch
+from scipy.spatial import KDTree
+
+from prettytable import PrettyTable
+from skimage.draw import line
+
+from crowd_navigation_mt.mdp.commands.terrain_analysis_fdm import lines_cross_grid
+
+
+def make_height_diff(size: int, num_steps: int, rng: np.random.Generator) -> np.ndarray:
+    """Height difference mask of a flat map with random rectangular platforms of 0.5m."""
+    height_map = np.zeros((size, size))
+    for _ in range(num_steps):
+        x, y = rng.integers(0, size, 2)
+        width, length = rng.integers(size // 50, size // 10, 2)
+        height_map[x : x + width, y : y + length] += 0.5
+    height_diff = np.diff(height_map, axis=0, append=0.0) + np.diff(height_map, axis=1, append=0.0)
+    return np.abs(height_diff) > 0.3
+
+
+def skimage_loop(height_diff: np.ndarray, idx_start: np.ndarray, idx_end: np.ndarray) -> np.ndarray:
+    """The previous implementation of the line-of-sight test."""
+    filter_idx = np.zeros(idx_start.shape[0], dtype=bool)
+    for idx, (edge_start_idx, edge_end_idx) in enumerate(zip(idx_start, idx_end)):
+        grid_idx_x, grid_idx_y = line(edge_start_idx[0], edge_start_idx[1], edge_end_idx[0], edge_end_idx[1])
+        filter_idx[idx] = np.any(height_diff[grid_idx_x, grid_idx_y])
+    return filter_idx
+
+
+def timed(fn) -> tuple[float, np.ndarray]:
+    """Return the time in milliseconds of a call and its result on the host."""
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    result = fn()
+    if isinstance(result, torch.Tensor):
+        result = result.cpu().numpy()
+    return (time.perf_counter() - start) * 1e3, result
+
+
+def main():
+    """Run the benchmark and print the results."""
+    rng = np.random.default_rng(0)
+    size = int(args_cli.size / args_cli.grid_resolution)
+    height_diff = make_height_diff(size, args_cli.num_steps, rng)
+    height_diff_device = torch.from_numpy(height_diff).to(args_cli.device)
+
+    table = PrettyTable(["Nodes", "Edges", "skimage loop [ms]", "lines_cross_grid [ms]", "Speedup", "Equal"])
+    table.title = f"Height difference edge filter ({size}x{size} cells, device={args_cli.device})"
+    for num_nodes in args_cli.num_nodes:
+        points = rng.random((num_nodes, 2)) * args_cli.size
+        _, nearest_neighbors_idx = KDTree(points).query(points, k=args_cli.num_connections + 1)
+        idx_edge_start = np.repeat(np.arange(num_nodes), args_cli.num_connections)
+        idx_edge_end = nearest_neighbors_idx[:, 1:].reshape(-1)
+        idx_start = (points[idx_edge_start] / args_cli.grid_resolution).astype(np.int64).clip(max=size - 1)
+        idx_end = (points[idx_edge_end] / args_cli.grid_resolution).astype(np.int64).clip(max=size - 1)
+
+        # warm-up
+        lines_cross_grid(height_diff_device, torch.from_numpy(idx_start), torch.from_numpy(idx_end))
+        t_loop, ref = timed(lambda: skimage_loop(height_diff, idx_start, idx_end))
+        t_batched, result = timed(
+            lambda: lines_cross_grid(height_diff_device, torch.from_numpy(idx_start), torch.from_numpy(idx_end))
+        )
+        equal = np.array_equal(ref, result)
+        table.add_row(
+            [num_nodes, len(idx_start), f"{t_loop:.3f}", f"{t_batched:.3f}", f"{t_loop / t_batched:.2f}x", equal]
+        )
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
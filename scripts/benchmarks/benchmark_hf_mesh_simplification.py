@@ -0,0 +1,115 @@
+"""
+Benchmark of the coplanar simplification of the height field meshes.
+
+Generates every custom height field sub-terrain of :data:`OBS_TERRAINS_CFG` once without and once with
+:attr:`HfTerrainBaseCfg.simplify_mesh` and reports the number of triangles and the raycast throughput against both
+meshes. The rays start at a random position above the terrain and point downwards (height scan) or along a random
+direction that is close to horizontal (lidar). The hit distances of both meshes are compared to check that the
+simplification does not change the surface.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the height field mesh simplification.")
+parser.add_argument("--difficulty", type=float, default=1.0, help="Difficulty of the sub-terrains.")
+parser.add_argument("--num_rays", type=int, default=1_000_000, help="Number of rays per raycast.")
+parser.add_argument("--steps", type=int, default=20, help="Number of timed raycasts.")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the sub-terrains and the rays.")
+parser.add_argument("--device", type=str, default="cuda:0", help="Device of the rays and the meshes.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import copy
+import numpy as np
+import time
+import torch
+
+import warp as wp
+from prettytable import PrettyTable
+
+from omni.isaac.lab.utils.warp import convert_to_warp_mesh, raycast_mesh
+
+from crowd_navigation_mt.terrains import HfTerrainBaseCfg
+from crowd_navigation_mt.terrains.config import OBS_TERRAINS_CFG
+
+
+def make_rays(bounds: np.ndarray, lidar: bool) -> tuple[torch.Tensor, torch.Tensor]:
+    """Random rays over the bounds of the terrain mesh."""
+    generator = torch.Generator(device=args_cli.device).manual_seed(args_cli.seed)
+    low = torch.tensor(bounds[0], dtype=torch.float, device=args_cli.device)
+    high = torch.tensor(bounds[1], dtype=torch.float, device=args_cli.device)
+    ray_starts = low + (high - low) * torch.rand(args_cli.num_rays, 3, generator=generator, device=args_cli.device)
+    ray_directions = torch.randn(args_cli.num_rays, 3, generator=generator, device=args_cli.device)
+    if lidar:
+        ray_directions[:, 2] *= 0.1
+    else:
+        ray_starts[:, 2] = high[2] + 1.0
+        ray_directions[:, :2] *= 0.05
+        ray_directions[:, 2] = -ray_directions[:, 2].abs()
+    return ray_starts, ray_directions / torch.linalg.norm(ray_directions, dim=-1, keepdim=True)
+
+
+def time_raycast(mesh: wp.Mesh, ray_starts: torch.Tensor, ray_directions: torch.Tensor) -> tuple[float, torch.Tensor]:
+    """Return the throughput in million rays per second and the hit distances."""
+    _, distances, _, _ = raycast_mesh(ray_starts, ray_directions, mesh, return_distance=True)
+    wp.synchronize()
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        raycast_mesh(ray_starts, ray_directions, mesh, return_distance=True)
+    wp.synchronize()
+    duration = (time.perf_counter() - start) / args_cli.steps
+    return args_cli.num_rays / duration * 1e-6, distances
+
+
+def main():
+    """Run the benchmark and print the results."""
+    table = PrettyTable(
+        ["Sub-terrain", "Triangles", "Simplified", "Rays", "Before [Mray/s]", "After [Mray/s]", "Max. error [m]"]
+    )
+    table.title = f"Height field mesh simplification (difficulty={args_cli.difficulty}, rays={args_cli.num_rays})"
+    for name, sub_cfg in OBS_TERRAINS_CFG.sub_terrains.items():
+        if not isinstance(sub_cfg, HfTerrainBaseCfg):
+            continue
+        meshes = []
+        for simplify_mesh in (False, True):
+            cfg = copy.deepcopy(sub_cfg)
+            cfg.size = OBS_TERRAINS_CFG.size
+            cfg.horizontal_scale = OBS_TERRAINS_CFG.horizontal_scale
+            cfg.vertical_scale = OBS_TERRAINS_CFG.vertical_scale
+            cfg.slope_threshold = OBS_TERRAINS_CFG.slope_threshold
+            cfg.simplify_mesh = simplify_mesh
+            np.random.seed(args_cli.seed)
+            meshes.append(cfg.function(args_cli.difficulty, cfg)[0][0])
+        wp_meshes = [convert_to_warp_mesh(mesh.vertices, mesh.faces, device=args_cli.device) for mesh in meshes]
+        for rays, lidar in (("height scan", False), ("lidar", True)):
+            ray_starts, ray_directions = make_rays(meshes[0].bounds, lidar)
+            throughput, distances = zip(*(time_raycast(mesh, ray_starts, ray_directions) for mesh in wp_meshes))
+            hit = torch.isfinite(distances[0])
+            if not torch.equal(hit, torch.isfinite(distances[1])):
+                error = "hits differ"
+            else:
+                error = f"{(distances[0][hit] - distances[1][hit]).abs().max().item() if hit.any() else 0.0:.1e}"
+            num_triangles = [len(mesh.faces) for mesh in meshes]
+            table.add_row([name, *num_triangles, rays, f"{throughput[0]:.1f}", f"{throughput[1]:.1f}", error])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
@@ -0,0 +1,118 @@
+"""
+Count the host-device synchronizations per step of the history observation terms.
+
+Runs :class:`LidarHistory` (roll and ring buffer modes) and :class:`ObservationHistory` on random data and reports the
+number of synchronizing CUDA operations per call, as detected by :class:`CudaSyncCounter`. Requires a CUDA device.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Count the GPU syncs of the history observation terms.")
+parser.add_argument("--num_envs", type=int, default=1024, help="Number of environments.")
+parser.add_argument("--num_rays", type=int, default=360, help="Number of lidar rays.")
+parser.add_argument("--steps", type=int, default=50, help="Number of counted steps.")
+parser.add_argument("--reset_prob", type=float, default=0.01, help="Probability of an environment to terminate.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import torch
+from types import SimpleNamespace
+
+from prettytable import PrettyTable
+
+from omni.isaac.lab.managers import SceneEntityCfg
+
+from crowd_navigation_mt.mdp import (
+    LidarHistory,
+    LidarHistoryTermCfg,
+    ObservationHistory,
+    ObservationHistoryTermCfg,
+)
+from crowd_navigation_mt.mdp.observations.history_utils import CudaSyncCounter
+
+
+class _Scene(dict):
+    """Stand-in for the interactive scene, assets are accessed by key and sensors through an attribute."""
+
+    sensors: dict
+
+
+def make_env(num_envs: int, num_rays: int, device: str) -> SimpleNamespace:
+    """Create a minimal stand-in environment with a robot and a lidar sensor holding random data."""
+    scene = _Scene(robot=SimpleNamespace(data=SimpleNamespace(root_pos_w=torch.zeros(num_envs, 3, device=device))))
+    scene.sensors = {
+        "lidar": SimpleNamespace(
+            data=SimpleNamespace(
+                distances=torch.rand(num_envs, num_rays, device=device) * 10.0,
+                pos_w=torch.zeros(num_envs, 3, device=device),
+                quat_w=torch.tensor([[1.0, 0.0, 0.0, 0.0]], device=device).repeat(num_envs, 1),
+            )
+        )
+    }
+    return SimpleNamespace(
+        num_envs=num_envs,
+        device=device,
+        scene=scene,
+        termination_manager=SimpleNamespace(dones=torch.zeros(num_envs, dtype=torch.bool, device=device)),
+    )
+
+
+def count_syncs(env: SimpleNamespace, step_fn) -> float:
+    """Return the mean number of synchronizations per call of the step function."""
+    # warm-up, buffers are allocated at the first call
+    step_fn()
+    counter = CudaSyncCounter()
+    for _ in range(args_cli.steps):
+        env.termination_manager.dones.copy_(torch.rand(env.num_envs, device=env.device) < args_cli.reset_prob)
+        env.scene.sensors["lidar"].data.pos_w += 0.01
+        with counter:
+            step_fn()
+    return counter.count / args_cli.steps
+
+
+def main():
+    """Count the syncs and print the results."""
+    if not torch.cuda.is_available():
+        print("[INFO] No CUDA device available, the history terms do not synchronize on the CPU.")
+        return
+    device = "cuda:0"
+    table = PrettyTable(["Term", "Syncs per step"])
+    table.title = f"History terms (envs={args_cli.num_envs}, reset probability={args_cli.reset_prob})"
+    for buffer_mode in ("roll", "ring"):
+        env = make_env(args_cli.num_envs, args_cli.num_rays, device)
+        cfg = LidarHistoryTermCfg(
+            func=LidarHistory,
+            history_length=3,
+            decimation=2,
+            sensor_cfg=SceneEntityCfg("lidar"),
+            buffer_mode=buffer_mode,
+        )
+        term = LidarHistory(cfg, env)
+        table.add_row([f"LidarHistory ({buffer_mode})", count_syncs(env, lambda: term.get_history(env))])
+
+    env = make_env(args_cli.num_envs, args_cli.num_rays, device)
+    cfg = ObservationHistoryTermCfg(func=ObservationHistory, history_length_actions=1, history_length_positions=10)
+    term = ObservationHistory(cfg, env)
+    table.add_row(["ObservationHistory (positions)", count_syncs(env, lambda: term.get_history_of_positions(env))])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
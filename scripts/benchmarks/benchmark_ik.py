@@ -0,0 +1,144 @@
+"""
+Benchmark of the leg inverse kinematics of the low-level locomotion policy.
+
+Compares the previous path of :func:`solve_ik` (float64 constants, which upcast the whole solution, and a host-side
+NaN check on every call) against the float32 closed-form kernel, once eager and once compiled with
+``torch.compile``. The feet are placed around their default positions. The maximum deviation from the previous path
+is reported for every kernel.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the leg inverse kinematics.")
+parser.add_argument("--num_envs", type=int, default=4096, help="Number of environments.")
+parser.add_argument("--steps", type=int, default=200, help="Number of timed steps.")
+parser.add_argument("--device", type=str, default="cuda:0", help="Device of the foot positions.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import numpy as np
+import time
+import torch
+
+from prettytable import PrettyTable
+
+from crowd_navigation_mt.mdp.wild_anymal_obs.ik_chimera import get_ik, solve_ik, solve_ik_kernel
+
+
+def previous_solve_ik(pos_base_to_foot_in_base_frame, limb):
+    """The previous implementation of :func:`solve_ik` with float64 constants."""
+    ik = get_ik(pos_base_to_foot_in_base_frame.device)
+    num_envs = pos_base_to_foot_in_base_frame.shape[0]
+    leg_joints = torch.zeros([num_envs, 3], device=pos_base_to_foot_in_base_frame.device)
+    pos_haa_to_foot_in_base_frame = (
+        pos_base_to_foot_in_base_frame - ik.pos_base_to_haa_center_in_base_frame.double().index_select(0, limb)
+    )
+    d = ik.haa_to_foot_y_offset.double().index_select(0, limb)
+    d_squared = d * d
+    reach = torch.norm(pos_haa_to_foot_in_base_frame, dim=1)
+    clipped_reach = torch.clip(reach, ik.min_reach, ik.max_reach)
+    pos_haa_to_foot_in_base_frame = torch.einsum("bi,b->bi", pos_haa_to_foot_in_base_frame, clipped_reach / reach)
+    pos_yz_squared = torch.norm(pos_haa_to_foot_in_base_frame[:, -2:], dim=1) ** 2
+    modified_pos_haa_to_foot_in_base_frame = pos_haa_to_foot_in_base_frame.clone()
+    modified_pos_haa_to_foot_in_base_frame[:, -2:] = torch.einsum(
+        "bi,b->bi", pos_haa_to_foot_in_base_frame[:, -2:], (torch.abs(d) + 0.01) / torch.sqrt(pos_yz_squared)
+    )
+    modified_pos_haa_to_foot_in_base_frame[:, 0] = torch.min(
+        pos_haa_to_foot_in_base_frame[:, 0], torch.tensor(ik.max_reach_sp, dtype=torch.double)
+    )
+    modified_pos_yz_squared = torch.norm(modified_pos_haa_to_foot_in_base_frame[:, -2:], dim=1) ** 2
+    pos_haa_to_foot_in_base_frame = torch.where(
+        pos_yz_squared < d_squared,
+        modified_pos_haa_to_foot_in_base_frame.transpose(0, 1),
+        pos_haa_to_foot_in_base_frame.transpose(0, 1),
+    ).transpose(0, 1)
+    pos_yz_squared = torch.where(pos_yz_squared < d_squared, modified_pos_yz_squared, pos_yz_squared)
+    r_squared = pos_yz_squared - d_squared
+    r = torch.sqrt(r_squared)
+    delta = torch.atan2(pos_haa_to_foot_in_base_frame[:, 1], -pos_haa_to_foot_in_base_frame[:, 2])
+    beta = torch.atan2(r, d)
+    leg_joints[:, 0] = beta + delta - np.pi / 2
+    l_squared = r_squared + pos_haa_to_foot_in_base_frame[:, 0] ** 2
+    leg_length = torch.sqrt(l_squared)
+    phi1 = torch.acos((ik.a1_squared + l_squared - ik.a2_squared) * 0.5 / (np.sqrt(ik.a1_squared) * leg_length))
+    phi2 = torch.acos((ik.a2_squared + l_squared - ik.a1_squared) * 0.5 / (np.sqrt(ik.a2_squared) * leg_length))
+    qKFE = phi1 + phi2 - ik.kfe_offset
+    leg_joints[:, 2] = torch.where(limb % 2 == 0, -qKFE, qKFE)
+    theta_prime = torch.atan2(pos_haa_to_foot_in_base_frame[:, 0], r)
+    leg_joints[:, 1] = torch.where(limb % 2 != 0, -phi1 - theta_prime, phi1 - theta_prime)
+    if torch.any(torch.isnan(leg_joints)):
+        print("Error: nan detected in IK.")
+    return leg_joints
+
+
+def time_fn(fn) -> float:
+    """Return the mean time per call in milliseconds."""
+    for _ in range(10):
+        fn()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        fn()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args_cli.steps * 1e3
+
+
+def main():
+    """Run the benchmark and print the results."""
+    num_envs, device = args_cli.num_envs, args_cli.device
+    limb = torch.arange(4, device=device).repeat(num_envs)
+    default_pos = torch.tensor(
+        [[0.4, 0.2, -0.55], [-0.4, 0.2, -0.55], [0.4, -0.2, -0.55], [-0.4, -0.2, -0.55]], device=device
+    )
+    pos = default_pos.repeat(num_envs, 1) + 0.05 * torch.randn(4 * num_envs, 3, device=device)
+    ik = get_ik(device)
+    constants = (
+        ik.pos_base_to_haa_center_in_base_frame,
+        ik.haa_to_foot_y_offset,
+        ik.a1_squared,
+        ik.a2_squared,
+        ik.min_reach,
+        ik.max_reach,
+        ik.max_reach_sp,
+        ik.kfe_offset,
+    )
+    compiled_kernel = torch.compile(solve_ik_kernel)
+    paths = {
+        "float64 + host NaN check": lambda: previous_solve_ik(pos, limb),
+        "float32 kernel": lambda: solve_ik(pos, limb),
+        "float32 kernel (compiled)": lambda: compiled_kernel(pos, limb, *constants),
+    }
+
+    reference = previous_solve_ik(pos, limb)
+    table = PrettyTable(["Path", "Time [ms]", "Speedup", "Max. error [rad]"])
+    table.title = f"Leg inverse kinematics (envs={num_envs}, feet={4 * num_envs}, device={device})"
+    t_reference = None
+    for name, fn in paths.items():
+        error = (fn() - reference).abs().max().item()
+        t = time_fn(fn)
+        t_reference = t if t_reference is None else t_reference
+        table.add_row([name, f"{t:.3f}", f"{t_reference / t:.2f}x", f"{error:.1e}"])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
@@ -0,0 +1,132 @@
+"""
+Benchmark of the joint target computation of the low-level locomotion policy.
+
+Compares the previous path of :meth:`ProprioceptiveObservation.store_action_and_get_joint_target` (reorder the action,
+advance the CPG, compute the foot heights and solve the IK as separate steps) against :func:`compute_joint_target`,
+once eager and once compiled with ``torch.compile``. Reports the number of launched kernels on CUDA, or of dispatched
+operators and compiled graphs on the CPU, and the latency per control step. The targets of all paths are compared
+against the previous path.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the joint target computation.")
+parser.add_argument("--num_envs", type=int, default=4096, help="Number of environments.")
+parser.add_argument("--steps", type=int, default=200, help="Number of timed steps.")
+parser.add_argument("--device", type=str, default="cuda:0", help="Device of the observation.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import time
+import torch
+from torch.autograd import DeviceType
+from torch.profiler import ProfilerActivity, profile
+
+from prettytable import PrettyTable
+
+from crowd_navigation_mt.mdp.wild_anymal_obs import ProprioceptiveObservation
+from crowd_navigation_mt.mdp.wild_anymal_obs.ik_chimera import solve_ik
+
+
+def previous_path(obs: ProprioceptiveObservation, action: torch.Tensor) -> torch.Tensor:
+    """The previous implementation of the joint target in raisim order."""
+    action = obs.convert_action_order(action)
+    normalized_action = action.detach() * obs.action_std + obs.action_mean
+    obs.cpg.update_phase(normalized_action[:, :4])
+    h = obs.cpg.get_cubic_height()
+    foot_pos_target = obs.foot_default_position.detach().clone()
+    foot_pos_target[:, 2:12:3] = 0.0
+    gravitational_axis_in_base = torch.tile(torch.unsqueeze(obs.projected_gravity, 1), (1, 4, 1))
+    foot_pos_target += torch.einsum(
+        "efd,ef->efd", gravitational_axis_in_base, (obs.foot_default_z + h * obs.default_foot_height)
+    ).view(-1, 12)
+    joint_targets = solve_ik(foot_pos_target.view(-1, 3), obs.feet_id)
+    return joint_targets.view(-1, 12) + normalized_action[:, 4:16]
+
+
+def count_kernels(fn) -> int:
+    """Return the number of CUDA kernels, or of top-level operators and compiled graphs on the CPU, of a call."""
+    cuda = "cuda" in args_cli.device
+    with profile(activities=[ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if cuda else [])) as prof:
+        fn()
+    if cuda:
+        return sum(1 for event in prof.events() if event.device_type == DeviceType.CUDA)
+    return sum(
+        1
+        for event in prof.events()
+        if (event.name.startswith("aten::") and event.cpu_parent is None) or event.name.startswith("## Call Compiled")
+    )
+
+
+def time_fn(fn) -> float:
+    """Return the mean time per call in milliseconds."""
+    for _ in range(10):
+        fn()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        fn()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args_cli.steps * 1e3
+
+
+def main():
+    """Run the benchmark and print the results."""
+    num_envs, device = args_cli.num_envs, args_cli.device
+    observations = {
+        "separate steps": ProprioceptiveObservation(
+            num_envs=num_envs, device=device, simulation_dt=0.005, control_dt=0.02, compile_joint_target=False
+        ),
+        "fused (eager)": ProprioceptiveObservation(
+            num_envs=num_envs, device=device, simulation_dt=0.005, control_dt=0.02, compile_joint_target=False
+        ),
+        "fused (compiled)": ProprioceptiveObservation(
+            num_envs=num_envs, device=device, simulation_dt=0.005, control_dt=0.02, compile_joint_target=True
+        ),
+    }
+    projected_gravity = torch.nn.functional.normalize(torch.randn(num_envs, 3, device=device) + 3.0, dim=1)
+    for obs in observations.values():
+        obs.projected_gravity.copy_(projected_gravity)
+    action = torch.randn(num_envs, 16, device=device)
+    paths = {
+        "separate steps": lambda obs: previous_path(obs, action),
+        "fused (eager)": lambda obs: obs.store_action_and_get_joint_target(action, use_raisim_order=True),
+        "fused (compiled)": lambda obs: obs.store_action_and_get_joint_target(action, use_raisim_order=True),
+    }
+
+    # all paths start from the same phases, the first call also compiles
+    joint_targets = {name: fn(observations[name]).clone() for name, fn in paths.items()}
+    table = PrettyTable(["Path", "Kernels", "Time [ms]", "Speedup", "Max. error [rad]"])
+    table.title = f"Joint target computation (envs={num_envs}, device={device})"
+    t_reference = None
+    for name, fn in paths.items():
+        obs = observations[name]
+        error = (joint_targets[name] - joint_targets["separate steps"]).abs().max().item()
+        num_kernels = count_kernels(lambda: fn(obs))
+        t = time_fn(lambda: fn(obs))
+        t_reference = t if t_reference is None else t_reference
+        table.add_row([name, num_kernels, f"{t:.3f}", f"{t_reference / t:.2f}x", f"{error:.1e}"])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
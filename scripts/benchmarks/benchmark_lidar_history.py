@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of the lidar history observation term.
+
+Compares the roll based buffers of :class:`LidarHistory` against the ring buffer mode on the CPU for different
+numbers of environments and history lengths. The sensor is replaced by random data, so no simulation is stepped.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the lidar history observation term.")
+parser.add_argument("--num_envs", type=int, nargs="+", default=[256, 1024, 4096], help="Number of environments.")
+parser.add_argument("--history_lengths", type=int, nargs="+", default=[1, 5, 10], help="History lengths.")
+parser.add_argument("--decimation", type=int, default=4, help="Decimation of the history.")
+parser.add_argument("--num_rays", type=int, default=360, help="Number of lidar rays.")
+parser.add_argument("--steps", type=int, default=200, help="Number of timed steps.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import time
+import torch
+from types import SimpleNamespace
+
+from prettytable import PrettyTable
+
+from omni.isaac.lab.managers import SceneEntityCfg
+
+from crowd_navigation_mt.mdp import LidarHistory, LidarHistoryTermCfg
+
+
+def make_env(num_envs: int, num_rays: int) -> SimpleNamespace:
+    """Create a minimal stand-in environment with a lidar sensor holding random data."""
+    data = SimpleNamespace(
+        distances=torch.rand(num_envs, num_rays) * 10.0,
+        pos_w=torch.zeros(num_envs, 3),
+        quat_w=torch.tensor([[1.0, 0.0, 0.0, 0.0]]).repeat(num_envs, 1),
+    )
+    return SimpleNamespace(
+        num_envs=num_envs,
+        device="cpu",
+        scene=SimpleNamespace(sensors={"lidar": SimpleNamespace(data=data)}),
+        termination_manager=SimpleNamespace(dones=torch.zeros(num_envs, dtype=torch.bool)),
+    )
+
+
+def time_term(buffer_mode: str, num_envs: int, history_length: int) -> float:
+    """Return the mean time per call of the lidar history term in milliseconds."""
+    env = make_env(num_envs, args_cli.num_rays)
+    cfg = LidarHistoryTermCfg(
+        func=LidarHistory,
+        history_length=history_length,
+        decimation=args_cli.decimation,
+        sensor_cfg=SceneEntityCfg("lidar"),
+        return_pose_history=True,
+        buffer_mode=buffer_mode,
+    )
+    term = LidarHistory(cfg, env)
+    sensor_data = env.scene.sensors["lidar"].data
+    # warm-up
+    for _ in range(10):
+        term.get_history(env)
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        sensor_data.pos_w += 0.01
+        term.get_history(env)
+    return (time.perf_counter() - start) / args_cli.steps * 1e3
+
+
+def main():
+    """Run the benchmark and print the results."""
+    table = PrettyTable(["Envs", "History", "Roll [ms]", "Ring [ms]", "Speedup"])
+    table.title = f"LidarHistory (decimation={args_cli.decimation}, rays={args_cli.num_rays})"
+    for num_envs in args_cli.num_envs:
+        for history_length in args_cli.history_lengths:
+            t_roll = time_term("roll", num_envs, history_length)
+            t_ring = time_term("ring", num_envs, history_length)
+            table.add_row([num_envs, history_length, f"{t_roll:.3f}", f"{t_ring:.3f}", f"{t_roll / t_ring:.2f}x"])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
@@ -0,0 +1,129 @@
+"""
+Benchmark of the per-step lidar cache for the observation groups of the recording environment.
+
+Evaluates all terms of the lidar groups of :class:`ObservationsRecordCfg` on random sensor data, once with the
+per-step cache of the lidar quantities and once without it (an environment without a step counter is never cached).
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the per-step lidar observation cache.")
+parser.add_argument("--num_envs", type=int, default=1024, help="Number of environments.")
+parser.add_argument("--num_rays", type=int, default=360, help="Number of lidar rays.")
+parser.add_argument("--num_meshes", type=int, default=64, help="Number of tracked meshes.")
+parser.add_argument("--steps", type=int, default=100, help="Number of timed steps.")
+parser.add_argument("--device", type=str, default="cuda:0", help="Device of the sensor data.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import time
+import torch
+from types import SimpleNamespace
+
+from prettytable import PrettyTable
+
+from omni.isaac.lab.managers import ObservationTermCfg
+
+from crowd_navigation_mt.env_config.crowd_navigation_recording_env_cfg import ObservationsRecordCfg
+
+GROUPS = ["lidar_raw", "lidar_2d", "positions"]
+"""The groups of the recording configuration that only depend on the lidar sensors."""
+
+
+class _Env:
+    """Stand-in environment holding the lidar sensors of the recording scene."""
+
+    def __init__(self, sensors: dict, cached: bool):
+        self.num_envs = args_cli.num_envs
+        self.device = args_cli.device
+        self.scene = SimpleNamespace(sensors=sensors)
+        if cached:
+            self.common_step_counter = 0
+
+
+def make_lidar_data(num_envs: int, num_rays: int, num_meshes: int, device: str) -> SimpleNamespace:
+    """Random lidar data with the fields of the ray caster used by the observation terms."""
+    ray_hits_w = torch.randn(num_envs, num_rays, 3, device=device) * 5.0
+    ray_hits_w[torch.rand(num_envs, num_rays, device=device) < 0.3] = float("inf")
+    quat_w = torch.randn(num_envs, 4, device=device)
+    return SimpleNamespace(
+        ray_hits_w=ray_hits_w,
+        distances=torch.rand(num_envs, num_rays, device=device) * 10.0,
+        pos_w=torch.randn(num_envs, 3, device=device),
+        quat_w=quat_w / quat_w.norm(dim=-1, keepdim=True),
+        vel_w=torch.randn(num_envs, 3, device=device),
+        rot_vel_w=torch.randn(num_envs, 3, device=device),
+        ray_hit_mesh_idx=torch.randint(0, num_meshes, (num_envs, num_rays, 1), device=device, dtype=torch.int32),
+        mesh_positions_w=torch.randn(num_envs, num_meshes, 3, device=device) * 5.0,
+        mesh_velocities_w=torch.randn(num_envs, num_meshes, 3, device=device),
+        mesh_angular_velocities_w=torch.randn(num_envs, num_meshes, 3, device=device),
+    )
+
+
+def time_groups(env: _Env, terms: list[ObservationTermCfg]) -> float:
+    """Return the mean time in milliseconds to compute all terms of the groups once."""
+
+    def step():
+        if hasattr(env, "common_step_counter"):
+            env.common_step_counter += 1
+        for term_cfg in terms:
+            term_cfg.func(env, **term_cfg.params)
+
+    for _ in range(5):
+        step()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        step()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args_cli.steps * 1e3
+
+
+def main():
+    """Run the benchmark and print the results."""
+    observations_cfg = ObservationsRecordCfg()
+    terms = [
+        term_cfg
+        for group_name in GROUPS
+        for term_cfg in getattr(observations_cfg, group_name).__dict__.values()
+        if isinstance(term_cfg, ObservationTermCfg)
+    ]
+    sensors = {
+        name: SimpleNamespace(
+            data=make_lidar_data(args_cli.num_envs, args_cli.num_rays, args_cli.num_meshes, args_cli.device)
+        )
+        for name in ("lidar", "lidar_label")
+    }
+
+    t_uncached = time_groups(_Env(sensors, cached=False), terms)
+    t_cached = time_groups(_Env(sensors, cached=True), terms)
+
+    table = PrettyTable(["Groups", "Terms", "Uncached [ms]", "Cached [ms]", "Speedup"])
+    table.title = f"ObservationsRecordCfg (envs={args_cli.num_envs}, rays={args_cli.num_rays})"
+    table.add_row(
+        [", ".join(GROUPS), len(terms), f"{t_uncached:.3f}", f"{t_cached:.3f}", f"{t_uncached / t_cached:.2f}x"]
+    )
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
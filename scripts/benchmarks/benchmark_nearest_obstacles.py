@@ -0,0 +1,124 @@
+"""
+Benchmark of the nearest obstacle selection for the privileged obstacle observations.
+
+Compares the previous path of :func:`obstacle_positions_sorted_flat` (transform all meshes to the sensor frame and
+argsort their distances) against :func:`nearest_obstacles` with ``torch.topk``, once over all meshes and once with the
+uniform-grid prefilter. The obstacles are spread uniformly over a square arena with a constant density.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the nearest obstacle selection.")
+parser.add_argument("--num_envs", type=int, default=1024, help="Number of environments.")
+parser.add_argument("--num_meshes", type=int, nargs="+", default=[1000, 4000, 16000], help="Number of meshes.")
+parser.add_argument("--closest_N", type=int, default=10, help="Number of selected obstacles.")
+parser.add_argument("--density", type=float, default=0.5, help="Obstacles per square meter.")
+parser.add_argument("--cell_size", type=float, default=4.0, help="Cell size of the grid prefilter.")
+parser.add_argument("--steps", type=int, default=50, help="Number of timed steps.")
+parser.add_argument("--device", type=str, default="cuda:0", help="Device of the sensor data.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import time
+import torch
+from types import SimpleNamespace
+
+from prettytable import PrettyTable
+
+from omni.isaac.lab.managers import SceneEntityCfg
+
+from crowd_navigation_mt.mdp.observations.observations import nearest_obstacles, transform_w_points_to_b_points
+
+
+class _Env:
+    """Stand-in environment holding a lidar sensor with random mesh data."""
+
+    def __init__(self, num_meshes: int):
+        self.num_envs = args_cli.num_envs
+        self.device = args_cli.device
+        self.common_step_counter = 0
+        half_size = 0.5 * (num_meshes / args_cli.density) ** 0.5
+        mesh_positions_w = (torch.rand(1, num_meshes, 3, device=self.device) * 2.0 - 1.0) * half_size
+        mesh_positions_w[..., 2] = 0.5
+        yaw = torch.rand(self.num_envs, device=self.device) * 2.0 * torch.pi
+        quat_w = torch.zeros(self.num_envs, 4, device=self.device)
+        quat_w[:, 0] = torch.cos(0.5 * yaw)
+        quat_w[:, 3] = torch.sin(0.5 * yaw)
+        data = SimpleNamespace(
+            pos_w=(torch.rand(self.num_envs, 3, device=self.device) * 2.0 - 1.0) * half_size,
+            quat_w=quat_w,
+            vel_w=torch.randn(self.num_envs, 3, device=self.device),
+            mesh_positions_w=mesh_positions_w.expand(self.num_envs, -1, -1),
+            mesh_velocities_w=torch.randn(1, num_meshes, 3, device=self.device).expand(self.num_envs, -1, -1),
+        )
+        self.scene = SimpleNamespace(sensors={"lidar": SimpleNamespace(data=data)})
+
+
+def argsort_path(env: _Env, sensor_cfg: SceneEntityCfg, closest_N: int) -> torch.Tensor:
+    """The previous implementation of the observation term."""
+    sensor = env.scene.sensors[sensor_cfg.name]
+    mesh_pos = sensor.data.mesh_positions_w[:, 1:, :]
+    points = transform_w_points_to_b_points(mesh_pos, sensor.data.pos_w, sensor.data.quat_w)
+    x_points, y_points = points[:, :, 0], points[:, :, 1]
+    distances = torch.sqrt(x_points**2 + y_points**2)
+    closest_N_indices = torch.argsort(distances, dim=1)[:, :closest_N]
+    x_points_sorted = torch.gather(x_points, 1, closest_N_indices)
+    y_points_sorted = torch.gather(y_points, 1, closest_N_indices)
+    return torch.concat((x_points_sorted, y_points_sorted), dim=1)
+
+
+def time_fn(env: _Env, fn) -> float:
+    """Return the mean time per step in milliseconds, every step invalidates the per-step cache."""
+
+    def step():
+        env.common_step_counter += 1
+        fn()
+
+    for _ in range(5):
+        step()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        step()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args_cli.steps * 1e3
+
+
+def main():
+    """Run the benchmark and print the results."""
+    sensor_cfg = SceneEntityCfg("lidar")
+    k = args_cli.closest_N
+    table = PrettyTable(["Meshes", "Argsort [ms]", "Topk [ms]", "Topk + grid [ms]", "Speedup (grid)"])
+    table.title = f"Nearest obstacles (envs={args_cli.num_envs}, N={k}, cell size={args_cli.cell_size})"
+    for num_meshes in args_cli.num_meshes:
+        env = _Env(num_meshes)
+        t_argsort = time_fn(env, lambda: argsort_path(env, sensor_cfg, k))
+        t_topk = time_fn(env, lambda: nearest_obstacles(env, sensor_cfg, k))
+        t_grid = time_fn(env, lambda: nearest_obstacles(env, sensor_cfg, k, cell_size=args_cli.cell_size))
+        table.add_row(
+            [num_meshes, f"{t_argsort:.3f}", f"{t_topk:.3f}", f"{t_grid:.3f}", f"{t_argsort / t_grid:.2f}x"]
+        )
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
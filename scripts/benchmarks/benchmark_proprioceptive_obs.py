@@ -0,0 +1,125 @@
+"""
+Benchmark of the proprioceptive observation of the low-level locomotion policy.
+
+Compares the previous path of :meth:`ProprioceptiveObservation.update` and :meth:`ProprioceptiveObservation.get_obs`
+(concatenate all terms, normalize and rebuild the raisim index tensors at every call) against the current one, which
+writes the terms into a preallocated buffer and applies a precomputed permutation together with the normalization.
+Both paths are checked to return the same observation.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the proprioceptive observation.")
+parser.add_argument("--num_envs", type=int, default=4096, help="Number of environments.")
+parser.add_argument("--steps", type=int, default=200, help="Number of timed steps.")
+parser.add_argument("--device", type=str, default="cpu", help="Device of the observation.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import time
+import torch
+
+from prettytable import PrettyTable
+
+from crowd_navigation_mt.mdp.wild_anymal_obs import ProprioceptiveObservation
+from crowd_navigation_mt.mdp.wild_anymal_obs.raisim_conversion import isaac_to_raisim_joint_conversion
+
+
+def previous_path(obs: ProprioceptiveObservation, joint_pos, joint_vel, command, base_lin_v, base_ang_v, gravity):
+    """The previous implementation of the update and the observation in raisim order."""
+    is_stand = torch.norm(command, dim=1) < 0.01
+    projected_gravity = gravity * -1
+    phase = obs.cpg.get_phase()
+    phase_sin_cos = torch.cat([torch.sin(phase).view(-1, 4, 1), torch.cos(phase).view(-1, 4, 1)], dim=2).view(-1, 8)
+    obs_isaac = torch.cat(
+        [
+            command,
+            projected_gravity,
+            base_lin_v,
+            base_ang_v,
+            joint_pos,
+            joint_vel,
+            obs.joint_pos_history[:, obs.history_slot(1), :],
+            obs.cpg.get_d_phase(),
+            phase_sin_cos,
+            obs.joint_pos_history[:, obs.history_slot(obs.history_idx[0]), :],
+            obs.joint_pos_history[:, obs.history_slot(obs.history_idx[1]), :],
+            obs.joint_vel_history[:, obs.history_slot(obs.history_idx[0]), :],
+            obs.joint_vel_history[:, obs.history_slot(obs.history_idx[1]), :],
+            obs.prev_joint_target,
+            obs.prev2_joint_target,
+            (~is_stand * obs.base_frequency * obs.freqency_scale).reshape(-1, 1),
+        ],
+        dim=1,
+    )
+    obs_raisim = isaac_to_raisim_joint_conversion((obs_isaac - obs.mean) / obs.std, obs.joint_start_indices)
+    return obs.convert_observation_phase(obs_raisim)
+
+
+def current_path(obs: ProprioceptiveObservation, *inputs):
+    """The current implementation of the update and the observation in raisim order."""
+    obs.update(*inputs)
+    return obs.get_obs(use_raisim_order=True)
+
+
+def time_fn(fn) -> float:
+    """Return the mean time per call in milliseconds."""
+    for _ in range(10):
+        fn()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(args_cli.steps):
+        fn()
+    if "cuda" in args_cli.device:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args_cli.steps * 1e3
+
+
+def main():
+    """Run the benchmark and print the results."""
+    num_envs, device = args_cli.num_envs, args_cli.device
+    obs = ProprioceptiveObservation(num_envs=num_envs, device=device, simulation_dt=0.005, control_dt=0.02)
+    obs.joint_pos_history.normal_()
+    obs.joint_vel_history.normal_()
+    command = torch.randn(num_envs, 3, device=device)
+    command[: num_envs // 4] = 0.0
+    inputs = (
+        torch.randn(num_envs, 12, device=device),
+        torch.randn(num_envs, 12, device=device),
+        command,
+        torch.randn(num_envs, 3, device=device),
+        torch.randn(num_envs, 3, device=device),
+        torch.randn(num_envs, 3, device=device),
+    )
+    identical = torch.equal(previous_path(obs, *inputs), current_path(obs, *inputs))
+
+    t_previous = time_fn(lambda: previous_path(obs, *inputs))
+    t_current = time_fn(lambda: current_path(obs, *inputs))
+
+    table = PrettyTable(["Path", "Time [ms]", "Speedup", "Identical"])
+    table.title = f"ProprioceptiveObservation update + get_obs (envs={num_envs}, device={device})"
+    table.add_row(["torch.cat + index rebuild", f"{t_previous:.3f}", "1.00x", identical])
+    table.add_row(["buffer + permutation", f"{t_current:.3f}", f"{t_previous / t_current:.2f}x", identical])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()
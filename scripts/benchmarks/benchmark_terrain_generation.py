@@ -0,0 +1,68 @@
+"""
+Benchmark of the parallel sub-terrain generation.
+
+Generates the obstacle terrain grid of :data:`OBS_TERRAINS_CFG` with :class:`ParallelTerrainGenerator` for different
+numbers of workers, reports the wall time and checks that the terrain mesh is the same for every number of workers.
+"""
+
+"""Launch Isaac Sim Simulator first."""
+
+import argparse
+
+from omni.isaac.lab.app import AppLauncher
+
+# add argparse arguments
+parser = argparse.ArgumentParser(description="Benchmark the parallel terrain generation.")
+parser.add_argument("--num_rows", type=int, default=24, help="Number of terrain rows.")
+parser.add_argument("--num_cols", type=int, default=24, help="Number of terrain columns.")
+parser.add_argument("--num_workers", type=int, nargs="+", default=[1, 4, 16], help="Number of worker processes.")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the terrain generator.")
+args_cli = parser.parse_args()
+
+# launch omniverse app
+app_launcher = AppLauncher(headless=True)
+simulation_app = app_launcher.app
+
+"""Rest everything follows."""
+
+import copy
+import numpy as np
+import time
+
+from prettytable import PrettyTable
+
+from crowd_navigation_mt.terrains import ParallelTerrainGenerator, ParallelTerrainGeneratorCfg
+from crowd_navigation_mt.terrains.config import OBS_TERRAINS_CFG
+
+
+def main():
+    """Run the benchmark and print the results."""
+    fields = {name: copy.deepcopy(getattr(OBS_TERRAINS_CFG, name)) for name in OBS_TERRAINS_CFG.__dataclass_fields__}
+    fields.pop("class_type", None)
+    fields.update(num_rows=args_cli.num_rows, num_cols=args_cli.num_cols, seed=args_cli.seed)
+
+    table = PrettyTable(["Workers", "Time [s]", "Speedup", "Identical"])
+    table.title = f"Terrain generation ({args_cli.num_rows}x{args_cli.num_cols} sub-terrains)"
+    reference = None
+    for num_workers in args_cli.num_workers:
+        cfg = ParallelTerrainGeneratorCfg(**copy.deepcopy(fields), num_workers=num_workers)
+        start = time.perf_counter()
+        generator = ParallelTerrainGenerator(cfg)
+        duration = time.perf_counter() - start
+        mesh = generator.terrain_mesh
+        if reference is None:
+            reference = (duration, mesh.vertices, mesh.faces)
+        identical = np.array_equal(mesh.vertices, reference[1]) and np.array_equal(mesh.faces, reference[2])
+        table.add_row([num_workers, f"{duration:.3f}", f"{reference[0] / duration:.2f}x", identical])
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        # run the main function
+        main()
+    except Exception as e:
+        raise e
+    finally:
+        # close the app
+        simulation_app.close()